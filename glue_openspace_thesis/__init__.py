@@ -1,10 +1,16 @@
 from __future__ import absolute_import, division, print_function
-from pkg_resources import get_distribution, DistributionNotFound
 
-try:
-    __version__ = get_distribution(__name__).version
-except DistributionNotFound:
-    __version__ = 'undefined'
+
+def __getattr__(name):
+    # The version is looked up when it's asked for, registering the
+    # plugin when Glue starts doesn't need the package metadata
+    if name == '__version__':
+        from importlib.metadata import PackageNotFoundError, version
+        try:
+            return version(__name__)
+        except PackageNotFoundError:
+            return 'undefined'
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 def setup():
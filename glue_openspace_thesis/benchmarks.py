@@ -0,0 +1,158 @@
+import argparse
+import statistics
+import time
+from typing import Union
+
+import numpy as np
+from glue.core import Data
+
+from .simp import simp
+from .mock_openspace import MockOpenSpace, ReceivedMessage
+from .headless import HeadlessOpenSpaceViewer
+from .layer_artist import OpenSpaceLayerArtist
+
+__all__ = [
+    'BENCHMARK_SIZES', 'BenchmarkResult', 'make_benchmark_data', 'add_benchmark_layer',
+    'wait_for_upload', 'wait_until_quiet', 'run_throughput_benchmark', 'format_result', 'format_results', 'main'
+]
+
+BENCHMARK_SIZES = (1000, 10000, 100000, 1000000, 10000000)
+ROUND_TRIPS = 20 # Property changes timed for the round-trip latency
+BENCHMARK_TIMEOUT = 600.0 # Seconds to wait for an upload or an echo
+QUIET_TIME = 0.05 # Seconds without messages before a round trip is timed
+
+class BenchmarkResult:
+    n_points: "int"
+    upload_seconds: "float"
+    bytes_on_wire: "int"
+    round_trip_seconds: "float"
+
+    def __init__(self, n_points: "int", upload_seconds: "float", bytes_on_wire: "int", round_trip_seconds: "float"):
+        self.n_points = n_points
+        self.upload_seconds = upload_seconds
+        self.bytes_on_wire = bytes_on_wire
+        self.round_trip_seconds = round_trip_seconds
+
+    @property
+    def points_per_second(self) -> "float":
+        return self.n_points / self.upload_seconds if self.upload_seconds > 0 else float('inf')
+
+def make_benchmark_data(n_points: "int", seed: "int" = 0) -> "Data":
+    rng = np.random.default_rng(seed)
+    return Data(
+        x=rng.normal(size=n_points), y=rng.normal(size=n_points),
+        z=rng.normal(size=n_points), value=rng.random(n_points),
+        label=f'benchmark_{n_points}'
+    )
+
+def add_benchmark_layer(viewer: "HeadlessOpenSpaceViewer", data: "Data") -> "OpenSpaceLayerArtist":
+    '''
+        Adds the data to the viewer and picks its x, y and z components
+        as the positions, before the viewer connects to OpenSpace.
+    '''
+    layer = viewer.add_data(data)
+    viewer.state.x_att = data.id['x']
+    viewer.state.y_att = data.id['y']
+    viewer.state.z_att = data.id['z']
+    return layer
+
+def wait_for_upload(server: "MockOpenSpace", identifier: "str", n_points: "int",
+                    n_messages: "int", timeout: "float") -> "list[ReceivedMessage]":
+    '''
+        Waits for the positions of all points of the layer in a message
+        after the first `n_messages` messages, and returns the messages.
+    '''
+    def has_positions():
+        for message in server.messages[n_messages:]:
+            positions = message.values.get(simp.DataKey.Z)
+            if message.identifier == identifier and positions is not None and len(positions) == n_points:
+                return True
+        return False
+
+    if not server.wait_for(has_positions, timeout):
+        raise simp.SimpError(f'Upload of {n_points} points didn\'t finish')
+
+    return [message for message in server.messages[n_messages:] if message.identifier == identifier]
+
+def wait_until_quiet(viewer: "HeadlessOpenSpaceViewer", server: "MockOpenSpace", timeout: "float"):
+    '''
+        Waits until neither the viewer nor the mock have received
+        anything for `QUIET_TIME` seconds.
+    '''
+    deadline = time.perf_counter() + timeout
+    counts = None
+    while counts != (viewer.n_received, len(server.messages), server.n_echoed):
+        if time.perf_counter() > deadline:
+            raise simp.SimpError('Messages kept arriving')
+        counts = (viewer.n_received, len(server.messages), server.n_echoed)
+        time.sleep(QUIET_TIME)
+
+def run_throughput_benchmark(n_points: "int", round_trips: "int" = ROUND_TRIPS,
+                             timeout: "float" = BENCHMARK_TIMEOUT) -> "BenchmarkResult":
+    """
+    Uploads `n_points` points through a headless viewer to a mock OpenSpace
+    on this machine, and times property changes that OpenSpace echoes back.
+    The upload that follows the handshake warms up caches and isn't timed.
+    """
+    data = make_benchmark_data(n_points)
+    server = MockOpenSpace(echo=True)
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+
+    try:
+        layer = add_benchmark_layer(viewer, data)
+        viewer.connect(*server.address)
+        identifier = layer.get_identifier_str()
+        wait_for_upload(server, identifier, n_points, 0, timeout)
+
+        n_messages = len(server.messages)
+        start = time.perf_counter()
+        layer.add_initial_data_to_message()
+        messages = wait_for_upload(server, identifier, n_points, n_messages, timeout)
+        upload_seconds = time.perf_counter() - start
+        bytes_on_wire = sum(message.n_bytes for message in messages)
+
+        latencies = []
+        for _ in range(round_trips):
+            # Late echoes of earlier messages would change the property back
+            wait_until_quiet(viewer, server, timeout)
+
+            n_received = viewer.n_received
+            start = time.perf_counter()
+            layer.state.visible = not layer.state.visible
+            if not viewer.wait_for_received(n_received + 1, timeout):
+                raise simp.SimpError('Property change wasn\'t echoed')
+            latencies.append(time.perf_counter() - start)
+
+        return BenchmarkResult(n_points, upload_seconds, bytes_on_wire, statistics.median(latencies))
+
+    finally:
+        viewer.disconnect()
+        server.close()
+
+RESULT_HEADER = f'{"points":>10} {"upload (s)":>11} {"points/s":>12} {"bytes":>13} {"round trip (ms)":>16}'
+
+def format_result(result: "BenchmarkResult") -> "str":
+    return (
+        f'{result.n_points:>10} {result.upload_seconds:>11.3f} {result.points_per_second:>12.3g} '
+        f'{result.bytes_on_wire:>13} {1000 * result.round_trip_seconds:>16.2f}'
+    )
+
+def format_results(results: "list[BenchmarkResult]") -> "str":
+    return '\n'.join([RESULT_HEADER] + [format_result(result) for result in results])
+
+def main(argv: "Union[list[str], None]" = None):
+    parser = argparse.ArgumentParser(
+        description='Measures the throughput of the plugin against a mock OpenSpace on this machine'
+    )
+    parser.add_argument('sizes', nargs='*', type=int, default=list(BENCHMARK_SIZES), help='Amounts of points')
+    parser.add_argument('--round-trips', type=int, default=ROUND_TRIPS, help='Property changes to time')
+    args = parser.parse_args(argv)
+
+    # Every size is printed when it's done, the largest ones take a while
+    print(RESULT_HEADER, flush=True)
+    for n_points in args.sizes:
+        print(format_result(run_throughput_benchmark(n_points, args.round_trips)), flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, Union
+
+import numpy as np
+
+__all__ = ['POSITION_CACHE_BYTES', 'LRUCache', 'get_position_cache', 'get_data_revision', 'bump_data_revision']
+
+POSITION_CACHE_BYTES = 1 << 29 # Memory budget of the converted positions of all datasets
+
+# Revision of the numerical values of every dataset, by uuid
+_data_revisions: "dict[str, int]" = {}
+
+def get_data_revision(data) -> "int":
+    return _data_revisions.get(data.uuid, 0)
+
+def bump_data_revision(data) -> "int":
+    """
+    Marks the numerical values of the dataset as changed, which
+    invalidates everything cached for the previous revision.
+    """
+    _data_revisions[data.uuid] = get_data_revision(data) + 1
+    return _data_revisions[data.uuid]
+
+class LRUCache:
+    """
+    A thread safe cache of arrays, which evicts the least recently
+    used arrays once they take up more than `max_bytes` together.
+    Arrays larger than the whole budget are never cached.
+    """
+    _entries: "OrderedDict[Hashable, np.ndarray]"
+    _max_bytes: "int"
+    _nbytes: "int"
+    _lock: "Lock"
+
+    def __init__(self, max_bytes: "int"):
+        self._entries = OrderedDict()
+        self._max_bytes = max_bytes
+        self._nbytes = 0
+        self._lock = Lock()
+
+    def __len__(self) -> "int":
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> "int":
+        return self._nbytes
+
+    def fits(self, nbytes: "int") -> "bool":
+        '''
+            Returns False if an array of `nbytes` would never be cached.
+        '''
+        return nbytes <= self._max_bytes
+
+    def get(self, key: "Hashable") -> "Union[np.ndarray, None]":
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: "Hashable", value: "np.ndarray"):
+        if not self.fits(value.nbytes):
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._nbytes -= previous.nbytes
+
+            self._entries[key] = value
+            self._nbytes += value.nbytes
+
+            while self._nbytes > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+_position_cache = LRUCache(POSITION_CACHE_BYTES)
+
+def get_position_cache() -> "LRUCache":
+    '''
+        Returns the cache of converted positions, which is shared by all
+        layers, so the subsets of a dataset reuse its conversion.
+    '''
+    return _position_cache
@@ -0,0 +1,153 @@
+from typing import Union
+
+from .simp import simp
+
+__all__ = [
+    'MAX_MESSAGE_SIZE', 'Capabilities', 'CLIENT_CAPABILITIES', 'LEGACY_CAPABILITIES',
+    'encode_handshake', 'parse_handshake'
+]
+
+MAX_MESSAGE_SIZE = 10**15 - 1 # Bytes of a subject, its length has 15 digits in the header
+CAPABILITY_SEPARATOR = '=' # Between the name and the value of a capability
+VALUE_SEPARATOR = ',' # Between the values of a list capability
+
+CapabilityValue = Union[int, 'tuple[str, ...]']
+
+class Capabilities:
+    """
+    The wire features of one side of a connection, or the ones both sides
+    agreed on in the "Connection" handshake. A capability is either a limit
+    (e.g. the largest message), of which the smaller one is agreed, or a
+    list of supported values (e.g. codecs), of which both sides' are agreed.
+    """
+    values: "dict[str, CapabilityValue]"
+
+    def __init__(self, values: "Union[dict[str, CapabilityValue], None]" = None):
+        self.values = {} if values is None else dict(values)
+
+    def __repr__(self):
+        return f'Capabilities({self.values})'
+
+    def __eq__(self, other):
+        return isinstance(other, Capabilities) and self.values == other.values
+
+    def __len__(self) -> "int":
+        return len(self.values)
+
+    def __getitem__(self, name: "str") -> "CapabilityValue":
+        return self.values[name]
+
+    def get(self, name: "str", default: "Union[CapabilityValue, None]" = None) -> "Union[CapabilityValue, None]":
+        return self.values.get(name, default)
+
+    def supports(self, name: "str", value: "Union[str, None]" = None) -> "bool":
+        '''
+            Returns True if the list capability `name` contains `value`,
+            or, without a value, if the limit `name` is greater than 0.
+        '''
+        capability = self.values.get(name)
+        if capability is None:
+            return False
+        if value is None:
+            return not isinstance(capability, tuple) and capability > 0
+        return isinstance(capability, tuple) and value in capability
+
+    def agree(self, offered: "Capabilities") -> "Capabilities":
+        '''
+            Returns the capabilities both sides support, in the order of
+            `offered`. Capabilities only one side knows aren't agreed.
+        '''
+        agreed = {}
+        for name, offered_value in offered.values.items():
+            if name not in self.values:
+                continue
+
+            value = self.values[name]
+            if isinstance(offered_value, tuple) != isinstance(value, tuple):
+                continue
+
+            if isinstance(offered_value, tuple):
+                agreed[name] = tuple(item for item in offered_value if item in value)
+            else:
+                agreed[name] = min(offered_value, value)
+
+        return Capabilities(agreed)
+
+    def to_strings(self) -> "list[str]":
+        '''
+            Returns the capabilities as `name=value` strings, with
+            the values of list capabilities separated by commas.
+        '''
+        strings = []
+        for name, value in self.values.items():
+            if isinstance(value, tuple):
+                value = VALUE_SEPARATOR.join(value)
+            strings.append(f'{name}{CAPABILITY_SEPARATOR}{value}')
+        return strings
+
+    @classmethod
+    def from_strings(cls, strings: "list[str]") -> "Capabilities":
+        '''
+            Reads capabilities written by `to_strings()`. Strings that
+            aren't capabilities are skipped, so peers can add fields.
+        '''
+        values = {}
+        for string in strings:
+            name, separator, value = string.partition(CAPABILITY_SEPARATOR)
+            if separator == '' or name == '':
+                continue
+
+            try:
+                values[name] = int(value)
+            except ValueError:
+                values[name] = tuple(item for item in value.split(VALUE_SEPARATOR) if item != '')
+
+        return cls(values)
+
+# What this plugin can send. Keys that don't fit in a subject of
+# 'max_message_size' bytes are sent in the next messages of the layer
+CLIENT_CAPABILITIES = Capabilities({
+    'max_message_size': MAX_MESSAGE_SIZE,
+    'chunking': 1, # Progressive uploads are sent in batches of rows
+    'codecs': ('ranges', 'bitset', 'deltas'), # Subset ranges and bitsets, frame deltas
+    # One float32 array per axis, rows in octree order, positions replaced per time step
+    'layouts': ('columns', 'octree', 'frames'),
+})
+
+# Assumed for peers that answer the handshake without capabilities, which
+# predate chunked uploads, subset masks, frames and octree order
+LEGACY_CAPABILITIES = Capabilities({
+    'max_message_size': MAX_MESSAGE_SIZE,
+    'chunking': 0,
+    'codecs': (),
+    'layouts': ('columns',),
+})
+
+def encode_handshake(name: "str", capabilities: "Capabilities") -> "bytearray":
+    '''
+        Returns the subject of a "Connection" message: the name of the
+        software, followed by one string per capability. Peers that don't
+        know capabilities only read the name.
+    '''
+    strings = [name] + capabilities.to_strings()
+    return bytearray(''.join(string + simp.DELIM for string in strings), 'utf-8')
+
+def parse_handshake(subject: "bytearray") -> "tuple[str, Union[Capabilities, None]]":
+    '''
+        Returns the name of the software and its capabilities,
+        which are None if the subject doesn't have any.
+    '''
+    strings = []
+    offset = 0
+    while offset < len(subject):
+        try:
+            string, offset = simp.read_string(subject, offset)
+        except simp.SimpError:
+            break
+        strings.append(string)
+
+    if len(strings) == 0:
+        return '', None
+
+    capabilities = Capabilities.from_strings(strings[1:])
+    return strings[0], (capabilities if len(capabilities) > 0 else None)
@@ -0,0 +1,91 @@
+from typing import Callable, Iterator, Union
+
+import numpy as np
+
+from .utils import float32_array_to_bytes
+from .tracing import span
+
+__all__ = [
+    'COLUMN_BLOCK_SIZE', 'STREAM_MIN_POINTS',
+    'ColumnSource', 'Float32ColumnPayload', 'payload_nbytes', 'iter_payload_chunks'
+]
+
+COLUMN_BLOCK_SIZE = 1 << 20 # Amount of rows read and encoded at once
+STREAM_MIN_POINTS = 1 << 22 # Columns with fewer values are encoded at once
+
+class ColumnSource:
+    """
+    Reads a component of a dataset in blocks of rows, either in table
+    order or in the order of the given rows. Components backed by
+    `np.memmap` (or any other lazily loaded array) are only read one
+    block at a time.
+    """
+    _data: "object"
+    _attribute: "object"
+    _rows: "Union[np.ndarray, None]"
+
+    def __init__(self, data, attribute, rows: "Union[np.ndarray, None]" = None):
+        self._data = data
+        self._attribute = attribute
+        self._rows = rows
+
+    def __len__(self) -> "int":
+        return self._data.size if self._rows is None else len(self._rows)
+
+    def read(self, start: "int", stop: "int") -> "np.ndarray":
+        view = slice(start, stop) if self._rows is None else self._rows[start:stop]
+        return self._data.get_data(self._attribute, view=view)
+
+    def iter_blocks(self, block_size: "int" = COLUMN_BLOCK_SIZE) -> "Iterator[np.ndarray]":
+        for start in range(0, len(self), block_size):
+            yield self.read(start, min(start + block_size, len(self)))
+
+class Float32ColumnPayload:
+    """
+    A column in an outgoing message that is read and encoded to
+    big-endian float32 one block at a time while it's being sent, so
+    that at most one block of the column is held in memory.
+    """
+    _read_block: "Callable[[int, int], np.ndarray]"
+    _n_values: "int"
+    _block_size: "int"
+
+    def __init__(self, read_block: "Callable[[int, int], np.ndarray]", n_values: "int",
+                 block_size: "int" = COLUMN_BLOCK_SIZE):
+        self._read_block = read_block
+        self._n_values = n_values
+        self._block_size = block_size
+
+    @classmethod
+    def from_source(cls, source: "ColumnSource", block_size: "int" = COLUMN_BLOCK_SIZE) -> "Float32ColumnPayload":
+        return cls(source.read, len(source), block_size)
+
+    @property
+    def nbytes(self) -> "int":
+        return 4 * self._n_values
+
+    def iter_chunks(self) -> "Iterator[bytes]":
+        '''
+            Reads and encodes the blocks of the column. Raises ValueError
+            if a block doesn't have the length the message was sized for,
+            e.g. because the dataset changed after the message was taken.
+        '''
+        for start in range(0, self._n_values, self._block_size):
+            stop = min(start + self._block_size, self._n_values)
+            with span('Encode column block', 'encode', n_values=stop - start):
+                block = self._read_block(start, stop)
+                if len(block) != stop - start:
+                    raise ValueError(f'Read {len(block)} values of rows {start} to {stop} of the column')
+                chunk = float32_array_to_bytes(block)
+            yield chunk
+
+def payload_nbytes(payload: "Union[bytes, bytearray, Float32ColumnPayload]") -> "int":
+    if isinstance(payload, Float32ColumnPayload):
+        return payload.nbytes
+    return len(payload)
+
+def iter_payload_chunks(payload: "Union[bytes, bytearray, Float32ColumnPayload]") -> "Iterator[bytes]":
+    if isinstance(payload, Float32ColumnPayload):
+        yield from payload.iter_chunks()
+    else:
+        yield payload
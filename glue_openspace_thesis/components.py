@@ -0,0 +1,110 @@
+from typing import Union
+from weakref import WeakKeyDictionary
+
+from echo import ChoiceSeparator
+from glue.core import BaseData
+from glue.core.data_combo_helper import ComponentIDComboHelper
+from glue.core.message import Message
+
+__all__ = ['ComponentCatalog', 'get_component_catalog', 'CatalogComponentIDComboHelper']
+
+class ComponentCatalog:
+    """
+    The choices of component combos per dataset, shared by all combos of
+    the viewers and layers. Combos with the same filters (e.g. numeric
+    components) list a dataset's components once, instead of each combo
+    scanning every column when a layer is added.
+    """
+    # Dataset -> filters of a combo -> choices
+    _choices: "WeakKeyDictionary[BaseData, dict[tuple, list]]"
+    _last_message: "Union[Message, None]"
+
+    def __init__(self):
+        self._choices = WeakKeyDictionary()
+        self._last_message = None
+
+    def get_choices(self, data: "BaseData", filters: "tuple[bool, bool, bool, bool, bool, bool]") -> "list":
+        '''
+            Returns the choices of the dataset for a combo, `filters` are
+            its `numeric`, `datetime`, `categorical`, `pixel_coord`,
+            `world_coord` and `derived` options. Don't modify the list.
+        '''
+        data_choices = self._choices.setdefault(data, {})
+        if filters not in data_choices:
+            data_choices[filters] = self._scan(data, *filters)
+        return data_choices[filters]
+
+    def invalidate(self, data: "BaseData", message: "Union[Message, None]" = None):
+        '''
+            Forgets the choices of the dataset. Every combo of the dataset
+            is refreshed by the same hub message, only the first one of them
+            invalidates the choices, so the others can reuse its scan.
+        '''
+        if message is not None:
+            if message is self._last_message:
+                return
+            self._last_message = message
+
+        self._choices.pop(data, None)
+
+    @staticmethod
+    def _scan(data: "BaseData", numeric: "bool", datetime: "bool", categorical: "bool",
+              pixel_coord: "bool", world_coord: "bool", derived: "bool") -> "list":
+        # The same choices as `ComponentIDComboHelper.refresh()` for one dataset
+        choices = []
+        derived_components = [cid for cid in data.derived_components if cid.parent is data]
+
+        cids = [ChoiceSeparator('Main components')]
+        for cid in data.main_components:
+            kind = data.get_kind(cid)
+            if ((kind == 'numerical' and numeric) or
+                    (kind == 'datetime' and datetime) or
+                    (kind == 'categorical' and categorical)):
+                cids.append(cid)
+        if len(cids) > 1:
+            if pixel_coord or world_coord or (derived and len(derived_components) > 0):
+                choices += cids
+            else:
+                choices += cids[1:]
+
+        if numeric and derived:
+            cids = [ChoiceSeparator('Derived components')] + derived_components
+            if len(cids) > 1:
+                choices += cids
+
+        if pixel_coord or world_coord:
+            cids = [ChoiceSeparator('Coordinate components')]
+            if pixel_coord:
+                cids += data.pixel_component_ids
+            if world_coord:
+                cids += data.world_component_ids
+            if len(cids) > 1:
+                choices += cids
+
+        return choices
+
+_catalog = ComponentCatalog()
+
+def get_component_catalog() -> "ComponentCatalog":
+    return _catalog
+
+class CatalogComponentIDComboHelper(ComponentIDComboHelper):
+    """
+    A `ComponentIDComboHelper` that takes the choices of its datasets
+    from the shared `ComponentCatalog`.
+    """
+
+    def refresh(self, *args):
+        catalog = get_component_catalog()
+        # Called with the hub message when the components of a dataset changed
+        if len(args) > 0 and isinstance(args[0], Message) and isinstance(args[0].sender, BaseData):
+            catalog.invalidate(args[0].sender, args[0])
+
+        filters = (self.numeric, self.datetime, self.categorical, self.pixel_coord, self.world_coord, self.derived)
+        choices = [None] if self._none else []
+        for data in self._data:
+            if len(self._data) > 1:
+                choices.append(ChoiceSeparator(data.label or 'Untitled Data'))
+            choices += catalog.get_choices(data, filters)
+
+        self.choices = choices
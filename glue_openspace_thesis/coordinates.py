@@ -0,0 +1,126 @@
+from typing import Union
+
+import numpy as np
+
+from .workers import COLUMN_WORKERS, call_with_shared_arrays, create_shared_array, get_process_executor
+
+__all__ = [
+    'ICRS_BLOCK_SIZE', 'PROCESS_MIN_POINTS', 'icrs_to_galactic_matrix',
+    'icrs_to_galactic_cartesian', 'icrs_to_galactic_cartesian_processes'
+]
+
+ICRS_BLOCK_SIZE = 1 << 20 # Amount of points converted at once
+PROCESS_MIN_POINTS = 1 << 24 # Smaller tables aren't worth copying to worker processes
+
+_icrs_to_galactic_matrix: "Union[np.ndarray, None]" = None
+
+def icrs_to_galactic_matrix() -> "np.ndarray":
+    """
+    Returns the rotation matrix from ICRS to galactic Cartesian coordinates.
+    It's computed once by letting astropy transform the ICRS unit vectors,
+    so the conversion uses exactly the same frame definition as astropy.
+    """
+    global _icrs_to_galactic_matrix
+    if _icrs_to_galactic_matrix is None:
+        from astropy.coordinates import SkyCoord
+
+        basis = SkyCoord(
+            x=[1.0, 0.0, 0.0], y=[0.0, 1.0, 0.0], z=[0.0, 0.0, 1.0],
+            representation_type='cartesian', frame='icrs'
+        )
+        # Column j is the galactic direction of the j:th ICRS unit vector
+        _icrs_to_galactic_matrix = np.array(basis.galactic.cartesian.xyz.value, dtype=np.float64)
+
+    return _icrs_to_galactic_matrix
+
+def icrs_to_galactic_cartesian(ra: "np.ndarray", dec: "np.ndarray", distance: "np.ndarray",
+                               dtype=np.float64, out: "Union[np.ndarray, None]" = None,
+                               block_size: "int" = ICRS_BLOCK_SIZE,
+                               matrix: "Union[np.ndarray, None]" = None) -> "np.ndarray":
+    """
+    Converts ICRS coordinates (`ra` and `dec` in degrees) to galactic
+    Cartesian coordinates, in the unit of `distance`. Returns an array of
+    shape (3, n) with the x, y and z coordinates. If `out` is given, the
+    result is written into it, e.g. as big-endian float32 ready to be sent.
+
+    The points are converted in blocks of `block_size`, in the precision
+    of `dtype`, with `matrix` or else `icrs_to_galactic_matrix()`. The
+    result agrees with astropy's `SkyCoord.galactic` to a relative error
+    of 1e-12 with float64 and 1e-6 with float32.
+    """
+    n_points = len(ra)
+    if out is None:
+        out = np.empty((3, n_points), dtype=dtype)
+
+    if matrix is None:
+        matrix = icrs_to_galactic_matrix()
+    matrix = matrix.astype(dtype)
+    direction = np.empty((3, min(block_size, n_points)), dtype=dtype)
+
+    for start in range(0, n_points, block_size):
+        stop = min(start + block_size, n_points)
+        block = direction[:, :(stop - start)]
+
+        ra_rad = np.radians(np.asarray(ra[start:stop], dtype=dtype))
+        dec_rad = np.radians(np.asarray(dec[start:stop], dtype=dtype))
+        dist = np.asarray(distance[start:stop], dtype=dtype)
+
+        r_cos_dec = dist * np.cos(dec_rad)
+        np.multiply(r_cos_dec, np.cos(ra_rad), out=block[0])
+        np.multiply(r_cos_dec, np.sin(ra_rad), out=block[1])
+        np.multiply(dist, np.sin(dec_rad), out=block[2])
+
+        out[:, start:stop] = matrix @ block
+
+    return out
+
+def _convert_shared_block(ra, dec, distance, out, start, stop, dtype, matrix):
+    icrs_to_galactic_cartesian(
+        ra[start:stop], dec[start:stop], distance[start:stop],
+        dtype=dtype, out=out[:, start:stop], matrix=matrix
+    )
+
+def icrs_to_galactic_cartesian_processes(ra: "np.ndarray", dec: "np.ndarray", distance: "np.ndarray",
+                                         dtype=np.float64,
+                                         block_size: "int" = ICRS_BLOCK_SIZE) -> "np.ndarray":
+    """
+    Same as `icrs_to_galactic_cartesian`, but the blocks are converted by
+    worker processes. The columns are copied to shared memory once, and the
+    workers write big-endian float32 into a shared array of shape (3, n),
+    which is returned and can be sent without another copy. Tables smaller
+    than `PROCESS_MIN_POINTS` are converted in this process instead.
+    """
+    n_points = len(ra)
+    if n_points < PROCESS_MIN_POINTS or COLUMN_WORKERS <= 1:
+        return icrs_to_galactic_cartesian(
+            ra, dec, distance, dtype=dtype,
+            out=np.empty((3, n_points), dtype='>f4'), block_size=block_size
+        )
+
+    columns = []
+    for values in (ra, dec, distance):
+        column = create_shared_array((n_points,), np.float64)
+        column[:] = values
+        columns.append(column)
+    out = create_shared_array((3, n_points), '>f4')
+
+    try:
+        specs = [(array.shared_name, array.shape, array.dtype.str) for array in columns + [out]]
+        matrix = icrs_to_galactic_matrix()
+        executor = get_process_executor()
+        futures = [
+            executor.submit(
+                call_with_shared_arrays, specs, _convert_shared_block,
+                start, min(start + block_size, n_points), np.dtype(dtype).str, matrix
+            )
+            for start in range(0, n_points, block_size)
+        ]
+        for future in futures:
+            future.result()
+
+    finally:
+        # The memory stays mapped here until the arrays are collected
+        for array in columns + [out]:
+            array.unlink()
+
+    return out
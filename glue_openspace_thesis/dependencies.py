@@ -0,0 +1,106 @@
+from .simp import simp
+
+__all__ = [
+    'POSITION_KEYS', 'VELOCITY_KEYS', 'COLOR_KEYS', 'SIZE_KEYS', 'SUBSET_KEYS',
+    'PROPERTY_DATA_KEYS', 'UPLOAD_PROPERTIES', 'FRAME_PROPERTIES', 'LAYER_PROPERTIES',
+    'POINT_DATA_PROPERTIES', 'POSITION_PROPERTIES', 'get_changed_data_keys'
+]
+
+DataKey = simp.DataKey
+
+# The keys sent by each `add_*_to_outgoing_data_message()` of a layer artist
+POSITION_KEYS = frozenset({DataKey.X, DataKey.Y, DataKey.Z, DataKey.PointUnit})
+VELOCITY_KEYS = frozenset({
+    DataKey.U, DataKey.V, DataKey.W, DataKey.VelocityDistanceUnit, DataKey.VelocityTimeUnit,
+    DataKey.VelocityDayRecorded, DataKey.VelocityMonthRecorded, DataKey.VelocityYearRecorded,
+    DataKey.VelocityNanMode, DataKey.VelocityEnabled
+})
+COLOR_KEYS = frozenset({
+    DataKey.Red, DataKey.Green, DataKey.Blue, DataKey.ColormapEnabled,
+    DataKey.ColormapRed, DataKey.ColormapGreen, DataKey.ColormapBlue, DataKey.ColormapAlpha,
+    DataKey.ColormapMin, DataKey.ColormapMax, DataKey.ColormapNanR, DataKey.ColormapNanG,
+    DataKey.ColormapNanB, DataKey.ColormapNanMode, DataKey.ColormapAttributeData
+})
+SIZE_KEYS = frozenset({
+    DataKey.FixedSize, DataKey.LinearSizeEnabled, DataKey.LinearSizeMin,
+    DataKey.LinearSizeMax, DataKey.LinearSizeAttributeData
+})
+SUBSET_KEYS = frozenset({DataKey.SubsetParent, DataKey.SubsetRanges, DataKey.SubsetBitset})
+
+# Property of the viewer or layer state -> the keys that are sent again when it
+# changes. 'subset_state' isn't a state property, the viewer reports its changes
+PROPERTY_DATA_KEYS = {
+    # Positions
+    'coordinate_system': POSITION_KEYS,
+    'x_att': frozenset({DataKey.X}),
+    'y_att': frozenset({DataKey.Y}),
+    'z_att': frozenset({DataKey.Z}),
+    'ra_att': frozenset({DataKey.X, DataKey.Y, DataKey.Z}),
+    'dec_att': frozenset({DataKey.X, DataKey.Y, DataKey.Z}),
+    'icrs_dist_att': frozenset({DataKey.X, DataKey.Y, DataKey.Z}),
+    'icrs_float32': frozenset({DataKey.X, DataKey.Y, DataKey.Z}),
+    'cartesian_unit_att': frozenset({DataKey.PointUnit}),
+    'icrs_dist_unit_att': frozenset({DataKey.PointUnit}),
+    # Velocity
+    'velocity_mode': VELOCITY_KEYS,
+    'u_att': frozenset({DataKey.U}),
+    'v_att': frozenset({DataKey.V}),
+    'w_att': frozenset({DataKey.W}),
+    'vel_distance_unit_att': frozenset({DataKey.VelocityDistanceUnit}),
+    'vel_time_unit_att': frozenset({DataKey.VelocityTimeUnit}),
+    'vel_day_rec': frozenset({DataKey.VelocityDayRecorded}),
+    'vel_month_rec': frozenset({DataKey.VelocityMonthRecorded}),
+    'vel_year_rec': frozenset({DataKey.VelocityYearRecorded}),
+    'vel_nan_mode': frozenset({DataKey.VelocityNanMode}),
+    # Color
+    'color': frozenset({DataKey.Red, DataKey.Green, DataKey.Blue}),
+    'alpha': frozenset({DataKey.Alpha}),
+    'visible': frozenset({DataKey.Visibility}),
+    'color_mode': COLOR_KEYS,
+    'cmap_nan_mode': frozenset({DataKey.ColormapNanMode, DataKey.ColormapNanR, DataKey.ColormapNanG, DataKey.ColormapNanB}),
+    'cmap_nan_color': frozenset({DataKey.ColormapNanR, DataKey.ColormapNanG, DataKey.ColormapNanB}),
+    'cmap_vmin': frozenset({DataKey.ColormapMin}),
+    'cmap_vmax': frozenset({DataKey.ColormapMax}),
+    'cmap': frozenset({DataKey.ColormapRed, DataKey.ColormapGreen, DataKey.ColormapBlue, DataKey.ColormapAlpha}),
+    'cmap_att': frozenset({DataKey.ColormapAttributeData}),
+    # Size
+    'size': frozenset({DataKey.FixedSize}),
+    'size_mode': SIZE_KEYS,
+    'size_att': frozenset({DataKey.LinearSizeAttributeData}),
+    'size_vmin': frozenset({DataKey.LinearSizeMin}),
+    'size_vmax': frozenset({DataKey.LinearSizeMax}),
+    # Subsets
+    'subset_mode': SUBSET_KEYS,
+    'subset_state': SUBSET_KEYS | {DataKey.ColormapAttributeData, DataKey.LinearSizeAttributeData},
+}
+
+# Properties that change which rows are sent, so the upload starts over
+UPLOAD_PROPERTIES = frozenset({'upload_mode', 'progressive_fraction', 'point_order', 'compact_nan', 'time_att'})
+# Properties of the playback of the frames
+FRAME_PROPERTIES = frozenset({'frame_rate', 'frame_encoding'})
+
+# Changes of other properties (e.g. 'show_stats') don't concern the layers
+LAYER_PROPERTIES = frozenset(PROPERTY_DATA_KEYS) | UPLOAD_PROPERTIES | FRAME_PROPERTIES
+
+# Properties that change the values of the per-point data
+POINT_DATA_PROPERTIES = frozenset({
+    'coordinate_system', 'x_att', 'y_att', 'z_att',
+    'ra_att', 'dec_att', 'icrs_dist_att',
+    'velocity_mode', 'u_att', 'v_att', 'w_att', 'time_att',
+    'color_mode', 'cmap_att', 'size_mode', 'size_att'
+})
+
+# Properties that change the positions of the points
+POSITION_PROPERTIES = frozenset(
+    name for name, keys in PROPERTY_DATA_KEYS.items()
+    if len(keys & {DataKey.X, DataKey.Y, DataKey.Z}) > 0
+)
+
+def get_changed_data_keys(changed: "set[str]") -> "set[simp.DataKey]":
+    '''
+        Returns the keys that are sent again for the changed properties.
+    '''
+    data_keys = set()
+    for name in changed:
+        data_keys |= PROPERTY_DATA_KEYS.get(name, frozenset())
+    return data_keys
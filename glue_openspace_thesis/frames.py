@@ -0,0 +1,305 @@
+import logging
+from queue import Empty, Full, Queue
+from threading import Event, Thread
+import time
+from typing import TYPE_CHECKING, Union
+
+import numpy as np
+
+from .simp import simp
+from .utils import float32_array_to_bytes, float32_to_bytes, int32_to_bytes
+from .tracing import span, traced
+
+if TYPE_CHECKING:
+    from .layer_artist import OpenSpaceLayerArtist
+
+__all__ = [
+    'FRAME_PREFETCH', 'FRAME_KEYFRAME_INTERVAL', 'FRAME_POSITION_KEYS', 'group_rows_by_step',
+    'Frames', 'EncodedFrame', 'FramePlayback'
+]
+
+FRAME_PREFETCH = 4 # Frames encoded ahead of playback
+# Frames between full frames when sending deltas, so the
+# rounding errors of the float32 deltas don't add up in OpenSpace
+FRAME_KEYFRAME_INTERVAL = 30
+FRAME_POLL_TIME = 0.05 # Time to wait before checking if the initial data has been sent
+
+# Keys of the positions a frame replaces, only one of both sets is in a message
+FRAME_POSITION_KEYS = (
+    simp.DataKey.X, simp.DataKey.Y, simp.DataKey.Z,
+    simp.DataKey.FrameDeltaX, simp.DataKey.FrameDeltaY, simp.DataKey.FrameDeltaZ
+)
+
+def group_rows_by_step(steps: "np.ndarray") -> "tuple[np.ndarray, np.ndarray, np.ndarray]":
+    """
+    Groups the rows by their time step. Returns the time steps in increasing
+    order, the rows sorted by time step and the offsets of the rows of every
+    time step in them, with one more offset for the end. The rows of a time
+    step keep their table order, so the same particles line up in all frames
+    when every time step lists them in the same order. Rows without a time
+    step (NaN) are left out.
+    """
+    steps = np.asarray(steps, dtype=np.float64).ravel()
+    rows = np.flatnonzero(~np.isnan(steps))
+    rows = rows[np.argsort(steps[rows], kind='stable')]
+
+    times, starts = np.unique(steps[rows], return_index=True)
+    offsets = np.append(starts, len(rows))
+    return times, rows, offsets
+
+class Frames:
+    """
+    The rows of a layer grouped into one frame per time step.
+    """
+    times: "np.ndarray"
+    _rows: "np.ndarray"
+    _offsets: "np.ndarray"
+
+    def __init__(self, steps: "np.ndarray"):
+        self.times, self._rows, self._offsets = group_rows_by_step(steps)
+
+    def __len__(self) -> "int":
+        return len(self.times)
+
+    def rows(self, index: "int") -> "np.ndarray":
+        return self._rows[self._offsets[index]:self._offsets[index + 1]]
+
+    def has_equal_steps(self) -> "bool":
+        '''
+            Returns True if every time step has the same amount of rows.
+            Only then the frames line up with the columns that are sent
+            once for the points of the first frame, e.g. colors.
+        '''
+        n_rows = np.diff(self._offsets)
+        return bool(np.all(n_rows == n_rows[0])) if len(n_rows) > 0 else True
+
+class EncodedFrame:
+    """
+    The entries of a frame, ready to be put in outgoing message. `deltas` is
+    None if the frame can only be sent in full, e.g. when the previous frame
+    was skipped or has another amount of points.
+    """
+    tick: "int"
+    positions: "dict[simp.DataKey, tuple[bytes, int]]"
+    deltas: "Union[dict[simp.DataKey, tuple[bytes, int]], None]"
+
+    def __init__(self, tick: "int", positions, deltas=None):
+        self.tick = tick
+        self.positions = positions
+        self.deltas = deltas
+
+class FramePlayback:
+    """
+    Sends the frames of a layer after each other at a fixed frame rate,
+    looping back to the first frame after the last one. A worker encodes
+    the next frames ahead of playback. Frames that aren't ready in time,
+    or that the sender didn't get to before the next frame, are dropped,
+    so playback never falls behind the clock. A frame after a dropped one
+    is sent in full rather than as a difference to the previous frame, and
+    so are every `keyframe_interval`-th frame and the first frame of a loop.
+    """
+    _layer: "OpenSpaceLayerArtist"
+    _frames: "Frames"
+    _frame_rate: "float"
+    _use_deltas: "bool"
+    _keyframe_interval: "int"
+    _queue: "Queue[EncodedFrame]"
+    _early_frame: "Union[EncodedFrame, None]"
+    _target_tick: "int"
+    _cancelled: "Event"
+    _threads: "list[Thread]"
+
+    n_sent: "int"
+    n_dropped: "int"
+
+    def __init__(self, layer: "OpenSpaceLayerArtist", frames: "Frames", frame_rate: "float",
+                 use_deltas: "bool" = False, prefetch: "int" = FRAME_PREFETCH,
+                 keyframe_interval: "int" = FRAME_KEYFRAME_INTERVAL):
+        self._layer = layer
+        self._frames = frames
+        self._frame_rate = frame_rate
+        self._use_deltas = use_deltas
+        self._keyframe_interval = keyframe_interval
+        self._queue = Queue(maxsize=prefetch)
+        self._early_frame = None
+        # The first frame is sent with the initial data
+        self._target_tick = 1
+        self._cancelled = Event()
+        self._threads = []
+
+        self.n_sent = 0
+        self.n_dropped = 0
+
+    def start(self):
+        self._threads = [
+            Thread(target=self._encode_loop, name='openspace-frame-encoder', daemon=True),
+            Thread(target=self._playback_loop, name='openspace-frame-playback', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_running(self) -> "bool":
+        return any(thread.is_alive() for thread in self._threads) and not self._cancelled.is_set()
+
+    def get_frame_index(self, tick: "int") -> "int":
+        return tick % len(self._frames)
+
+    def is_keyframe(self, tick: "int") -> "bool":
+        return self.get_frame_index(tick) == 0 or tick % self._keyframe_interval == 0
+
+    @traced(category='encode')
+    def encode_frame(self, tick: "int", previous: "Union[tuple[int, list[np.ndarray]], None]") -> "tuple[EncodedFrame, list[np.ndarray]]":
+        '''
+            Encodes the frame shown at `tick`. `previous` is the tick and the
+            positions of the last encoded frame, which the deltas refer to.
+        '''
+        index = self.get_frame_index(tick)
+        positions = [
+            np.asarray(column, dtype=np.float32)
+            for column in self._layer.get_positions(self._frames.rows(index))
+        ]
+        n_points = len(positions[0])
+
+        header = {
+            simp.DataKey.FrameIndex: (int32_to_bytes(index), 1),
+            simp.DataKey.FrameTime: (float32_to_bytes(float(self._frames.times[index])), 1)
+        }
+
+        full = dict(header)
+        for data_key, column in zip((simp.DataKey.X, simp.DataKey.Y, simp.DataKey.Z), positions):
+            full[data_key] = (float32_array_to_bytes(column), n_points)
+
+        deltas = None
+        if self._use_deltas and not self.is_keyframe(tick) and previous is not None\
+                and previous[0] == tick - 1 and len(previous[1][0]) == n_points:
+            deltas = dict(header)
+            for data_key, column, previous_column in zip(
+                (simp.DataKey.FrameDeltaX, simp.DataKey.FrameDeltaY, simp.DataKey.FrameDeltaZ),
+                positions, previous[1]
+            ):
+                deltas[data_key] = (float32_array_to_bytes(column - previous_column), n_points)
+
+        return EncodedFrame(tick, full, deltas), positions
+
+    def _encode_loop(self):
+        previous = None
+        tick = self._target_tick
+
+        try:
+            while not self._cancelled.is_set():
+                # Frames that playback has passed already aren't encoded
+                tick = max(tick, self._target_tick)
+                frame, positions = self.encode_frame(tick, previous)
+                previous = (tick, positions)
+
+                while not self._cancelled.is_set():
+                    try:
+                        self._queue.put(frame, timeout=FRAME_POLL_TIME)
+                        break
+                    except Full:
+                        continue
+
+                tick += 1
+
+        except Exception as exc:
+            self._layer._viewer.log(f'Exception when encoding frame: {exc}', logging.WARNING)
+            self.cancel()
+
+    def _take_frame(self, tick: "int", timeout: "float") -> "Union[EncodedFrame, None]":
+        '''
+            Returns the encoded frame of `tick`, discarding the older
+            frames, or None if it isn't ready within `timeout` seconds.
+        '''
+        deadline = time.monotonic() + timeout
+        while True:
+            frame = self._early_frame
+            self._early_frame = None
+
+            if frame is None:
+                try:
+                    frame = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except Empty:
+                    return None
+
+            if frame.tick == tick:
+                return frame
+
+            if frame.tick > tick:
+                self._early_frame = frame
+                return None
+
+    def _initial_data_is_pending(self) -> "bool":
+        viewer = self._layer._viewer
+        identifier = self._layer.get_identifier_str()
+        return len(viewer._outgoing_data_message.get(identifier, {})) > 0
+
+    def _add_frame(self, frame: "EncodedFrame", keyframe: "bool") -> "bool":
+        '''
+            Puts the frame in outgoing message. Returns False if it replaced
+            a frame that wasn't sent yet, so the next frame must be in full.
+        '''
+        viewer = self._layer._viewer
+        with span('Wait for outgoing message', 'lock'):
+            viewer._outgoing_data_message_mutex.acquire()
+            viewer._outgoing_data_message_condition.acquire()
+
+        try:
+            if self._cancelled.is_set():
+                return False
+
+            identifier = self._layer.get_identifier_str()
+            replaced = simp.DataKey.FrameIndex in viewer._outgoing_data_message.get(identifier, {})
+            if replaced:
+                self.n_dropped += 1
+
+            use_deltas = frame.deltas is not None and not keyframe and not replaced
+            for data_key in FRAME_POSITION_KEYS:
+                self._layer.remove_from_outgoing_data_message(data_key)
+            for data_key, entry in (frame.deltas if use_deltas else frame.positions).items():
+                self._layer.add_to_outgoing_data_message(data_key, entry)
+
+            self.n_sent += 1
+            viewer._outgoing_data_message_condition.notify()
+
+        finally:
+            viewer._outgoing_data_message_mutex.release()
+            viewer._outgoing_data_message_condition.release()
+
+        return not replaced
+
+    def _playback_loop(self):
+        viewer = self._layer._viewer
+
+        # The frames follow the points of the first frame
+        while self._initial_data_is_pending():
+            if self._cancelled.wait(FRAME_POLL_TIME):
+                return
+
+        period = 1.0 / self._frame_rate
+        start = time.monotonic() - self._target_tick * period
+        tick = self._target_tick
+        keyframe = False
+
+        while not self._cancelled.wait(max(0.0, start + tick * period - time.monotonic())):
+            # Skips the frames whose time has passed
+            current_tick = int((time.monotonic() - start) / period)
+            if current_tick > tick:
+                self.n_dropped += current_tick - tick
+                tick = current_tick
+                keyframe = True
+
+            self._target_tick = tick
+            frame = self._take_frame(tick, period)
+            if frame is None:
+                # Wasn't encoded in time
+                self.n_dropped += 1
+                keyframe = True
+            else:
+                keyframe = not self._add_frame(frame, keyframe)
+
+            tick += 1
+
+        viewer.debug('Frame playback stopped, %d frames sent, %d dropped', 2, self.n_sent, self.n_dropped)
@@ -0,0 +1,131 @@
+import logging
+from threading import Condition, Event, Lock
+from typing import Union
+
+from glue.core.subset import SubsetState
+
+from .simp import simp
+from .session import SimpSession, get_session_manager
+from .viewer_base import ConnectionState, OpenSpaceViewerBase
+from .viewer_state import OpenSpaceViewerState
+from .layer_artist import OpenSpaceLayerArtist
+from .metrics import PipelineMetrics
+from .log import logger
+
+__all__ = ['HEADLESS_CONNECT_TIMEOUT', 'HeadlessOpenSpaceViewer']
+
+HEADLESS_CONNECT_TIMEOUT = 10.0 # Seconds to wait for the handshake
+
+class HeadlessOpenSpaceViewer(OpenSpaceViewerBase):
+    """
+    An OpenSpace viewer without a GUI, which sends the layers of its
+    datasets like the Qt viewer does. Used to test and benchmark the
+    plugin without Qt, e.g. against `MockOpenSpace`.
+    """
+    _session: "Union[SimpSession, None]"
+    _connected: "Event"
+    _received: "Condition"
+    n_received: "int"
+    logs: "list[str]"
+    selections: "list[SubsetState]"
+
+    def __init__(self, state: "Union[OpenSpaceViewerState, None]" = None):
+        self.state = OpenSpaceViewerState() if state is None else state
+        self.layers = []
+
+        self._socket = None
+        self._session = None
+        self._send_lock = Lock()
+        self._lost_connection = False
+
+        self._outgoing_data_message = {}
+        self._outgoing_data_message_mutex = Lock()
+        self._outgoing_data_message_condition = Condition()
+        self._next_layer = 0
+        self.metrics = PipelineMetrics()
+        self.profiler = None
+        self._payload_cache = None
+
+        self._connection_state = ConnectionState.Disconnected
+        self._connected = Event()
+        self._received = Condition()
+        self.n_received = 0
+        self.logs = []
+        self.selections = []
+
+        self.state.add_callback('profile_cycles', self._on_profile_cycles_change)
+
+    def log(self, msg: "str", level: "int" = logging.INFO):
+        self.logs.append(msg)
+        logger.log(level, 'OpenSpace Viewer: %s', msg)
+
+    def apply_selection(self, subset_state: "SubsetState"):
+        self.selections.append(subset_state)
+
+    def set_connection_state(self, new_state: "ConnectionState") -> "ConnectionState":
+        old_connection_state = self._connection_state
+        self._connection_state = new_state
+        return old_connection_state
+
+    def add_data(self, data) -> "OpenSpaceLayerArtist":
+        layer = OpenSpaceLayerArtist(self, self.state, layer=data)
+        self.layers.append(layer)
+        self.state.layers.append(layer.state)
+        layer.update()
+        return layer
+
+    def remove_data(self, data):
+        for layer in [layer for layer in self.layers if layer.state.layer is data]:
+            layer.clear()
+            self.layers.remove(layer)
+            self.state.layers.remove(layer.state)
+
+    def connect(self, host: "str", port: "int", timeout: "float" = HEADLESS_CONNECT_TIMEOUT):
+        self._connected.clear()
+        self.set_connection_state(ConnectionState.Connecting)
+        self._session = get_session_manager().attach(self, host, port)
+
+        if not self._connected.wait(timeout):
+            self.disconnect()
+            raise simp.SimpError(f'No handshake from {host}:{port}')
+
+    def disconnect(self):
+        if self._session is None:
+            return
+
+        for layer in self.layers:
+            layer.cancel_progressive_upload()
+            layer.cancel_frame_playback()
+
+        session = self._session
+        self._session = None
+        get_session_manager().detach(self, session)
+
+        self._socket = None
+        self._outgoing_data_message_condition = Condition()
+        self._send_lock = Lock()
+        for layer in self.layers:
+            layer.state.has_sent_initial_data = False
+
+        self.set_connection_state(ConnectionState.Disconnected)
+
+    def on_session_connected(self):
+        super(HeadlessOpenSpaceViewer, self).on_session_connected()
+        self._connected.set()
+
+    def on_session_closed(self):
+        self.disconnect()
+
+    def receive_subject(self, message_type: "simp.MessageType", subject: "bytearray"):
+        super(HeadlessOpenSpaceViewer, self).receive_subject(message_type, subject)
+
+        with self._received:
+            self.n_received += 1
+            self._received.notify_all()
+
+    def wait_for_received(self, n_received: "int", timeout: "Union[float, None]" = None) -> "bool":
+        '''
+            Waits until `n_received` messages from OpenSpace have been handled.
+        '''
+        with self._received:
+            return self._received.wait_for(lambda: self.n_received >= n_received, timeout)
@@ -1,17 +1,34 @@
+from concurrent.futures import Future
+import logging
 from typing import TYPE_CHECKING, Union
 from matplotlib.colors import to_hex, to_rgb
-from astropy.coordinates import SkyCoord
-from astropy import units as ap_u
 
 from glue.core import Data, Subset
+from glue.core.exceptions import IncompatibleAttribute
+from glue.core.subset import ElementSubsetState
 from glue.viewers.common.layer_artist import LayerArtist
 import numpy as np
 
 from .layer_state import OpenSpaceLayerState
 from .viewer_state import OpenSpaceViewerState
 from .simp import simp
-from .utils import (bool_to_bytes, float32_list_to_bytes, float32_to_bytes,
-                    int32_to_bytes, string_to_bytes,
+from .lod import PROGRESSIVE_MIN_POINTS, ProgressiveUpload, progressive_order
+from .frames import FramePlayback, Frames
+from .spatial import SpatialIndex
+from .column_source import STREAM_MIN_POINTS, ColumnSource, Float32ColumnPayload
+from .coordinates import icrs_to_galactic_cartesian, icrs_to_galactic_cartesian_processes
+from .cache import get_data_revision, get_position_cache
+from .payload_cache import hash_columns
+from .statistics import get_statistics_service
+from .workers import get_column_executor, resolve_column_jobs
+from .tracing import span, traced
+from .profiling import profiled
+from .dependencies import (COLOR_KEYS, FRAME_PROPERTIES, LAYER_PROPERTIES, POINT_DATA_PROPERTIES,
+                           POSITION_KEYS, POSITION_PROPERTIES, SIZE_KEYS, SUBSET_KEYS, VELOCITY_KEYS,
+                           get_changed_data_keys)
+from .utils import (bool_to_bytes, float32_array_to_bytes, float32_list_to_bytes, float32_to_bytes,
+                    int32_to_bytes, int32_array_to_bytes, string_to_bytes,
+                    mask_to_bitset, mask_to_ranges, ranges_to_indices, all_nan_mask,
                     get_normalized_list_of_equal_strides) 
 
 __all__ = ['OpenSpaceLayerArtist']
@@ -32,25 +49,51 @@ class OpenSpaceLayerArtist(LayerArtist):
 
     _has_updated_points: "bool"
 
+    _row_order: "Union[np.ndarray, None]"
+    _n_resident: "Union[int, None]"
+    _progressive_upload: "Union[ProgressiveUpload, None]"
+    _frames: "Union[Frames, None]"
+    _frame_playback: "Union[FramePlayback, None]"
+    _spatial_index: "Union[SpatialIndex, None]"
+    _valid_rows: "Union[np.ndarray, None]"
+    _sent_index_of_row: "Union[np.ndarray, None]"
+    _restored_positions_key: "Union[tuple, None]"
+    _restored_positions: "Union[np.ndarray, None]"
+    _submit_column_jobs: "bool"
+    _changed_properties: "set[str]"
+
     def __init__(self, viewer, *args, **kwargs):
         super(OpenSpaceLayerArtist, self).__init__(*args, **kwargs)
 
         self._viewer = viewer
+        self._changed_properties = set()
 
-        self.state.add_global_callback(self.update)
-        self._viewer_state.add_global_callback(self.update)
+        self.state.add_global_callback(self._on_state_change)
+        self._viewer_state.add_global_callback(self._on_state_change)
 
         self._display_name = None
         self._state = None
 
         self._has_updated_points = False
 
+        self._row_order = None
+        self._n_resident = None
+        self._progressive_upload = None
+        self._frames = None
+        self._frame_playback = None
+        self._spatial_index = None
+        self._valid_rows = None
+        self._sent_index_of_row = None
+        self._restored_positions_key = None
+        self._restored_positions = None
+        self._submit_column_jobs = False
+
     def add_to_outgoing_data_message(self, data_key: "simp.DataKey", entry: "tuple[bytearray, int]"):
         '''
             DANGER! You need to lock outgoing message
             mutex before calling this function
         '''
-        self._viewer.debug(f'Executing add_to_outgoing_data_message()', 4)
+        self._viewer.debug('Executing add_to_outgoing_data_message()', 4)
         identifier = self.get_identifier_str()
         if not identifier:
             return
@@ -59,15 +102,92 @@ class OpenSpaceLayerArtist(LayerArtist):
             self._viewer._outgoing_data_message[identifier] = {}
 
         self._viewer._outgoing_data_message[identifier][data_key] = entry
+        self._viewer.metrics.on_enqueued(identifier, encoded=not isinstance(entry, Future))
+
+    def remove_from_outgoing_data_message(self, data_key: "simp.DataKey"):
+        '''
+            DANGER! You need to lock outgoing message
+            mutex before calling this function
+        '''
+        identifier = self.get_identifier_str()
+        if not identifier or not identifier in self._viewer._outgoing_data_message:
+            return
+
+        self._viewer._outgoing_data_message[identifier].pop(data_key, None)
 
+    def add_column_to_outgoing_data_message(self, data_key: "simp.DataKey", get_entry, *args):
+        '''
+            Adds the entry returned by `get_entry(*args)` to outgoing message.
+            While the initial data is added, the entry is extracted and encoded
+            by a worker instead, and resolved by `resolve_column_jobs()`.
+
+            DANGER! You need to lock outgoing message
+            mutex before calling this function
+        '''
+        if not self._submit_column_jobs:
+            self.add_to_outgoing_data_message(data_key, get_entry(*args))
+            return
+
+        self.add_to_outgoing_data_message(data_key, get_column_executor().submit(get_entry, *args))
+
+    def resolve_column_jobs(self) -> "bool":
+        '''
+            Waits for the columns extracted by workers and puts them in
+            outgoing message, in the order their keys were added. Returns
+            False if a position failed, the message of the layer is then
+            removed, since its other columns have no points to refer to.
+            Raises IncompatibleAttribute if a column no longer fits the layer.
+
+            DANGER! You need to lock outgoing message
+            mutex before calling this function
+        '''
+        identifier = self.get_identifier_str()
+        if not identifier or not identifier in self._viewer._outgoing_data_message:
+            return True
+
+        failed = []
+        def on_error(data_key, exc):
+            if isinstance(exc, IncompatibleAttribute):
+                raise exc
+            self._viewer.log(f'Exception when adding {data_key} to message: {exc}', logging.WARNING)
+            failed.append(data_key)
+
+        resolve_column_jobs(self._viewer._outgoing_data_message[identifier], on_error)
+        if len(POSITION_KEYS.intersection(failed)) > 0:
+            self._viewer._outgoing_data_message.pop(identifier, None)
+            self._viewer.metrics.discard(identifier)
+            self._viewer.log(f'The positions of layer {self.state.layer.label} failed, it\'s not sent', logging.WARNING)
+            return False
+
+        self._viewer.metrics.on_encoded(identifier)
+        return True
+
+    def _on_state_change(self, **kwargs):
+        # Only properties in the dependency graph concern the layer
+        changed = LAYER_PROPERTIES.intersection(kwargs)
+        if len(changed) == 0:
+            return
+
+        self._changed_properties |= changed
+        self.update()
+
+    def pop_changed_properties(self) -> "set[str]":
+        '''
+            Returns the names of the properties that changed
+            since the last call, and forgets them.
+        '''
+        changed, self._changed_properties = self._changed_properties, set()
+        return changed
+
+    @traced(category='layer')
     def update(self, **kwargs):
-        self._viewer.debug(f'Executing update()', 4)
+        self._viewer.debug('Executing update()', 4)
         # Check if connected
         if self._viewer._connection_state != self._viewer.ConnectionState.Connected:
             return
         # if isinstance(self.state.layer, Data) or isinstance(self.state.layer, Subset):
         #     self._viewer.check_and_add_instance(self.state.layer)
-        self._viewer.debug(f'\tConnected, we can update', 4)
+        self._viewer.debug('\tConnected, we can update', 4)
 
         force = kwargs.get('force', False)
         try:
@@ -77,25 +197,31 @@ class OpenSpaceLayerArtist(LayerArtist):
                     raise simp.SimpError('Cannot set GUI name')
 
         except simp.SimpError as exc:
-            self._viewer.log(f'Exception in update: {exc.message}')
+            self._viewer.log(f'Exception in update: {exc.message}', logging.WARNING)
             return
 
         except Exception as exc:
-            self._viewer.log(f'Exception in update: {exc}')
+            self._viewer.log(f'Exception in update: {exc}', logging.WARNING)
             return
 
         if self._viewer._socket is None:
             return
 
         if self.state.has_sent_initial_data:
-            self._on_attribute_change(force)
+            self._on_attribute_change(force, kwargs.get('subset_changed', False))
         else:
             self.add_initial_data_to_message()
 
-    def _on_attribute_change(self, force):
-        self._viewer.debug(f'Executing _on_attribute_change()', 4)
+    @traced(category='layer')
+    def _on_attribute_change(self, force, subset_changed=False):
+        self._viewer.debug('Executing _on_attribute_change()', 4)
         changed = self.pop_changed_properties()
 
+        # Subset selections aren't part of the layer state,
+        # so the viewer tells us explicitly when they change
+        if subset_changed:
+            changed.add('subset_state')
+
         if len(changed) == 0 and not force:
             return
 
@@ -118,33 +244,126 @@ class OpenSpaceLayerArtist(LayerArtist):
         if self.state.will_send_message is False:
             return
 
-        self._viewer._outgoing_data_message_mutex.acquire()
-        self._viewer._outgoing_data_message_condition.acquire()
+        # Start over from a new sample rather than waiting
+        # for a refinement of outdated values to finish
+        if self._should_restart_upload(changed):
+            self.add_initial_data_to_message()
+            return
 
-        if 'alpha' in changed:
-            self.add_to_outgoing_data_message(simp.DataKey.Alpha, self.get_opacity())
+        if self._frames is not None and len(FRAME_PROPERTIES & changed) > 0:
+            self.start_frame_playback()
 
-        if 'visible' in changed:
-            self.add_to_outgoing_data_message(
-                simp.DataKey.Visibility,
-                self.is_enabled(simp.DataKey.Visibility)
-            )
+        # Only the encoders of the keys that depend on the changes are run
+        data_keys = get_changed_data_keys(changed)
+        if len(data_keys) == 0:
+            return
+
+        if not self.has_position_attributes():
+            self.disable_incompatible()
+            return
 
-        self.add_color_to_outgoing_data_message(changed=changed)
+        with span('Wait for outgoing message', 'lock'):
+            self._viewer._outgoing_data_message_mutex.acquire()
+            self._viewer._outgoing_data_message_condition.acquire()
+
+        incompatible = False
+        try:
+            if simp.DataKey.Alpha in data_keys:
+                self.add_to_outgoing_data_message(simp.DataKey.Alpha, self.get_opacity())
+
+            if simp.DataKey.Visibility in data_keys:
+                self.add_to_outgoing_data_message(
+                    simp.DataKey.Visibility,
+                    self.is_enabled(simp.DataKey.Visibility)
+                )
 
-        self.add_size_to_outgoing_data_message(changed=changed)
+            if len(COLOR_KEYS & data_keys) > 0:
+                self.add_color_to_outgoing_data_message(changed=changed)
 
-        self.add_points_to_outgoing_data_message(changed=changed)
+            if len(SIZE_KEYS & data_keys) > 0:
+                self.add_size_to_outgoing_data_message(changed=changed)
 
-        self.add_velocity_to_outgoing_data_message(changed=changed)
+            if len(POSITION_KEYS & data_keys) > 0:
+                self.add_points_to_outgoing_data_message(changed=changed)
 
-        self._viewer._outgoing_data_message_condition.notify()
+            if len(SUBSET_KEYS & data_keys) > 0:
+                self.add_subset_to_outgoing_data_message(changed=changed)
 
-        self._viewer._outgoing_data_message_mutex.release()
-        self._viewer._outgoing_data_message_condition.release()
+            if len(VELOCITY_KEYS & data_keys) > 0:
+                self.add_velocity_to_outgoing_data_message(changed=changed)
+
+            self._viewer._outgoing_data_message_condition.notify()
+
+        except IncompatibleAttribute:
+            # The message of the layer is incomplete, it's not sent
+            self._viewer._outgoing_data_message.pop(self.get_identifier_str(), None)
+            incompatible = True
+
+        finally:
+            self._viewer._outgoing_data_message_mutex.release()
+            self._viewer._outgoing_data_message_condition.release()
+
+        if incompatible:
+            self.disable_incompatible()
+            return
 
         self.redraw()
 
+    def get_position_attributes(self) -> "list":
+        if self._viewer_state.coordinate_system == 'ICRS':
+            atts = [self._viewer_state.ra_att, self._viewer_state.dec_att, self._viewer_state.icrs_dist_att]
+        else:
+            atts = [self._viewer_state.x_att, self._viewer_state.y_att, self._viewer_state.z_att]
+        return [att for att in atts if att is not None]
+
+    def has_position_attributes(self) -> "bool":
+        '''
+            Returns False if the dataset of the layer can't derive the
+            position attributes of the viewer, which are picked from
+            one of the datasets of the viewer.
+        '''
+        try:
+            for att in self.get_position_attributes():
+                self.state.layer.data.get_kind(att)
+        except IncompatibleAttribute:
+            return False
+        return True
+
+    def disable_incompatible(self):
+        '''
+            Disables the layer like glue's artists do, which removes it
+            from OpenSpace. All its data is sent again once it's enabled.
+        '''
+        self.cancel_progressive_upload()
+        self.cancel_frame_playback()
+        self.state.has_sent_initial_data = False
+        self.disable_invalid_attributes(*self.get_position_attributes())
+
+    def _should_restart_upload(self, changed) -> "bool":
+        if self.is_subset_mask():
+            return False
+
+        # In 'Points' mode the points of a subset are its members, all
+        # their values change when the selection does
+        if isinstance(self.state.layer, Subset) and 'subset_state' in changed:
+            return True
+
+        if 'upload_mode' in changed or 'progressive_fraction' in changed or 'point_order' in changed:
+            return True
+
+        if 'compact_nan' in changed and isinstance(self.state.layer, Data):
+            return True
+
+        # Entering or leaving frames changes which rows are sent
+        if ('velocity_mode' in changed or 'time_att' in changed) and (self._frames is not None or self.uses_frames()):
+            return True
+
+        # The octree order, the compacted rows and the frames depend on the positions
+        if (self.uses_spatial_order() or self.uses_nan_compaction() or self._frames is not None) and len(POSITION_PROPERTIES & changed) > 0:
+            return True
+
+        return self.is_progressive_upload_running() and len(POINT_DATA_PROPERTIES & changed) > 0
+
     def _clean_properties(self, changed):
         if 'alpha' in changed:
             if self.state.alpha > 1.0:
@@ -158,6 +377,7 @@ class OpenSpaceLayerArtist(LayerArtist):
             elif self.state.size < 0.0:
                 self.state.size = 0.0
 
+    @traced(category='receive')
     def receive_message(self, message_type: "simp.MessageType", subject: "bytearray", offset: "int"):
         self.state.will_send_message = False
 
@@ -217,6 +437,11 @@ class OpenSpaceLayerArtist(LayerArtist):
             # Toggle Visibility
             elif data_key == simp.DataKey.Visibility:
                 self.state.visible, offset = simp.read_bool(subject, offset)
+
+            # Points selected in OpenSpace
+            elif data_key == simp.DataKey.SubsetRanges:
+                ranges, offset = simp.read_int32_array(subject, offset)
+                self.receive_selection(ranges_to_indices(ranges))
  
             else:
                 raise simp.SimpError(
@@ -224,7 +449,7 @@ class OpenSpaceLayerArtist(LayerArtist):
                     + f'support the attribute \'{data_key}\'.'
                 )
 
-        self._viewer.log(f'new_color={new_color}')
+        self._viewer.debug('new_color=%s', 3, new_color)
         new_color = tuple(new_color)
         if new_color[0] != color[0] or new_color[1] != color[1] or new_color[2] != color[2]:
             self.state.color = to_hex(new_color, keep_alpha=False)
@@ -235,58 +460,38 @@ class OpenSpaceLayerArtist(LayerArtist):
             Else, check which properties has changed and add 
             relevant data to outgoing message.
         '''
-        self._viewer.debug(f'Executing add_points_to_outgoing_data_message()', 4)
+        self._viewer.debug('Executing add_points_to_outgoing_data_message()', 4)
+        # Subsets in mask mode reuse the points of the parent layer
+        if self.is_subset_mask():
+            return
+
         coord_sys_changed = 'coordinate_system' in changed
 
         # ICRS, Convert ICRS -> Cartesian
-        icrs_changed = 'ra_att' in changed or 'dec_att' in changed or 'icrs_dist_att' in changed
+        icrs_changed = 'ra_att' in changed or 'dec_att' in changed or 'icrs_dist_att' in changed or 'icrs_float32' in changed
         if (force or coord_sys_changed or icrs_changed) and self._viewer_state.coordinate_system == 'ICRS':
-            ra = self.state.layer[self._viewer_state.ra_att]
-            dec = self.state.layer[self._viewer_state.dec_att]
-            distance = self.state.layer[self._viewer_state.icrs_dist_att]
-            dist_unit = self._viewer_state.icrs_dist_unit_att
-
-            # Get cartesian coordinates on unit galactic sphere
-            coordinates = SkyCoord(
-                ra * ap_u.deg,
-                dec * ap_u.deg,
-                distance=distance * ap_u.Unit(dist_unit),
-                frame='icrs'
-            )
-            x, y, z = coordinates.galactic.cartesian.xyz
-            # self._viewer.debug(f'x[0]={x[0]}, y[0]={y[0]}, z[0]={z[0]}')
-            # self._viewer.debug(f'len(x)={len(x)}, len(y)={len(y)}, len(z)={len(z)}')
-            self._viewer.debug(f'Converted ICRS -> Cartesian', 2)
+            x, y, z = self.get_positions()
 
-            self.add_to_outgoing_data_message(
-                simp.DataKey.X,
-                self.get_float_attribute(x.value)
-            )
-            self.add_to_outgoing_data_message(
-                simp.DataKey.Y,
-                self.get_float_attribute(y.value)
-            )
-            self.add_to_outgoing_data_message(
-                simp.DataKey.Z,
-                self.get_float_attribute(z.value)
-            )
+            self.add_column_to_outgoing_data_message(simp.DataKey.X, self.get_float_attribute, x)
+            self.add_column_to_outgoing_data_message(simp.DataKey.Y, self.get_float_attribute, y)
+            self.add_column_to_outgoing_data_message(simp.DataKey.Z, self.get_float_attribute, z)
 
         # Cartesian
         elif self._viewer_state.coordinate_system == 'Cartesian':
             if force or coord_sys_changed or 'x_att' in changed:
-                self.add_to_outgoing_data_message(
+                self.add_column_to_outgoing_data_message(
                     simp.DataKey.X,
-                    self.get_float_attribute(self.state.layer[self._viewer_state.x_att])
+                    self.get_column_payload, self._viewer_state.x_att
                 )
             if force or coord_sys_changed or 'y_att' in changed:
-                self.add_to_outgoing_data_message(
+                self.add_column_to_outgoing_data_message(
                     simp.DataKey.Y,
-                    self.get_float_attribute(self.state.layer[self._viewer_state.y_att])
+                    self.get_column_payload, self._viewer_state.y_att
                 )
             if force or coord_sys_changed or 'z_att' in changed:
-                self.add_to_outgoing_data_message(
+                self.add_column_to_outgoing_data_message(
                     simp.DataKey.Z,
-                    self.get_float_attribute(self.state.layer[self._viewer_state.z_att])
+                    self.get_column_payload, self._viewer_state.z_att
                 )
 
         # Distance unit
@@ -294,13 +499,35 @@ class OpenSpaceLayerArtist(LayerArtist):
                  or 'icrs_dist_unit_att' in changed or coord_sys_changed:
             self.add_to_outgoing_data_message(simp.DataKey.PointUnit, (self.get_position_unit(), 1))
 
+    def add_subset_to_outgoing_data_message(self, *, changed: "set" = {}, force: "bool" = False):
+        '''
+            Adds the subset membership to outgoing message if the layer
+            is a subset in mask mode. The membership is encoded against
+            the points already sent by the parent layer.
+        '''
+        self._viewer.debug('Executing add_subset_to_outgoing_data_message()', 4)
+        if not self.is_subset_mask():
+            return
+
+        if not (force or 'subset_state' in changed or 'subset_mode' in changed):
+            return
+
+        self.add_to_outgoing_data_message(simp.DataKey.SubsetParent, self.get_subset_parent())
+
+        data_key, entry = self.get_subset_membership()
+        # Only one of the membership encodings may be present in a message
+        for other_key in (simp.DataKey.SubsetRanges, simp.DataKey.SubsetBitset):
+            if other_key != data_key:
+                self.remove_from_outgoing_data_message(other_key)
+        self.add_to_outgoing_data_message(data_key, entry)
+
     def add_velocity_to_outgoing_data_message(self, *, changed: "set" = {}, force: "bool" = False):
         '''
             Adds all velocity data to outgoing message if force is true.
             Else, check which properties has changed and add 
             relevant data to outgoing message.
         '''
-        self._viewer.debug(f'Executing add_velocity_to_outgoing_data_message()', 4)
+        self._viewer.debug('Executing add_velocity_to_outgoing_data_message()', 4)
 
         if self._viewer_state.velocity_mode != 'Motion':
             return
@@ -310,20 +537,23 @@ class OpenSpaceLayerArtist(LayerArtist):
         
         # TODO: if force, get all velocity data (faster?)
 
-        if force or 'u_att' in changed or velocity_mode_changed:
-            self.add_to_outgoing_data_message(
+        # Subsets in mask mode reuse the velocities of the parent layer
+        send_velocity_data = not self.is_subset_mask()
+
+        if send_velocity_data and (force or 'u_att' in changed or velocity_mode_changed):
+            self.add_column_to_outgoing_data_message(
                 simp.DataKey.U,
-                self.get_float_attribute(self.state.layer[self._viewer_state.u_att])
+                self.get_column_payload, self._viewer_state.u_att
             )
-        if force or 'v_att' in changed or velocity_mode_changed:
-            self.add_to_outgoing_data_message(
+        if send_velocity_data and (force or 'v_att' in changed or velocity_mode_changed):
+            self.add_column_to_outgoing_data_message(
                 simp.DataKey.V,
-                self.get_float_attribute(self.state.layer[self._viewer_state.v_att])
+                self.get_column_payload, self._viewer_state.v_att
             )
-        if force or 'w_att' in changed or velocity_mode_changed:
-            self.add_to_outgoing_data_message(
+        if send_velocity_data and (force or 'w_att' in changed or velocity_mode_changed):
+            self.add_column_to_outgoing_data_message(
                 simp.DataKey.W,
-                self.get_float_attribute(self.state.layer[self._viewer_state.w_att])
+                self.get_column_payload, self._viewer_state.w_att
             )
         if force or 'vel_distance_unit_att' in changed or velocity_mode_changed:
             self.add_to_outgoing_data_message(simp.DataKey.VelocityDistanceUnit, self.get_velocity_distance_unit())
@@ -353,7 +583,7 @@ class OpenSpaceLayerArtist(LayerArtist):
             Else, check which properties has changed and add 
             relevant data to outgoing message.
         '''
-        self._viewer.debug(f'Executing add_color_to_outgoing_data_message()', 4)
+        self._viewer.debug('Executing add_color_to_outgoing_data_message()', 4)
         color_mode_changed = 'color_mode' in changed
 
         if force or 'color' in changed or (color_mode_changed and self.state.color_mode == 'Fixed'):
@@ -391,10 +621,11 @@ class OpenSpaceLayerArtist(LayerArtist):
                 self.add_to_outgoing_data_message(simp.DataKey.ColormapBlue, (b, n_colors))
                 self.add_to_outgoing_data_message(simp.DataKey.ColormapAlpha, (a, n_colors))
 
-            if force or 'cmap_att' in changed or color_mode_changed:
-                self.add_to_outgoing_data_message(
+            # Subsets in mask mode send attribute data for their members only
+            if force or 'cmap_att' in changed or color_mode_changed or 'subset_state' in changed:
+                self.add_column_to_outgoing_data_message(
                     simp.DataKey.ColormapAttributeData,
-                    self.get_attrib_data(self.state.cmap_att)
+                    self.get_attrib_data, self.state.cmap_att
                 )
             
         if force or color_mode_changed:
@@ -411,17 +642,17 @@ class OpenSpaceLayerArtist(LayerArtist):
             Else, check which properties has changed and add 
             relevant data to outgoing message.
         '''
-        self._viewer.debug(f'Executing add_size_to_outgoing_data_message()', 4)
+        self._viewer.debug('Executing add_size_to_outgoing_data_message()', 4)
         size_mode_changed = 'size_mode' in changed
         if force or 'size' in changed or (size_mode_changed and self.state.size_mode == 'Fixed'):
             self.add_to_outgoing_data_message(simp.DataKey.FixedSize, self.get_size())
 
         if self.state.size_mode == 'Linear':
             min, max = self.get_linear_size_limits()
-            if force or 'size_att' in changed or size_mode_changed:
-                self.add_to_outgoing_data_message(
+            if force or 'size_att' in changed or size_mode_changed or 'subset_state' in changed:
+                self.add_column_to_outgoing_data_message(
                     simp.DataKey.LinearSizeAttributeData,
-                    self.get_attrib_data(self.state.size_att)
+                    self.get_attrib_data, self.state.size_att
                 )
             if force or 'size_vmin' in changed or size_mode_changed:
                 self.add_to_outgoing_data_message(simp.DataKey.LinearSizeMin, min)
@@ -439,39 +670,414 @@ class OpenSpaceLayerArtist(LayerArtist):
         gui_name = self.get_gui_name_str()
         return identifier + simp.DELIM + gui_name + simp.DELIM
 
-    def add_initial_data_to_message(self):
-        self._viewer._outgoing_data_message_mutex.acquire()
-        self._viewer._outgoing_data_message_condition.acquire()
+    def add_point_batch_to_outgoing_data_message(self, batch_size: "int") -> "bool":
+        '''
+            Adds the next batch of rows that aren't resident in OpenSpace
+            yet to outgoing message. Returns False if all rows are resident.
 
-        self._viewer.debug(f'Executing add_initial_data_to_message()', 4)
+            DANGER! You need to lock outgoing message
+            mutex before calling this function
+        '''
+        self._viewer.debug('Executing add_point_batch_to_outgoing_data_message()', 4)
+        if not self.has_rows_to_refine():
+            return False
 
-        # PointData
-        self.add_points_to_outgoing_data_message(force=True)
+        offset = self._n_resident
+        rows = self._row_order[offset:(offset + batch_size)]
 
-        # Opacity
-        self.add_to_outgoing_data_message(simp.DataKey.Alpha, self.get_opacity())
-        
-        # Visibility
+        self.add_to_outgoing_data_message(simp.DataKey.BatchOffset, (int32_to_bytes(offset), 1))
+
+        x, y, z = self.get_positions(rows)
+        self.add_to_outgoing_data_message(simp.DataKey.X, self.get_float_attribute(x))
+        self.add_to_outgoing_data_message(simp.DataKey.Y, self.get_float_attribute(y))
+        self.add_to_outgoing_data_message(simp.DataKey.Z, self.get_float_attribute(z))
+
+        if self._viewer_state.velocity_mode == 'Motion':
+            for data_key, attribute in (
+                (simp.DataKey.U, self._viewer_state.u_att),
+                (simp.DataKey.V, self._viewer_state.v_att),
+                (simp.DataKey.W, self._viewer_state.w_att)
+            ):
+                self.add_to_outgoing_data_message(data_key, self.get_column_payload(attribute, rows))
+
+        if self.state.color_mode == 'Linear':
+            self.add_to_outgoing_data_message(
+                simp.DataKey.ColormapAttributeData,
+                self.get_attrib_data(self.state.cmap_att, rows)
+            )
+
+        if self.state.size_mode == 'Linear':
+            self.add_to_outgoing_data_message(
+                simp.DataKey.LinearSizeAttributeData,
+                self.get_attrib_data(self.state.size_att, rows)
+            )
+
+        self._n_resident = offset + len(rows)
+
+        # Members of the new rows must be added to the subsets
+        self.add_subset_layers_to_outgoing_data_message()
+
+        return True
+
+    def add_subset_layers_to_outgoing_data_message(self):
+        '''
+            Adds the membership of all subsets in mask mode that
+            reference this layer to outgoing message.
+
+            DANGER! You need to lock outgoing message
+            mutex before calling this function
+        '''
+        for layer in self._viewer.layers:
+            if layer is self or not layer.is_subset_mask() or layer.state.layer.data is not self.state.layer:
+                continue
+
+            if not layer.state.has_sent_initial_data:
+                continue
+
+            changed = {'subset_state'}
+            layer.add_subset_to_outgoing_data_message(changed=changed)
+            layer.add_color_to_outgoing_data_message(changed=changed)
+            layer.add_size_to_outgoing_data_message(changed=changed)
+
+    def add_octree_to_outgoing_data_message(self):
+        '''
+            Adds the nodes of the octree to outgoing message, as the
+            start offset of every non-empty node in the sent order.
+
+            DANGER! You need to lock outgoing message
+            mutex before calling this function
+        '''
+        index = self._spatial_index
+        # The nodes aren't contiguous when the octree order is interleaved by a progressive upload
+        if index is None or self.has_rows_to_refine():
+            return
+
+        bounds = np.concatenate((index.lower, index.upper))
+        self.add_to_outgoing_data_message(simp.DataKey.OctreeLevel, (int32_to_bytes(index.level), 1))
         self.add_to_outgoing_data_message(
-            simp.DataKey.Visibility,
-            self.is_enabled(simp.DataKey.Visibility)
+            simp.DataKey.OctreeBounds,
+            (float32_list_to_bytes(bounds.tolist()), len(bounds))
+        )
+        self.add_to_outgoing_data_message(
+            simp.DataKey.OctreeNodes,
+            (int32_array_to_bytes(index.node_keys), len(index.node_keys))
+        )
+        self.add_to_outgoing_data_message(
+            simp.DataKey.OctreeOffsets,
+            (int32_array_to_bytes(index.node_offsets), len(index.node_offsets))
         )
 
-        # Color
-        self.add_color_to_outgoing_data_message(force=True)
+    def is_progressive_upload_running(self) -> "bool":
+        return self._progressive_upload is not None and self._progressive_upload.is_running()
 
-        # Size
-        self.add_size_to_outgoing_data_message(force=True)
+    def cancel_progressive_upload(self):
+        if self._progressive_upload is not None:
+            self._progressive_upload.cancel()
+            self._progressive_upload = None
 
-        # Velocity
-        self.add_velocity_to_outgoing_data_message(force=True)
-        
-        self._viewer._outgoing_data_message_condition.notify()
+    def uses_progressive_upload(self) -> "bool":
+        return (
+            isinstance(self.state.layer, Data)
+            and self._viewer_state.upload_mode == 'Progressive'
+            and self.state.layer.size >= PROGRESSIVE_MIN_POINTS
+            and self._viewer.capabilities.supports('chunking')
+        )
 
-        self._viewer._outgoing_data_message_mutex.release()
-        self._viewer._outgoing_data_message_condition.release()
+    def is_frame_playback_running(self) -> "bool":
+        return self._frame_playback is not None and self._frame_playback.is_running()
 
-        self.pop_changed_properties()
+    def cancel_frame_playback(self):
+        if self._frame_playback is not None:
+            self._frame_playback.cancel()
+            self._frame_playback = None
+
+    def start_frame_playback(self):
+        '''
+            Starts sending the frames after the first one,
+            which is sent with the initial data.
+        '''
+        self.cancel_frame_playback()
+
+        try:
+            frame_rate = float(self._viewer_state.frame_rate)
+        except (TypeError, ValueError):
+            return
+
+        if self._frames is None or len(self._frames) < 2 or not frame_rate > 0:
+            return
+
+        self._frame_playback = FramePlayback(
+            self, self._frames, frame_rate,
+            use_deltas=(
+                self._viewer_state.frame_encoding == 'Deltas'
+                and self._viewer.capabilities.supports('codecs', 'deltas')
+            )
+        )
+        self._frame_playback.start()
+
+    def uses_frames(self) -> "bool":
+        return (
+            isinstance(self.state.layer, Data)
+            and self._viewer_state.velocity_mode == 'Frames'
+            and self._viewer_state.time_att is not None
+            and self._viewer.capabilities.supports('layouts', 'frames')
+        )
+
+    def add_frames_to_outgoing_data_message(self):
+        '''
+            Adds the amount of frames and the first frame, whose
+            points are in the message, to outgoing message.
+
+            DANGER! You need to lock outgoing message
+            mutex before calling this function
+        '''
+        if self._frames is None:
+            return
+
+        self.add_to_outgoing_data_message(simp.DataKey.FrameTotal, (int32_to_bytes(len(self._frames)), 1))
+        self.add_to_outgoing_data_message(simp.DataKey.FrameIndex, (int32_to_bytes(0), 1))
+        self.add_to_outgoing_data_message(
+            simp.DataKey.FrameTime,
+            (float32_to_bytes(float(self._frames.times[0])), 1)
+        )
+
+    def uses_nan_compaction(self) -> "bool":
+        return isinstance(self.state.layer, Data) and bool(self._viewer_state.compact_nan)
+
+    def get_valid_rows(self) -> "Union[np.ndarray, None]":
+        '''
+            Returns the rows that have a position in at least one axis,
+            or None if no row is NaN in every position column.
+        '''
+        if self.has_position_without_nan():
+            return None
+
+        invalid = all_nan_mask(*self.get_positions(np.arange(self.state.layer.size)))
+        if not np.any(invalid):
+            return None
+
+        return np.flatnonzero(~invalid)
+
+    def has_position_without_nan(self) -> "bool":
+        '''
+            Returns True if the exact statistics of a cartesian position
+            component count no NaN, so every row has a position and the
+            columns don't need to be scanned. Statistics that aren't
+            done yet are computed in the background for the next upload.
+        '''
+        if self._viewer_state.coordinate_system != 'Cartesian':
+            return False
+
+        service = get_statistics_service()
+        for att in self.get_position_attributes():
+            statistics = service.get(self.state.layer, att)
+            if statistics.exact and statistics.n_nan == 0:
+                return True
+
+        return False
+
+    def uses_spatial_order(self) -> "bool":
+        return (
+            isinstance(self.state.layer, Data)
+            and self._viewer_state.point_order == 'Octree'
+            and self._viewer.capabilities.supports('layouts', 'octree')
+        )
+
+    def reset_row_order(self):
+        '''
+            Decides in which order the rows of the layer are sent
+            and how many of them the first message contains.
+        '''
+        self._row_order = None
+        self._n_resident = None
+        self._frames = None
+        self._spatial_index = None
+        self._valid_rows = None
+        self._sent_index_of_row = None
+
+        # The points are the rows of the first frame, the later frames
+        # replace their positions, so they are sent in full and in order
+        if self.uses_frames():
+            frames = Frames(self.state.layer[self._viewer_state.time_att])
+            if frames.has_equal_steps():
+                self._frames = frames
+                self._row_order = frames.rows(0) if len(frames) > 0 else np.zeros(0, dtype=np.int64)
+                self._n_resident = len(self._row_order)
+                return
+
+            self._viewer.log(
+                f'The time steps of {self.state.layer.label} have different amounts of rows, '\
+                + 'its points are sent without frames',
+                logging.WARNING
+            )
+
+        # Rows without any position are never sent
+        if self.uses_nan_compaction():
+            self._valid_rows = self.get_valid_rows()
+            self._row_order = self._valid_rows
+
+        if self.uses_spatial_order():
+            all_rows = np.arange(self.state.layer.size)
+            self._spatial_index = SpatialIndex(*self.get_positions(
+                all_rows if self._valid_rows is None else self._valid_rows
+            ))
+            order = self._spatial_index.order
+            self._row_order = order if self._valid_rows is None else self._valid_rows[order]
+
+        if self._row_order is not None:
+            self._n_resident = len(self._row_order)
+
+        if self.uses_progressive_upload():
+            # Strata of consecutive rows in octree order are
+            # compact in space, so the sample fills space evenly
+            n_rows = self.state.layer.size if self._row_order is None else len(self._row_order)
+            order, self._n_resident = progressive_order(
+                n_rows,
+                float(self._viewer_state.progressive_fraction)
+            )
+            self._row_order = order if self._row_order is None else self._row_order[order]
+
+    def get_glue_rows(self, sent_indices: "np.ndarray") -> "np.ndarray":
+        '''
+            Translates indices of points in the order they were sent
+            to OpenSpace, e.g. of a selection, to rows of the dataset.
+        '''
+        sent_indices = np.asarray(sent_indices, dtype=np.int64)
+        if self._row_order is None:
+            return sent_indices
+
+        return self._row_order[sent_indices]
+
+    def receive_selection(self, sent_indices: "np.ndarray"):
+        '''
+            Applies the points selected in OpenSpace, given as indices in
+            the order they were sent, as a selection of the dataset's rows.
+            Subsets send their own points, so only datasets are selected in.
+        '''
+        if not isinstance(self.state.layer, Data):
+            self._viewer.debug('Ignored a selection of subset %s', 2, self.state.layer.label)
+            return
+
+        n_sent = self.state.layer.size if self._row_order is None else len(self._row_order)
+        sent_indices = np.asarray(sent_indices, dtype=np.int64)
+        sent_indices = sent_indices[(sent_indices >= 0) & (sent_indices < n_sent)]
+
+        rows = np.unique(self.get_glue_rows(sent_indices))
+        self._viewer.apply_selection(ElementSubsetState(indices=rows, data=self.state.layer))
+
+    def get_sent_indices(self, rows: "np.ndarray") -> "np.ndarray":
+        '''
+            Translates rows of the dataset to indices of points in the
+            order they were sent to OpenSpace. Rows that aren't sent,
+            or aren't resident yet, get -1.
+        '''
+        rows = np.asarray(rows, dtype=np.int64)
+        if self._row_order is None:
+            return rows
+
+        if self._sent_index_of_row is None:
+            self._sent_index_of_row = np.full(self.state.layer.size, -1, dtype=np.int64)
+            self._sent_index_of_row[self._row_order] = np.arange(len(self._row_order))
+
+        indices = self._sent_index_of_row[rows]
+        indices[indices >= self._n_resident] = -1
+        return indices
+
+    def has_rows_to_refine(self) -> "bool":
+        return self._row_order is not None and self._n_resident < len(self._row_order)
+
+    @traced(category='layer')
+    @profiled('initial data')
+    def add_initial_data_to_message(self):
+        self.cancel_progressive_upload()
+        self.cancel_frame_playback()
+
+        if not self.has_position_attributes():
+            self.disable_incompatible()
+            return
+        self.enable()
+
+        with span('Wait for outgoing message', 'lock'):
+            self._viewer._outgoing_data_message_mutex.acquire()
+            self._viewer._outgoing_data_message_condition.acquire()
+
+        incompatible = False
+        try:
+            # Everything is sent again, so pending values (e.g. a refinement
+            # batch of a cancelled upload) are outdated
+            self._viewer._outgoing_data_message.pop(self.get_identifier_str(), None)
+
+            self.reset_row_order()
+            if self.has_rows_to_refine():
+                # Tells OpenSpace that the points in this message are the start
+                # of a new upload, which will be refined to the total amount
+                self.add_to_outgoing_data_message(
+                    simp.DataKey.BatchTotal,
+                    (int32_to_bytes(len(self._row_order)), 1)
+                )
+
+            # Independent columns are extracted and encoded concurrently
+            self._submit_column_jobs = True
+
+            # PointData
+            self.add_points_to_outgoing_data_message(force=True)
+
+            # Octree nodes
+            self.add_octree_to_outgoing_data_message()
+
+            # Time steps
+            self.add_frames_to_outgoing_data_message()
+
+            # Subset membership
+            self.add_subset_to_outgoing_data_message(force=True)
+
+            # Opacity
+            self.add_to_outgoing_data_message(simp.DataKey.Alpha, self.get_opacity())
+
+            # Visibility
+            self.add_to_outgoing_data_message(
+                simp.DataKey.Visibility,
+                self.is_enabled(simp.DataKey.Visibility)
+            )
+
+            # Color
+            self.add_color_to_outgoing_data_message(force=True)
+
+            # Size
+            self.add_size_to_outgoing_data_message(force=True)
+
+            # Velocity
+            self.add_velocity_to_outgoing_data_message(force=True)
+
+            self._submit_column_jobs = False
+            if not self.resolve_column_jobs():
+                return
+
+            # Subsets referencing the rows of this layer
+            self.add_subset_layers_to_outgoing_data_message()
+
+            self._viewer._outgoing_data_message_condition.notify()
+
+        except IncompatibleAttribute:
+            # The message of the layer is incomplete, it's not sent
+            self._submit_column_jobs = False
+            self._viewer._outgoing_data_message.pop(self.get_identifier_str(), None)
+            incompatible = True
+
+        finally:
+            self._viewer._outgoing_data_message_mutex.release()
+            self._viewer._outgoing_data_message_condition.release()
+
+        if incompatible:
+            self.disable_incompatible()
+            return
+
+        if self.has_rows_to_refine():
+            self._progressive_upload = ProgressiveUpload(self)
+            self._progressive_upload.start()
+
+        if self._frames is not None:
+            self.start_frame_playback()
 
         # Clear properties that have been set on init or 
         # duplicate messages will be sent on next prop change 
@@ -480,9 +1086,17 @@ class OpenSpaceLayerArtist(LayerArtist):
     # Create and send "Remove Scene Graph Node" message to OS
     def send_remove_sgn(self):
         subject = string_to_bytes(self.get_identifier_str() + simp.DELIM)
-        simp.send_simp_message(self._viewer, simp.MessageType.RemoveSceneGraphNode, subject)
+        # Sent over the session like all other messages, so it's also recorded
+        session = self._viewer._session
+        simp.send_simp_message(
+            self._viewer if session is None else session,
+            simp.MessageType.RemoveSceneGraphNode, subject
+        )
 
     def clear(self):
+        self.cancel_progressive_upload()
+        self.cancel_frame_playback()
+
         if self._viewer._socket is None:
             return
 
@@ -504,13 +1118,220 @@ class OpenSpaceLayerArtist(LayerArtist):
             # 1. A dataset can be used in multiple viewers but are treated as different datasets
             # 2. A dataset can onlu be used in one viewer at a time. Give a prompt that says 
             #    that you can't have multiple viewers for same dataset, if user tries.
-            self._viewer._main_layer_uuid = self.state.layer.uuid
             return self.state.layer.uuid
         elif isinstance(self.state.layer, Subset):
-            return self._viewer._main_layer_uuid + self.state.layer.label.replace('Subset ', '')
+            # A viewer can hold several datasets, so subsets are named after their own dataset
+            return self.state.layer.data.uuid + self.state.layer.label.replace('Subset ', '')
         else:
             return
 
+    def is_subset_mask(self) -> "bool":
+        # Peers that can't read masks get the points of the subset
+        return (
+            isinstance(self.state.layer, Subset)
+            and self._viewer_state.subset_mode == 'Mask'
+            and self._viewer.capabilities.supports('codecs', 'ranges')
+        )
+
+    def get_subset_parent(self) -> "tuple[bytearray, int]":
+        return (string_to_bytes(self.state.layer.data.uuid + simp.DELIM), 1)
+
+    def get_parent_layer_artist(self) -> "Union[OpenSpaceLayerArtist, None]":
+        for layer in self._viewer.layers:
+            if layer.state.layer is self.state.layer.data:
+                return layer
+
+    def get_parent_resident_rows(self) -> "Union[np.ndarray, None]":
+        parent = self.get_parent_layer_artist()
+        return parent.get_resident_rows() if parent is not None else None
+
+    def get_resident_rows(self) -> "Union[np.ndarray, None]":
+        '''
+            Returns the rows of the dataset held by OpenSpace for this layer,
+            in the order they were sent. None means all rows in table order.
+        '''
+        if self.is_subset_mask():
+            parent_rows = self.get_parent_resident_rows()
+            if parent_rows is None:
+                return None
+            return parent_rows[self.state.layer.to_mask()[parent_rows]]
+
+        if self._row_order is None:
+            return None
+
+        return self._row_order[:self._n_resident]
+
+    @traced(category='extract')
+    def get_layer_column(self, attribute, rows: "Union[np.ndarray, None]" = None) -> "np.ndarray":
+        '''
+            Returns the values of the attribute for the given rows of the
+            dataset, or for the resident rows if no rows are given.
+        '''
+        if rows is None:
+            rows = self.get_resident_rows()
+
+        if rows is None:
+            return self.state.layer[attribute]
+
+        return self.state.layer.data[attribute][rows]
+
+    def get_positions(self, rows: "Union[np.ndarray, None]" = None) -> "tuple[np.ndarray, np.ndarray, np.ndarray]":
+        if self._viewer_state.coordinate_system == 'ICRS':
+            if rows is None:
+                rows = self.get_resident_rows()
+            if rows is None and isinstance(self.state.layer, Subset):
+                rows = self.state.layer.to_mask()
+
+            xyz = self.find_icrs_positions()
+            if xyz is None and rows is not None\
+            and not get_position_cache().fits(3 * 4 * self.state.layer.data.size):
+                # A conversion of the whole table wouldn't be kept for the
+                # next batch or frame, so only the rows are converted
+                xyz = self.convert_icrs_positions(rows)
+                return xyz[0], xyz[1], xyz[2]
+
+            if xyz is None:
+                xyz = self.get_icrs_positions()
+            if rows is not None:
+                xyz = xyz[:, rows]
+            return xyz[0], xyz[1], xyz[2]
+
+        return (
+            self.get_layer_column(self._viewer_state.x_att, rows),
+            self.get_layer_column(self._viewer_state.y_att, rows),
+            self.get_layer_column(self._viewer_state.z_att, rows)
+        )
+
+    @traced(category='convert')
+    def get_icrs_positions(self) -> "np.ndarray":
+        '''
+            Returns the galactic cartesian coordinates of all rows of the
+            dataset, as big-endian float32 of shape (3, n). The conversion is
+            cached per dataset by the ICRS attributes and the revision of the data.
+        '''
+        xyz = self.find_icrs_positions()
+        if xyz is not None:
+            return xyz
+
+        xyz = self.convert_icrs_positions()
+        get_position_cache().put(self._get_icrs_cache_key(), xyz)
+        return xyz
+
+    def find_icrs_positions(self) -> "Union[np.ndarray, None]":
+        '''
+            Returns the converted positions of all rows of the dataset if
+            they're cached or were saved with a restored session.
+        '''
+        key = self._get_icrs_cache_key()
+        xyz = get_position_cache().get(key)
+        if xyz is not None:
+            return xyz
+
+        # Positions saved with a restored session are sent as they are. The
+        # outcome of the lookup is kept, the columns are hashed only once and
+        # the memory-mapped buffer may be too large for the cache
+        payload_cache = getattr(self._viewer, '_payload_cache', None)
+        if payload_cache is None:
+            return None
+
+        if self._restored_positions_key != (payload_cache, key):
+            xyz = payload_cache.find(self._get_icrs_parameters(), self._hash_icrs_columns)
+            if xyz is not None:
+                self._viewer.debug('Using the ICRS -> Cartesian conversion of the restored session', 2)
+                get_position_cache().put(key, xyz)
+            self._restored_positions_key = (payload_cache, key)
+            self._restored_positions = xyz
+
+        return self._restored_positions
+
+    @traced(category='convert')
+    def convert_icrs_positions(self, rows: "Union[np.ndarray, None]" = None) -> "np.ndarray":
+        '''
+            Converts the ICRS coordinates of the rows, or of all rows of the
+            dataset, to galactic cartesian coordinates in the distance unit.
+        '''
+        data = self.state.layer.data
+        ra = data[self._viewer_state.ra_att]
+        dec = data[self._viewer_state.dec_att]
+        dist = data[self._viewer_state.icrs_dist_att]
+        if rows is not None:
+            ra, dec, dist = ra[rows], dec[rows], dist[rows]
+
+        # Written straight into the big-endian float32 layout that is sent
+        dtype = np.float32 if self._viewer_state.icrs_float32 else np.float64
+        if self._viewer_state.conversion_backend == 'Processes':
+            xyz = icrs_to_galactic_cartesian_processes(ra, dec, dist, dtype=dtype)
+        else:
+            xyz = icrs_to_galactic_cartesian(ra, dec, dist, dtype=dtype, out=np.empty((3, len(ra)), dtype='>f4'))
+        self._viewer.debug('Converted ICRS -> Cartesian', 2)
+        return xyz
+
+    def _get_icrs_cache_key(self) -> "tuple":
+        return (
+            self.state.layer.data.uuid, self._viewer_state.ra_att.uuid, self._viewer_state.dec_att.uuid,
+            self._viewer_state.icrs_dist_att.uuid, self._viewer_state.icrs_dist_unit_att,
+            self._viewer_state.icrs_float32, get_data_revision(self.state.layer.data)
+        )
+
+    def _get_icrs_parameters(self) -> "dict":
+        # The values are compared by `_hash_icrs_columns()`, the labels tell the columns apart
+        return {
+            'key': 'icrs_positions',
+            'ra': self._viewer_state.ra_att.label, 'dec': self._viewer_state.dec_att.label,
+            'dist': self._viewer_state.icrs_dist_att.label, 'unit': self._viewer_state.icrs_dist_unit_att,
+            'float32': bool(self._viewer_state.icrs_float32),
+        }
+
+    def _hash_icrs_columns(self) -> "str":
+        data = self.state.layer.data
+        return hash_columns(
+            data[self._viewer_state.ra_att], data[self._viewer_state.dec_att],
+            data[self._viewer_state.icrs_dist_att]
+        )
+
+    def get_payload_cache_buffers(self) -> "list[tuple[dict, str, np.ndarray]]":
+        '''
+            Returns the encoded buffers of the layer that are kept when the
+            session is saved, see `PayloadCache.write()`. Only the converted
+            positions are kept, other columns are encoded about as fast as
+            they would be hashed. Positions of tables too large for the cache
+            are converted in full here, they're the ones worth keeping.
+        '''
+        if self._viewer_state.coordinate_system != 'ICRS' or self._viewer_state.ra_att is None\
+        or self._viewer_state.dec_att is None or self._viewer_state.icrs_dist_att is None:
+            return []
+
+        # The layer of the dataset keeps the positions of its subsets
+        if isinstance(self.state.layer, Subset) and self.get_parent_layer_artist() is not None:
+            return []
+
+        return [(self._get_icrs_parameters(), self._hash_icrs_columns(), self.get_icrs_positions())]
+
+    def get_subset_membership(self) -> "tuple[simp.DataKey, tuple[bytes, int]]":
+        '''
+            Returns the smallest encoding of the subset membership,
+            either as run-length ranges or, if OpenSpace accepts
+            them, as a bitset.
+        '''
+        mask = self.state.layer.to_mask()
+
+        # The membership refers to the rows in the order the parent sent them
+        parent_rows = self.get_parent_resident_rows()
+        if parent_rows is not None:
+            mask = mask[parent_rows]
+
+        ranges = mask_to_ranges(mask)
+        if len(ranges) == 0:
+            # An empty subset is sent as a single empty range
+            ranges = np.zeros(2, dtype=np.int32)
+
+        if self._viewer.capabilities.supports('codecs', 'bitset'):
+            bitset = mask_to_bitset(mask)
+            if 1 < len(bitset) < ranges.nbytes:
+                return simp.DataKey.SubsetBitset, (bitset, len(bitset))
+
+        return simp.DataKey.SubsetRanges, (int32_array_to_bytes(ranges), len(ranges))
+
     def get_color(self, color=None) -> "tuple[bytearray, bytearray, bytearray, bytearray]":
         """
         `color` should be a list or tuple [r, g, b] or [r, g, b, a].
@@ -523,14 +1344,17 @@ class OpenSpaceLayerArtist(LayerArtist):
         else:
             if not (isinstance(color, list) or isinstance(color, tuple)):
                 self._viewer.log(
-                    f'The provided color must be of type list or tuple. It\'s of type {type(color)}'
+                    f'The provided color must be of type list or tuple. It\'s of type {type(color)}',
+                    logging.WARNING
                 )
                 return
 
         if len(color) < 3 or len(color) > 4:
             self._viewer.log(
                 f'The provided color is not of proper length. It should be of '\
-                + f'length 3 (RGB) or 4 (RGBA). It\'s of length {len(color)}')
+                + f'length 3 (RGB) or 4 (RGBA). It\'s of length {len(color)}',
+                logging.WARNING
+            )
             return
 
         r = float32_to_bytes(color[0])
@@ -558,7 +1382,7 @@ class OpenSpaceLayerArtist(LayerArtist):
             )
 
     def get_opacity(self) -> "tuple[bytearray, int]":
-        self._viewer.debug(f'Executing get_opacity()', 4)
+        self._viewer.debug('Executing get_opacity()', 4)
         return float32_to_bytes(self.state.alpha), 1
 
     def get_gui_name_str(self) -> "Union[str, None]":
@@ -589,16 +1413,16 @@ class OpenSpaceLayerArtist(LayerArtist):
         return vmin, vmax
 
     def get_position_unit(self) -> "tuple[bytearray]":
-        self._viewer.debug('Executing get_position_unit()')
+        self._viewer.debug('Executing get_position_unit()', 4)
         if self._viewer_state.coordinate_system == 'Cartesian':
-            self._viewer.debug(f'get_position_unit(): Cartesian - {simp.dist_unit_astropy_to_simp(self._viewer_state.cartesian_unit_att)}')
+            self._viewer.debug('get_position_unit(): Cartesian - %s', 3, self._viewer_state.cartesian_unit_att)
             return (
                 string_to_bytes(simp.dist_unit_astropy_to_simp(
                     self._viewer_state.cartesian_unit_att 
                 ) + simp.DELIM)
             )
         elif self._viewer_state.coordinate_system == 'ICRS':
-            self._viewer.debug(f'get_position_unit(): ICRS - {simp.dist_unit_astropy_to_simp(self._viewer_state.icrs_dist_unit_att)}')
+            self._viewer.debug('get_position_unit(): ICRS - %s', 3, self._viewer_state.icrs_dist_unit_att)
             return (
                 string_to_bytes(simp.dist_unit_astropy_to_simp(
                     self._viewer_state.icrs_dist_unit_att
@@ -657,11 +1481,37 @@ class OpenSpaceLayerArtist(LayerArtist):
     def get_velocity_year_rec(self) -> "tuple[bytearray, int]":
         return (int32_to_bytes(self._viewer_state.vel_year_rec), 1)
 
-    def get_float_attribute(self, attr: np.ndarray) -> "tuple[bytearray, int]":
+    @traced(category='encode')
+    def get_float_attribute(self, attr: np.ndarray) -> "tuple[Union[bytes, memoryview], int]":
         self._viewer.debug('Executing get_float_attribute()', 4)
-        attr_bytes = float32_list_to_bytes(attr.tolist())
+        if attr.dtype == np.dtype('>f4') and attr.flags['C_CONTIGUOUS']:
+            # Already encoded, e.g. converted positions, so it's sent without a copy
+            return (memoryview(attr).cast('B'), len(attr))
+
+        attr_bytes = float32_array_to_bytes(attr)
         return (attr_bytes, len(attr))
 
+    @traced(category='extract')
+    def get_column_payload(self, attribute, rows: "Union[np.ndarray, None]" = None) -> "tuple[Union[bytes, Float32ColumnPayload], int]":
+        '''
+            Returns the float32 values of the attribute for the given rows, or
+            for the resident rows if no rows are given. Large columns are read
+            and encoded block by block when the message is sent instead.
+        '''
+        if rows is None:
+            rows = self.get_resident_rows()
+
+        if rows is None and isinstance(self.state.layer, Subset):
+            rows = np.flatnonzero(self.state.layer.to_mask())
+
+        n_values = self.state.layer.size if rows is None else len(rows)
+        if n_values < STREAM_MIN_POINTS:
+            return self.get_float_attribute(self.get_layer_column(attribute, rows))
+
+        source = ColumnSource(self.state.layer.data, attribute, rows)
+        return (Float32ColumnPayload.from_source(source), len(source))
+
+    @traced(category='encode')
     def get_colormap(self) -> "tuple[bytearray, bytearray, bytearray, bytearray, int]":
         formatted_colormap = None
         if hasattr(self.state.cmap, 'colors'):
@@ -693,13 +1543,6 @@ class OpenSpaceLayerArtist(LayerArtist):
         vmax = float32_to_bytes(float(self.state.cmap_vmax))
         return (vmin, vmax)
 
-    def get_attrib_data(self, attribute) -> "tuple[bytearray, int]":
-        attrib_data = self.state.layer[attribute]
-
-        result = bytearray()
-
-        for value in attrib_data:
-            result += float32_to_bytes(float(value))
-
-        return result, len(attrib_data)
+    def get_attrib_data(self, attribute, rows: "Union[np.ndarray, None]" = None) -> "tuple[Union[bytes, Float32ColumnPayload], int]":
+        return self.get_column_payload(attribute, rows)
 
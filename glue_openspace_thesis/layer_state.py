@@ -5,10 +5,11 @@ from glue.config import colormaps
 from echo import (CallbackProperty, keep_in_sync, delay_callback)
 from glue.viewers.common.state import LayerState
 
-from glue.core.data_combo_helper import ComponentIDComboHelper
-from glue.core.state_objects import StateAttributeLimitsHelper
 from glue.viewers.matplotlib.state import (DeferredDrawCallbackProperty as DDCProperty,
                                            DeferredDrawSelectionCallbackProperty as DDSCProperty)
+
+from .statistics import StatisticsLimitsHelper
+from .components import CatalogComponentIDComboHelper
 # from glue.config import ColormapRegistry as colormaps
 
 COLOR_TYPES = ['Fixed', 'Linear']
@@ -64,22 +65,22 @@ class OpenSpaceLayerState(LayerState):
         OpenSpaceLayerState.size_mode.set_choices(self, SIZE_TYPES)
         OpenSpaceLayerState.cmap_nan_mode.set_choices(self, CMAP_NAN_MODES)
 
-        self.size_att_helper = ComponentIDComboHelper(self, 'size_att',
-                                                     numeric=True,
-                                                     categorical=False,
-                                                     world_coord=True,
-                                                     pixel_coord=False)
-        self.size_lim_helper = StateAttributeLimitsHelper(self, attribute='size_att',
+        self.size_att_helper = CatalogComponentIDComboHelper(self, 'size_att',
+                                                            numeric=True,
+                                                            categorical=False,
+                                                            world_coord=True,
+                                                            pixel_coord=False)
+        self.size_lim_helper = StatisticsLimitsHelper(self, attribute='size_att',
                                                           lower='size_vmin', 
                                                           upper='size_vmax',
                                                           limits_cache=self.limits_cache)
 
-        self.cmap_att_helper = ComponentIDComboHelper(self, 'cmap_att',
-                                                     numeric=True,
-                                                     categorical=False,
-                                                     world_coord=True,
-                                                     pixel_coord=False)
-        self.cmap_lim_helper = StateAttributeLimitsHelper(self, attribute='cmap_att',
+        self.cmap_att_helper = CatalogComponentIDComboHelper(self, 'cmap_att',
+                                                            numeric=True,
+                                                            categorical=False,
+                                                            world_coord=True,
+                                                            pixel_coord=False)
+        self.cmap_lim_helper = StatisticsLimitsHelper(self, attribute='cmap_att',
                                                           lower='cmap_vmin', 
                                                           upper='cmap_vmax',
                                                           limits_cache=self.limits_cache)
@@ -0,0 +1,121 @@
+from threading import Event, Thread
+from typing import TYPE_CHECKING, Union
+
+import numpy as np
+
+from .tracing import span
+
+if TYPE_CHECKING:
+    from .layer_artist import OpenSpaceLayerArtist
+
+__all__ = [
+    'PROGRESSIVE_MIN_POINTS', 'PROGRESSIVE_BATCH_SIZE', 'PROGRESSIVE_ORDER_BLOCK',
+    'progressive_order', 'ProgressiveUpload'
+]
+
+PROGRESSIVE_MIN_POINTS = 100000 # Smaller layers are always sent in full
+PROGRESSIVE_BATCH_SIZE = 1000000 # Amount of points in each refinement batch
+PROGRESSIVE_ORDER_BLOCK = 2**20 # Rows whose strata are permuted at once
+PROGRESSIVE_POLL_TIME = 0.05 # Time to wait before checking if the last batch has been sent
+
+def progressive_order(n_points: "int", fraction: "float", seed: "int" = 0) -> "tuple[np.ndarray, int]":
+    """
+    Returns an order of the row indices `0..n_points-1` and the size of
+    the initial sample. The rows are split into strata of `1 / fraction`
+    consecutive rows and the order visits one random row of every stratum
+    before it visits a second one. The first `n_sample` rows therefore form
+    a stratified random sample, and every longer prefix is stratified too.
+    The strata are permuted in blocks, so besides the order itself only
+    about `PROGRESSIVE_ORDER_BLOCK` rows are held at once.
+    """
+    stride = max(1, int(round(1.0 / fraction))) if fraction > 0 else n_points
+    stride = max(1, min(stride, n_points))
+    n_full = n_points // stride
+    n_last = n_points - n_full * stride # Rows of the shorter last stratum
+    n_strata = n_full + (1 if n_last > 0 else 0)
+
+    rng = np.random.default_rng(seed)
+    order = np.empty(n_points, dtype=np.int32 if n_points <= np.iinfo(np.int32).max else np.int64)
+    offset_dtype = np.uint16 if stride <= 2**16 else order.dtype
+
+    # Round i of the order visits the i-th row of every stratum,
+    # the last stratum only takes part in the first `n_last` rounds
+    head = order[:(n_last * n_strata)].reshape(n_last, n_strata)
+    tail = order[(n_last * n_strata):].reshape(stride - n_last, n_full)
+
+    offsets = np.arange(stride, dtype=offset_dtype)
+    block = max(1, PROGRESSIVE_ORDER_BLOCK // stride)
+    for first in range(0, n_full, block):
+        last = min(first + block, n_full)
+        permutations = rng.permuted(np.broadcast_to(offsets, (last - first, stride)), axis=1)
+        starts = np.arange(first * stride, last * stride, stride, dtype=order.dtype)[:, None]
+        head[:, first:last] = (starts + permutations[:, :n_last]).T
+        tail[:, first:last] = (starts + permutations[:, n_last:]).T
+
+    if n_last > 0:
+        head[:, n_full] = n_full * stride + rng.permutation(n_last)
+
+    return order, n_strata
+
+class ProgressiveUpload:
+    """
+    Sends the rows of a layer that aren't resident in OpenSpace yet in
+    batches, each one after the previous batch has left the outgoing
+    message. The upload can be cancelled at any time.
+    """
+    _layer: "OpenSpaceLayerArtist"
+    _batch_size: "int"
+    _cancelled: "Event"
+    _thread: "Union[Thread, None]"
+
+    def __init__(self, layer: "OpenSpaceLayerArtist", batch_size: "int" = PROGRESSIVE_BATCH_SIZE):
+        self._layer = layer
+        self._batch_size = batch_size
+        self._cancelled = Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = Thread(target=self._upload_loop, name='openspace-progressive-upload', daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_running(self) -> "bool":
+        return self._thread is not None and self._thread.is_alive() and not self._cancelled.is_set()
+
+    def _batch_is_pending(self) -> "bool":
+        viewer = self._layer._viewer
+        identifier = self._layer.get_identifier_str()
+        return len(viewer._outgoing_data_message.get(identifier, {})) > 0
+
+    def _upload_loop(self):
+        viewer = self._layer._viewer
+
+        while not self._cancelled.is_set():
+            # Wait for the previous batch to be sent, so that a slow
+            # connection holds back the refinement instead of the batches
+            # piling up in memory
+            if self._batch_is_pending():
+                self._cancelled.wait(PROGRESSIVE_POLL_TIME)
+                continue
+
+            with span('Wait for outgoing message', 'lock'):
+                viewer._outgoing_data_message_mutex.acquire()
+                viewer._outgoing_data_message_condition.acquire()
+
+            try:
+                if self._cancelled.is_set():
+                    break
+
+                done = not self._layer.add_point_batch_to_outgoing_data_message(self._batch_size)
+                viewer._outgoing_data_message_condition.notify()
+
+            finally:
+                viewer._outgoing_data_message_mutex.release()
+                viewer._outgoing_data_message_condition.release()
+
+            if done:
+                break
+
+        viewer.debug('Progressive upload finished', 2)
@@ -0,0 +1,35 @@
+import logging
+
+__all__ = ['TRACE', 'DEBUG_LEVELS', 'logger', 'get_logging_level', 'is_debug_enabled', 'set_debug_verbosity']
+
+TRACE = 5 # Below logging.DEBUG, for the calls of the methods that are run for every message
+logging.addLevelName(TRACE, 'TRACE')
+
+# Verbosity of `debug()` messages -> logging level
+DEBUG_LEVELS = {
+    1: logging.DEBUG,
+    2: logging.DEBUG - 1,
+    3: logging.DEBUG - 2,
+    4: TRACE,
+}
+
+logger = logging.getLogger('glue_openspace_thesis')
+# Messages of `log()` are shown, debug messages only once a verbosity is set
+logger.setLevel(logging.INFO)
+
+def get_logging_level(log_level: "int") -> "int":
+    return DEBUG_LEVELS.get(log_level, TRACE)
+
+def is_debug_enabled(log_level: "int" = 1) -> "bool":
+    '''
+        Returns True if debug messages of the verbosity are shown. Guard
+        messages that are expensive to build with it, e.g. per key.
+    '''
+    return logger.isEnabledFor(DEBUG_LEVELS.get(log_level, TRACE))
+
+def set_debug_verbosity(log_level: "int"):
+    '''
+        Shows the debug messages up to the verbosity, from 1 (a few
+        messages per upload) to 4 (every method call). 0 hides them all.
+    '''
+    logger.setLevel(get_logging_level(log_level) if log_level > 0 else logging.INFO)
@@ -0,0 +1,272 @@
+from collections import deque
+from threading import Lock
+import time
+from typing import Union
+
+import numpy as np
+
+__all__ = [
+    'METRICS_WINDOW', 'LATENCY_BIN_EDGES', 'STAGES',
+    'MessageMetrics', 'RollingHistogram', 'PipelineMetrics'
+]
+
+METRICS_WINDOW = 256 # Amount of recent messages the statistics are computed from
+LATENCY_BIN_EDGES = np.logspace(-5, 2, 29) # Seconds, 10 µs to 100 s with four bins per decade
+STAGES = ('encode', 'queue', 'send', 'total')
+
+class MessageMetrics:
+    """
+    The timestamps of an outgoing "Data" message of a layer, from
+    `time.perf_counter()`. The message is enqueued when the first value is
+    added, encoded when the last value is ready, and sent by the session.
+    """
+    identifier: "str"
+    enqueued_at: "float"
+    encoded_at: "float"
+    send_started_at: "Union[float, None]"
+    send_completed_at: "Union[float, None]"
+    # Bytes of the key, the amount and the values of every key in the subject
+    bytes_per_key: "dict[str, int]"
+    n_bytes: "int"
+
+    def __init__(self, identifier: "str", enqueued_at: "float"):
+        self.identifier = identifier
+        self.enqueued_at = enqueued_at
+        self.encoded_at = enqueued_at
+        self.send_started_at = None
+        self.send_completed_at = None
+        self.bytes_per_key = {}
+        self.n_bytes = 0
+
+    @property
+    def encode_seconds(self) -> "float":
+        return self.encoded_at - self.enqueued_at
+
+    @property
+    def queue_seconds(self) -> "float":
+        return self.send_started_at - self.encoded_at
+
+    @property
+    def send_seconds(self) -> "float":
+        return self.send_completed_at - self.send_started_at
+
+    @property
+    def total_seconds(self) -> "float":
+        return self.send_completed_at - self.enqueued_at
+
+class RollingHistogram:
+    """
+    A histogram of the last `window` values.
+    """
+    bin_edges: "np.ndarray"
+    _values: "deque[float]"
+
+    def __init__(self, bin_edges: "np.ndarray" = LATENCY_BIN_EDGES, window: "int" = METRICS_WINDOW):
+        self.bin_edges = bin_edges
+        self._values = deque(maxlen=window)
+
+    def __len__(self) -> "int":
+        return len(self._values)
+
+    def add(self, value: "float"):
+        self._values.append(value)
+
+    def clear(self):
+        self._values.clear()
+
+    @property
+    def last(self) -> "Union[float, None]":
+        return self._values[-1] if len(self._values) > 0 else None
+
+    def counts(self) -> "np.ndarray":
+        '''
+            Returns the amount of values in every bin. Values outside
+            of the bins are counted in the first or the last bin.
+        '''
+        values = np.clip(list(self._values), self.bin_edges[0], self.bin_edges[-1])
+        return np.histogram(values, bins=self.bin_edges)[0]
+
+    def percentile(self, q: "float") -> "Union[float, None]":
+        if len(self._values) == 0:
+            return None
+        return float(np.percentile(list(self._values), q))
+
+class PipelineMetrics:
+    """
+    Timestamps the outgoing messages of a viewer on their way to OpenSpace,
+    and keeps rolling histograms of the time spent in every stage:
+
+    - encode: from the first value added to the message until the last one is ready
+    - queue: waiting for the sender, e.g. behind the messages of other layers
+    - send: writing the message to the socket
+    - total: from the first value added until the message was sent
+
+    Layers add values to the message of their identifier until the session
+    takes it, so every taken message is measured from its first value.
+    """
+    window: "int"
+    bytes_per_key: "dict[str, int]"
+    n_messages: "int"
+
+    _lock: "Lock"
+    _pending: "dict[str, MessageMetrics]"
+    _in_flight: "dict[str, MessageMetrics]"
+    _sent: "deque[MessageMetrics]"
+    _histograms: "dict[str, RollingHistogram]"
+
+    def __init__(self, window: "int" = METRICS_WINDOW):
+        self.window = window
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.bytes_per_key = {}
+            self.n_messages = 0
+            self._pending = {}
+            self._in_flight = {}
+            self._sent = deque(maxlen=self.window)
+            self._histograms = {stage: RollingHistogram(window=self.window) for stage in STAGES}
+
+    # Called by the layers and the session
+
+    def on_enqueued(self, identifier: "str", encoded: "bool" = True):
+        '''
+            Called when a value is added to the outgoing message of a layer.
+            Values that are still being encoded by a worker aren't `encoded`.
+        '''
+        now = time.perf_counter()
+        with self._lock:
+            message = self._pending.get(identifier)
+            if message is None:
+                message = self._pending[identifier] = MessageMetrics(identifier, now)
+            if encoded:
+                message.encoded_at = now
+
+    def on_encoded(self, identifier: "str"):
+        '''
+            Called when the values encoded by workers are in the outgoing message.
+        '''
+        with self._lock:
+            message = self._pending.get(identifier)
+            if message is not None:
+                message.encoded_at = time.perf_counter()
+
+    def on_taken(self, identifier: "str", bytes_per_key: "dict[str, int]", n_bytes: "int"):
+        '''
+            Called when the outgoing message of a layer is taken to be sent.
+        '''
+        with self._lock:
+            message = self._pending.pop(identifier, None)
+            if message is None:
+                message = MessageMetrics(identifier, time.perf_counter())
+            message.bytes_per_key = bytes_per_key
+            message.n_bytes = n_bytes
+            self._in_flight[identifier] = message
+
+    def on_send_started(self, identifier: "str"):
+        with self._lock:
+            message = self._in_flight.get(identifier)
+            if message is not None:
+                message.send_started_at = time.perf_counter()
+
+    def on_send_completed(self, identifier: "str"):
+        now = time.perf_counter()
+        with self._lock:
+            message = self._in_flight.pop(identifier, None)
+            if message is None or message.send_started_at is None:
+                return
+
+            message.send_completed_at = now
+            self._sent.append(message)
+            self.n_messages += 1
+            for data_key, n_bytes in message.bytes_per_key.items():
+                self.bytes_per_key[data_key] = self.bytes_per_key.get(data_key, 0) + n_bytes
+
+            self._histograms['encode'].add(message.encode_seconds)
+            self._histograms['queue'].add(message.queue_seconds)
+            self._histograms['send'].add(message.send_seconds)
+            self._histograms['total'].add(message.total_seconds)
+
+    def discard(self, identifier: "str"):
+        '''
+            Forgets the message of a layer that won't be sent, e.g. of a
+            removed layer or because the connection was lost.
+        '''
+        with self._lock:
+            self._pending.pop(identifier, None)
+            self._in_flight.pop(identifier, None)
+
+    # Readable by anyone
+
+    @property
+    def messages(self) -> "list[MessageMetrics]":
+        '''
+            The last sent messages, oldest first.
+        '''
+        with self._lock:
+            return list(self._sent)
+
+    @property
+    def queue_depth(self) -> "int":
+        '''
+            The amount of layers with a message waiting to be sent.
+        '''
+        with self._lock:
+            return len(self._pending)
+
+    @property
+    def last_latency(self) -> "Union[float, None]":
+        '''
+            Seconds from the first value until the last message was sent.
+        '''
+        with self._lock:
+            return self._histograms['total'].last
+
+    def histogram(self, stage: "str") -> "RollingHistogram":
+        '''
+            Returns a copy of the histogram of the stage, one of `STAGES`.
+        '''
+        with self._lock:
+            histogram = RollingHistogram(LATENCY_BIN_EDGES, self.window)
+            histogram._values.extend(self._histograms[stage]._values)
+        return histogram
+
+    def throughput(self) -> "float":
+        '''
+            Returns the bytes per second written to the socket by the last
+            sent messages, while they were being sent.
+        '''
+        with self._lock:
+            send_seconds = sum(message.send_seconds for message in self._sent)
+            n_bytes = sum(message.n_bytes for message in self._sent)
+
+        return n_bytes / send_seconds if send_seconds > 0 else 0.0
+
+    def summary(self) -> "dict[str, object]":
+        '''
+            Returns the current statistics, the latencies are
+            medians of the last sent messages in seconds.
+        '''
+        return {
+            'n_messages': self.n_messages,
+            'queue_depth': self.queue_depth,
+            'last_latency': self.last_latency,
+            'megabytes_per_second': self.throughput() / 1e6,
+            'latency': {stage: self.histogram(stage).percentile(50) for stage in STAGES},
+            'bytes_per_key': dict(self.bytes_per_key),
+        }
+
+    def format_summary(self) -> "str":
+        summary = self.summary()
+        last_latency = summary['last_latency']
+        lines = [
+            f'Messages sent: {summary["n_messages"]}',
+            f'Throughput: {summary["megabytes_per_second"]:.2f} MB/s',
+            f'Queue depth: {summary["queue_depth"]}',
+            'Last latency: ' + ('-' if last_latency is None else f'{1000 * last_latency:.1f} ms'),
+        ]
+        for stage in STAGES[:-1]:
+            median = summary['latency'][stage]
+            lines.append(f'Median {stage}: ' + ('-' if median is None else f'{1000 * median:.1f} ms'))
+        return '\n'.join(lines)
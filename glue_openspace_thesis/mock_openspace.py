@@ -0,0 +1,284 @@
+import socket
+from threading import Condition, Thread
+import time
+from typing import Callable, Union
+
+import numpy as np
+
+from .simp import simp
+from .capabilities import CLIENT_CAPABILITIES, Capabilities, encode_handshake, parse_handshake
+
+__all__ = ['VALUE_TYPES', 'ARRAY_KEYS', 'ECHO_KEYS', 'ReceivedMessage', 'parse_data_subject', 'MockOpenSpace']
+
+HEADER_SIZE = 24 # Protocol version, message type and length of the subject
+
+# Types of the values of the keys, the others are float32
+VALUE_TYPES = {
+    simp.DataKey.PointUnit: 'str',
+    simp.DataKey.VelocityDistanceUnit: 'str',
+    simp.DataKey.VelocityTimeUnit: 'str',
+    simp.DataKey.SubsetParent: 'str',
+    simp.DataKey.VelocityEnabled: '?',
+    simp.DataKey.ColormapEnabled: '?',
+    simp.DataKey.LinearSizeEnabled: '?',
+    simp.DataKey.Visibility: '?',
+    simp.DataKey.SubsetBitset: 'u1',
+    simp.DataKey.VelocityDayRecorded: '>i4',
+    simp.DataKey.VelocityMonthRecorded: '>i4',
+    simp.DataKey.VelocityYearRecorded: '>i4',
+    simp.DataKey.VelocityNanMode: '>i4',
+    simp.DataKey.ColormapNanMode: '>i4',
+    simp.DataKey.SubsetRanges: '>i4',
+    simp.DataKey.BatchTotal: '>i4',
+    simp.DataKey.BatchOffset: '>i4',
+    simp.DataKey.OctreeLevel: '>i4',
+    simp.DataKey.OctreeNodes: '>i4',
+    simp.DataKey.OctreeOffsets: '>i4',
+    simp.DataKey.FrameTotal: '>i4',
+    simp.DataKey.FrameIndex: '>i4',
+}
+
+# Keys whose values are preceded by their amount. SIMP leaves the amount
+# out for a single value, so arrays of one value can't be read by the mock.
+ARRAY_KEYS = {
+    simp.DataKey.X, simp.DataKey.Y, simp.DataKey.Z,
+    simp.DataKey.U, simp.DataKey.V, simp.DataKey.W,
+    simp.DataKey.ColormapRed, simp.DataKey.ColormapGreen,
+    simp.DataKey.ColormapBlue, simp.DataKey.ColormapAlpha,
+    simp.DataKey.ColormapAttributeData, simp.DataKey.LinearSizeAttributeData,
+    simp.DataKey.SubsetRanges, simp.DataKey.SubsetBitset,
+    simp.DataKey.OctreeBounds, simp.DataKey.OctreeNodes, simp.DataKey.OctreeOffsets,
+    simp.DataKey.FrameDeltaX, simp.DataKey.FrameDeltaY, simp.DataKey.FrameDeltaZ,
+}
+
+# Properties that can be changed in OpenSpace, which the mock sends back when echoing
+ECHO_KEYS = (
+    simp.DataKey.Red, simp.DataKey.Green, simp.DataKey.Blue, simp.DataKey.Alpha,
+    simp.DataKey.ColormapEnabled, simp.DataKey.FixedSize, simp.DataKey.LinearSizeEnabled,
+    simp.DataKey.VelocityEnabled, simp.DataKey.Visibility
+)
+
+class ReceivedMessage:
+    """
+    A message received by the mock. `values` holds the values of a
+    "Data" message by key, arrays are views of the received subject.
+    """
+    message_type: "str"
+    identifier: "str"
+    gui_name: "str"
+    values: "dict[str, Union[np.ndarray, str]]"
+    n_bytes: "int"
+    received_at: "float"
+
+    def __init__(self, message_type: "str", identifier: "str", gui_name: "str",
+                 values: "dict[str, Union[np.ndarray, str]]", n_bytes: "int", received_at: "float"):
+        self.message_type = message_type
+        self.identifier = identifier
+        self.gui_name = gui_name
+        self.values = values
+        self.n_bytes = n_bytes
+        self.received_at = received_at
+
+def _read_string(subject: "bytearray", offset: "int") -> "tuple[str, int]":
+    delimiter_offset = subject.find(simp.DELIM_BYTES, offset)
+    # Delimiters in names are escaped
+    while delimiter_offset > 0 and subject[delimiter_offset - 1] == ord('\\'):
+        delimiter_offset = subject.find(simp.DELIM_BYTES, delimiter_offset + 1)
+
+    if delimiter_offset == -1:
+        raise simp.SimpError('No delimiter found for string')
+
+    return str(subject[offset:delimiter_offset], 'utf-8'), delimiter_offset + 1
+
+def parse_data_subject(subject: "bytearray") -> "tuple[str, str, dict[str, Union[np.ndarray, str]]]":
+    """
+    Reads the identifier, the GUI name and the values of a "Data" message subject.
+    """
+    identifier, offset = _read_string(subject, 0)
+    gui_name, offset = _read_string(subject, offset)
+
+    values = {}
+    while offset < len(subject):
+        data_key, offset = _read_string(subject, offset)
+        value_type = VALUE_TYPES.get(data_key, '>f4')
+
+        if value_type == 'str':
+            values[data_key], offset = _read_string(subject, offset)
+            continue
+
+        n_values = 1
+        if data_key in ARRAY_KEYS:
+            n_values = int(np.frombuffer(subject, dtype='>i4', count=1, offset=offset)[0])
+            offset += 4
+
+        values[data_key] = np.frombuffer(subject, dtype=value_type, count=n_values, offset=offset)
+        offset += n_values * np.dtype(value_type).itemsize
+
+    return identifier, gui_name, values
+
+class MockOpenSpace:
+    """
+    A SIMP server that acts like OpenSpace, to test and benchmark the
+    plugin without it. It answers the handshake, reads "Data" messages
+    into the latest values of every layer, and removes layers on "Remove
+    Scene Graph Node" messages. With `echo`, the properties that can be
+    changed in OpenSpace are sent back, like OpenSpace does when a user
+    changes them. The handshake is answered with the offered capabilities
+    that are in `capabilities`, or, if it's None, like a build that
+    doesn't know capabilities.
+    """
+    echo: "bool"
+    capabilities: "Union[Capabilities, None]"
+    offered_capabilities: "Union[Capabilities, None]"
+    messages: "list[ReceivedMessage]"
+    layers: "dict[str, dict[str, Union[np.ndarray, str]]]"
+    n_bytes_received: "int"
+    n_echoed: "int"
+
+    _server: "socket.socket"
+    _connections: "list[socket.socket]"
+    _condition: "Condition"
+    _running: "bool"
+
+    def __init__(self, host: "str" = '127.0.0.1', port: "int" = 0, echo: "bool" = False,
+                 capabilities: "Union[Capabilities, None]" = CLIENT_CAPABILITIES):
+        self.echo = echo
+        self.capabilities = capabilities
+        self.offered_capabilities = None
+        self.messages = []
+        self.layers = {}
+        self.n_bytes_received = 0
+        self.n_echoed = 0
+
+        self._server = socket.create_server((host, port))
+        self._connections = []
+        self._condition = Condition()
+        self._running = False
+
+    @property
+    def address(self) -> "tuple[str, int]":
+        return self._server.getsockname()[:2]
+
+    def start(self):
+        self._running = True
+        Thread(target=self._accept_loop, daemon=True).start()
+
+    def close(self):
+        self._running = False
+        self._server.close()
+        for connection in list(self._connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.close()
+
+    def wait_for(self, predicate: "Callable[[], bool]", timeout: "Union[float, None]" = None) -> "bool":
+        '''
+            Waits until `predicate()` is True, it's checked
+            every time a message has been received.
+        '''
+        with self._condition:
+            return self._condition.wait_for(predicate, timeout)
+
+    def send_selection(self, identifier: "str", ranges: "np.ndarray"):
+        '''
+            Sends a selection of the points of a layer, as (start, length)
+            pairs of their indices, to every connected client.
+        '''
+        ranges = np.asarray(ranges, dtype='>i4')
+        subject = bytearray(identifier + simp.DELIM + identifier + simp.DELIM, 'utf-8')
+        subject += bytes(simp.DataKey.SubsetRanges + simp.DELIM, 'utf-8')
+        subject += np.array([len(ranges)], dtype='>i4').tobytes() + ranges.tobytes()
+        for connection in list(self._connections):
+            self._send(connection, simp.MessageType.Data, bytes(subject))
+
+    def get_layer_messages(self, identifier: "str") -> "list[ReceivedMessage]":
+        with self._condition:
+            return [message for message in self.messages if message.identifier == identifier]
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                break
+
+            self._connections.append(connection)
+            Thread(target=self._connection_loop, args=(connection,), daemon=True).start()
+
+    def _read_exactly(self, connection: "socket.socket", n_bytes: "int") -> "bytearray":
+        buffer = bytearray(n_bytes)
+        view = memoryview(buffer)
+        n_read = 0
+        while n_read < n_bytes:
+            n_chunk = connection.recv_into(view[n_read:])
+            if n_chunk == 0:
+                raise simp.DisconnectionException
+            n_read += n_chunk
+        return buffer
+
+    def _connection_loop(self, connection: "socket.socket"):
+        try:
+            while self._running:
+                header = self._read_exactly(connection, HEADER_SIZE).decode('utf-8')
+                message_type = header[5:9]
+                subject = self._read_exactly(connection, int(header[9:]))
+                self._on_message(connection, message_type, subject, HEADER_SIZE + len(subject))
+
+        except (simp.DisconnectionException, OSError):
+            pass
+
+        finally:
+            if connection in self._connections:
+                self._connections.remove(connection)
+            connection.close()
+
+    def _send(self, connection: "socket.socket", message_type: "str", subject: "bytes"):
+        header = bytes(str(simp.protocol_version) + message_type + format(len(subject), '015d'), 'utf-8')
+        connection.sendall(header + subject)
+
+    def _on_message(self, connection: "socket.socket", message_type: "str", subject: "bytearray", n_bytes: "int"):
+        received_at = time.perf_counter()
+        identifier, gui_name, values = '', '', {}
+
+        if message_type == simp.MessageType.Connection:
+            _, self.offered_capabilities = parse_handshake(subject)
+            accepted = Capabilities()
+            if self.capabilities is not None and self.offered_capabilities is not None:
+                accepted = self.capabilities.agree(self.offered_capabilities)
+            self._send(connection, simp.MessageType.Connection, bytes(encode_handshake('OpenSpace', accepted)))
+
+        elif message_type == simp.MessageType.Data:
+            identifier, gui_name, values = parse_data_subject(subject)
+
+        elif message_type == simp.MessageType.RemoveSceneGraphNode:
+            identifier, _ = _read_string(subject, 0)
+
+        with self._condition:
+            self.n_bytes_received += n_bytes
+            self.messages.append(ReceivedMessage(message_type, identifier, gui_name, values, n_bytes, received_at))
+
+            if message_type == simp.MessageType.Data:
+                self.layers.setdefault(identifier, {}).update(values)
+            elif message_type == simp.MessageType.RemoveSceneGraphNode:
+                self.layers.pop(identifier, None)
+
+            self._condition.notify_all()
+
+        if self.echo and message_type == simp.MessageType.Data:
+            self._echo(connection, identifier, gui_name, values)
+
+    def _echo(self, connection: "socket.socket", identifier: "str", gui_name: "str", values: "dict"):
+        subject = bytearray(identifier + simp.DELIM + gui_name + simp.DELIM, 'utf-8')
+        n_echoed = 0
+        for data_key in ECHO_KEYS:
+            if data_key in values:
+                subject += bytes(data_key + simp.DELIM, 'utf-8') + values[data_key].tobytes()
+                n_echoed += 1
+
+        if n_echoed > 0:
+            self._send(connection, simp.MessageType.Data, bytes(subject))
+            with self._condition:
+                self.n_echoed += 1
+                self._condition.notify_all()
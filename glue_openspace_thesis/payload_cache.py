@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+from typing import Callable, Union
+from uuid import uuid4
+
+import numpy as np
+
+__all__ = [
+    'PAYLOAD_CACHE_DIRECTORY', 'PAYLOAD_CACHE_INDEX', 'PAYLOAD_CACHE_VERSION',
+    'hash_columns', 'PayloadCache'
+]
+
+PAYLOAD_CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'glue-openspace') # Sidecars of saved sessions
+PAYLOAD_CACHE_INDEX = 'index.json' # Lists the buffers of a sidecar
+PAYLOAD_CACHE_VERSION = 1 # Sidecars of other versions are ignored
+
+def hash_columns(*columns: "np.ndarray") -> "str":
+    '''
+        Returns a hash of the values of the columns, which
+        tells if a buffer was encoded from the same values.
+    '''
+    digest = hashlib.blake2b(digest_size=16)
+    for column in columns:
+        column = np.ascontiguousarray(column)
+        digest.update(bytes(f'{column.dtype.str}{column.shape};', 'utf-8'))
+        digest.update(column.reshape(-1).view(np.uint8))
+    return digest.hexdigest()
+
+class PayloadCache:
+    """
+    A sidecar directory of encoded buffers, e.g. converted positions, which
+    is written next to a saved session. `index.json` lists the parameters
+    every buffer was encoded with and a hash of the columns it was encoded
+    from. Buffers are memory-mapped when they're found, so a restored
+    session sends them without encoding them again.
+    """
+    path: "str"
+
+    _entries: "list[dict]"
+
+    def __init__(self, path: "str", entries: "Union[list[dict], None]" = None):
+        self.path = path
+        self._entries = [] if entries is None else entries
+
+    def __len__(self) -> "int":
+        return len(self._entries)
+
+    @classmethod
+    def load(cls, path: "str") -> "PayloadCache":
+        '''
+            Reads the index of the sidecar at `path`. A sidecar that doesn't
+            exist or was written by another version is empty.
+        '''
+        try:
+            with open(os.path.join(path, PAYLOAD_CACHE_INDEX)) as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return cls(path)
+
+        if index.get('version') != PAYLOAD_CACHE_VERSION:
+            return cls(path)
+        return cls(path, index['entries'])
+
+    def find(self, params: "dict", get_hash: "Callable[[], str]") -> "Union[np.ndarray, None]":
+        '''
+            Returns the memory-mapped buffer that was encoded with `params`
+            from columns with the hash returned by `get_hash()`. The columns
+            are only hashed if a buffer was encoded with the same parameters.
+        '''
+        candidates = [entry for entry in self._entries if entry['params'] == params]
+        if len(candidates) == 0:
+            return None
+
+        columns_hash = get_hash()
+        for entry in candidates:
+            if entry['hash'] == columns_hash:
+                try:
+                    return np.load(os.path.join(self.path, entry['file']), mmap_mode='r')
+                except (OSError, ValueError):
+                    return None
+        return None
+
+    def write(self, buffers: "list[tuple[dict, str, np.ndarray]]"):
+        '''
+            Replaces the buffers of the sidecar with `buffers`, which are
+            tuples of the parameters, the hash of the columns and the encoded
+            array. Buffers that are already in the sidecar aren't written again.
+        '''
+        os.makedirs(self.path, exist_ok=True)
+        old_entries = {(json.dumps(entry['params'], sort_keys=True), entry['hash']): entry for entry in self._entries}
+
+        entries = []
+        written = set()
+        for params, columns_hash, array in buffers:
+            key = (json.dumps(params, sort_keys=True), columns_hash)
+            # Layers of the same dataset have the same buffers
+            if key in written:
+                continue
+            written.add(key)
+
+            entry = old_entries.pop(key, None)
+            if entry is None:
+                # New names, a restored session may still map the old files
+                entry = {'params': params, 'hash': columns_hash, 'file': f'{uuid4().hex}.npy'}
+                np.save(os.path.join(self.path, entry['file']), np.ascontiguousarray(array))
+            entries.append(entry)
+
+        self._entries = entries
+        with open(os.path.join(self.path, PAYLOAD_CACHE_INDEX), 'w') as file:
+            json.dump({'version': PAYLOAD_CACHE_VERSION, 'entries': entries}, file, indent=2)
+
+        for entry in old_entries.values():
+            try:
+                os.remove(os.path.join(self.path, entry['file']))
+            except OSError:
+                pass
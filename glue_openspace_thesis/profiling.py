@@ -0,0 +1,157 @@
+from contextlib import contextmanager
+import cProfile
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from .column_source import payload_nbytes
+
+if TYPE_CHECKING:
+    from .viewer_base import OpenSpaceViewerBase
+
+__all__ = [
+    'PROFILE_KEEP', 'PROFILE_DIRECTORY', 'PROFILE_INDEX', 'ProfileEntry', 'CycleProfiler',
+    'profiled'
+]
+
+PROFILE_KEEP = 10 # Amount of the slowest profiles kept on disk
+PROFILE_DIRECTORY = os.path.join(tempfile.gettempdir(), 'glue-openspace-profiles')
+PROFILE_INDEX = 'profiles.json' # Lists the kept profiles, slowest first
+
+class ProfileEntry:
+    """
+    A kept profile. `path` is a cProfile dump, e.g. for `pstats.Stats(path)`
+    or snakeviz, and `info` holds e.g. the size of the sent message.
+    """
+    kind: "str"
+    seconds: "float"
+    path: "str"
+    recorded_at: "float"
+    info: "dict"
+
+    def __init__(self, kind: "str", seconds: "float", path: "str", recorded_at: "float", info: "dict"):
+        self.kind = kind
+        self.seconds = seconds
+        self.path = path
+        self.recorded_at = recorded_at
+        self.info = info
+
+    def to_json(self) -> "dict":
+        return {
+            'kind': self.kind, 'seconds': self.seconds, 'file': os.path.basename(self.path),
+            'recorded_at': self.recorded_at, **self.info
+        }
+
+class CycleProfiler:
+    """
+    Profiles cycles of work, e.g. sending a message, with cProfile and keeps
+    the profiles of the `n_slowest` cycles in `directory`, listed with the
+    size of their messages in `profiles.json`. Cycles that start while
+    another cycle is profiled in the same thread are part of that profile.
+    """
+    directory: "str"
+    n_slowest: "int"
+    n_profiled: "int"
+
+    _entries: "list[ProfileEntry]"
+    _lock: "threading.Lock"
+    _active: "threading.local"
+
+    def __init__(self, directory: "str" = PROFILE_DIRECTORY, n_slowest: "int" = PROFILE_KEEP):
+        self.directory = directory
+        self.n_slowest = n_slowest
+        self.n_profiled = 0
+        self._entries = []
+        self._lock = threading.Lock()
+        self._active = threading.local()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def entries(self) -> "list[ProfileEntry]":
+        '''
+            The kept profiles, slowest first.
+        '''
+        with self._lock:
+            return list(self._entries)
+
+    @contextmanager
+    def profile(self, kind: "str", **info):
+        '''
+            Profiles the body of the `with` statement. The yielded dict
+            is saved with the profile, so sizes that are only known at
+            the end of the cycle can be added to it.
+        '''
+        if getattr(self._active, 'profiling', False):
+            yield info
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is running, e.g. in another thread on Python 3.12+
+            yield info
+            return
+
+        self._active.profiling = True
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            seconds = time.perf_counter() - start
+            profile.disable()
+            self._active.profiling = False
+            self._keep_if_slow(kind, seconds, profile, info)
+
+    def _keep_if_slow(self, kind: "str", seconds: "float", profile: "cProfile.Profile", info: "dict"):
+        with self._lock:
+            self.n_profiled += 1
+            if len(self._entries) >= self.n_slowest and seconds <= self._entries[-1].seconds:
+                return
+
+            name = f'{kind.replace(" ", "-")}-{self.n_profiled:06d}-{1000 * seconds:.0f}ms.prof'
+            entry = ProfileEntry(kind, seconds, os.path.join(self.directory, name), time.time(), info)
+            profile.dump_stats(entry.path)
+
+            self._entries.append(entry)
+            self._entries.sort(key=lambda entry: entry.seconds, reverse=True)
+            for removed in self._entries[self.n_slowest:]:
+                try:
+                    os.remove(removed.path)
+                except OSError:
+                    pass
+            del self._entries[self.n_slowest:]
+
+            with open(os.path.join(self.directory, PROFILE_INDEX), 'w') as file:
+                json.dump([entry.to_json() for entry in self._entries], file, indent=2)
+
+def _outgoing_nbytes(viewer: "OpenSpaceViewerBase", identifier: "str") -> "int":
+    # The sender may take the message meanwhile, the entries are copied before they're read
+    entries = list(viewer._outgoing_data_message.get(identifier, {}).values())
+    return sum(payload_nbytes(entry[0]) for entry in entries if isinstance(entry, tuple))
+
+def profiled(kind: "str"):
+    '''
+        Decorates a method of a layer artist to profile its calls with the
+        profiler of the viewer, if it has one. The bytes that are in the
+        outgoing message of the layer afterwards are saved with the profile.
+    '''
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profiler = getattr(self._viewer, 'profiler', None)
+            if profiler is None:
+                return method(self, *args, **kwargs)
+
+            identifier = self.get_identifier_str()
+            with profiler.profile(kind, identifier=identifier) as info:
+                result = method(self, *args, **kwargs)
+                info['n_bytes'] = _outgoing_nbytes(self._viewer, identifier)
+            return result
+
+        return wrapper
+    return decorator
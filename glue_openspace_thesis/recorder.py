@@ -0,0 +1,280 @@
+import os
+import socket
+import struct
+from threading import Lock
+import time
+from typing import BinaryIO, Iterator, Union
+
+__all__ = [
+    'LOG_MAGIC', 'INDEX_MAGIC', 'OUTGOING', 'INCOMING',
+    'SimpRecorder', 'SimpLogRecord', 'SimpLogReader', 'ReplayStats', 'replay'
+]
+
+LOG_MAGIC = b'SIMPLOG1' # Start of a log file
+INDEX_MAGIC = b'SIMPIDX1' # End of a log file with an index
+OUTGOING = b'O' # Sent by Glue
+INCOMING = b'I' # Received from OpenSpace
+
+REPLAY_CHUNK_SIZE = 1 << 20 # Bytes read from the log and sent at once
+
+# Direction, seconds since the recording started, length of the message
+_RECORD_HEADER = struct.Struct('!cdQ')
+# Offset of the message, direction, seconds since the recording started, length of the message
+_INDEX_ENTRY = struct.Struct('!QcdQ')
+# Offset of the index, amount of records, INDEX_MAGIC
+_FOOTER = struct.Struct('!QQ8s')
+
+class SimpLogRecord:
+    """
+    A message in a log, `offset` is where its bytes start in the file.
+    """
+    direction: "bytes"
+    timestamp: "float"
+    offset: "int"
+    length: "int"
+
+    def __init__(self, direction: "bytes", timestamp: "float", offset: "int", length: "int"):
+        self.direction = direction
+        self.timestamp = timestamp
+        self.offset = offset
+        self.length = length
+
+    def __repr__(self):
+        return f'SimpLogRecord({self.direction!r}, {self.timestamp}, {self.offset}, {self.length})'
+
+class SimpRecorder:
+    """
+    Writes every message of a session, as it went over the socket, to a
+    log file. Every record has a header with the direction, the time since
+    the recording started and the length of the message. An index of all
+    records is written at the end when the recorder is closed.
+
+    Outgoing messages are written chunk by chunk while they are sent, so
+    they are never held in memory in full. Incoming messages that arrive
+    meanwhile are written after the outgoing message.
+    """
+    path: "str"
+    _file: "BinaryIO"
+    _lock: "Lock"
+    _start: "float"
+    _records: "list[SimpLogRecord]"
+    _deferred: "list[tuple[float, bytes]]"
+
+    # The outgoing message being written
+    _outgoing: "Union[SimpLogRecord, None]"
+    _outgoing_written: "int"
+
+    def __init__(self, path: "str"):
+        self.path = path
+        self._file = open(path, 'wb')
+        self._file.write(LOG_MAGIC)
+        self._lock = Lock()
+        self._start = time.monotonic()
+        self._records = []
+        self._deferred = []
+        self._outgoing = None
+        self._outgoing_written = 0
+
+    @property
+    def closed(self) -> "bool":
+        return self._file.closed
+
+    def _write_header(self, direction: "bytes", timestamp: "float", length: "int") -> "SimpLogRecord":
+        self._file.write(_RECORD_HEADER.pack(direction, timestamp, length))
+        return SimpLogRecord(direction, timestamp, self._file.tell(), length)
+
+    def record_incoming(self, message: "bytes"):
+        timestamp = time.monotonic() - self._start
+        with self._lock:
+            if self.closed:
+                return
+
+            if self._outgoing is not None:
+                self._deferred.append((timestamp, bytes(message)))
+                return
+
+            self._records.append(self._write_header(INCOMING, timestamp, len(message)))
+            self._file.write(message)
+
+    def begin_outgoing(self, length: "int"):
+        '''
+            Starts the record of an outgoing message of `length` bytes,
+            whose bytes are passed to `write_outgoing()` as they are sent.
+            DANGER! Only one outgoing message can be written at a time
+        '''
+        with self._lock:
+            if self.closed:
+                return
+
+            self._outgoing = self._write_header(OUTGOING, time.monotonic() - self._start, length)
+            self._outgoing_written = 0
+
+    def write_outgoing(self, chunk):
+        # Incoming messages are deferred until the outgoing message is done
+        if self._outgoing is None:
+            return
+
+        self._file.write(chunk)
+        self._outgoing_written += memoryview(chunk).nbytes
+
+    def end_outgoing(self):
+        '''
+            Finishes the record of the outgoing message. A message that wasn't
+            sent in full, e.g. when the connection was lost, is left out.
+        '''
+        with self._lock:
+            record = self._outgoing
+            self._outgoing = None
+            if record is None:
+                return
+
+            if self._outgoing_written == record.length:
+                self._records.append(record)
+            else:
+                self._file.seek(record.offset - _RECORD_HEADER.size)
+                self._file.truncate()
+
+            for timestamp, message in self._deferred:
+                self._records.append(self._write_header(INCOMING, timestamp, len(message)))
+                self._file.write(message)
+            self._deferred = []
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+
+            index_offset = self._file.tell()
+            for record in self._records:
+                self._file.write(_INDEX_ENTRY.pack(record.offset, record.direction, record.timestamp, record.length))
+            self._file.write(_FOOTER.pack(index_offset, len(self._records), INDEX_MAGIC))
+            self._file.close()
+
+class SimpLogReader:
+    """
+    Reads the records of a log. The index at the end of the log is used
+    if there is one, otherwise the records are found by reading the log
+    from the start, e.g. when the recording was never closed.
+    """
+    path: "str"
+    records: "list[SimpLogRecord]"
+    _file: "BinaryIO"
+
+    def __init__(self, path: "str"):
+        self.path = path
+        self._file = open(path, 'rb')
+
+        if self._file.read(len(LOG_MAGIC)) != LOG_MAGIC:
+            self._file.close()
+            raise ValueError(f'\'{path}\' isn\'t a SIMP log')
+
+        self.records = self._read_index()
+        if self.records is None:
+            self.records = self._scan_records()
+
+    def __len__(self) -> "int":
+        return len(self.records)
+
+    def __iter__(self) -> "Iterator[SimpLogRecord]":
+        return iter(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def _read_index(self) -> "Union[list[SimpLogRecord], None]":
+        size = os.fstat(self._file.fileno()).st_size
+        if size < len(LOG_MAGIC) + _FOOTER.size:
+            return None
+
+        self._file.seek(size - _FOOTER.size)
+        index_offset, n_records, magic = _FOOTER.unpack(self._file.read(_FOOTER.size))
+        if magic != INDEX_MAGIC or index_offset + n_records * _INDEX_ENTRY.size != size - _FOOTER.size:
+            return None
+
+        self._file.seek(index_offset)
+        index = self._file.read(n_records * _INDEX_ENTRY.size)
+        records = []
+        for offset, direction, timestamp, length in _INDEX_ENTRY.iter_unpack(index):
+            records.append(SimpLogRecord(direction, timestamp, offset, length))
+        return records
+
+    def _scan_records(self) -> "list[SimpLogRecord]":
+        records = []
+        offset = len(LOG_MAGIC)
+        size = os.fstat(self._file.fileno()).st_size
+
+        while offset + _RECORD_HEADER.size <= size:
+            self._file.seek(offset)
+            direction, timestamp, length = _RECORD_HEADER.unpack(self._file.read(_RECORD_HEADER.size))
+            offset += _RECORD_HEADER.size
+            # The last record is cut off
+            if direction not in (OUTGOING, INCOMING) or offset + length > size:
+                break
+
+            records.append(SimpLogRecord(direction, timestamp, offset, length))
+            offset += length
+
+        return records
+
+    def iter_message_chunks(self, record: "SimpLogRecord", chunk_size: "int" = REPLAY_CHUNK_SIZE) -> "Iterator[bytes]":
+        position = record.offset
+        end = record.offset + record.length
+        while position < end:
+            self._file.seek(position)
+            chunk = self._file.read(min(chunk_size, end - position))
+            if len(chunk) == 0:
+                raise EOFError(f'Record at {record.offset} is cut off')
+            position += len(chunk)
+            yield chunk
+
+    def read_message(self, record: "SimpLogRecord") -> "bytes":
+        return b''.join(self.iter_message_chunks(record))
+
+class ReplayStats:
+    n_messages: "int"
+    n_bytes: "int"
+    elapsed: "float"
+
+    def __init__(self, n_messages: "int", n_bytes: "int", elapsed: "float"):
+        self.n_messages = n_messages
+        self.n_bytes = n_bytes
+        self.elapsed = elapsed
+
+    @property
+    def bytes_per_second(self) -> "float":
+        return self.n_bytes / self.elapsed if self.elapsed > 0 else float('inf')
+
+    def __repr__(self):
+        return f'ReplayStats({self.n_messages} messages, {self.n_bytes} bytes, {self.elapsed:.3f} s)'
+
+def replay(path: "str", sock: "socket.socket", realtime: "bool" = False,
+           speed: "float" = 1.0, direction: "bytes" = OUTGOING) -> "ReplayStats":
+    """
+    Sends the messages of one direction of a log into a socket, as fast as
+    possible, or at the times they were recorded if `realtime` is True,
+    `speed` times faster.
+    """
+    with SimpLogReader(path) as reader:
+        records = [record for record in reader if record.direction == direction]
+
+        n_bytes = 0
+        start = time.monotonic()
+        first_timestamp = records[0].timestamp if len(records) > 0 else 0.0
+
+        for record in records:
+            if realtime:
+                delay = (record.timestamp - first_timestamp) / speed - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            for chunk in reader.iter_message_chunks(record):
+                sock.sendall(chunk)
+            n_bytes += record.length
+
+        return ReplayStats(len(records), n_bytes, time.monotonic() - start)
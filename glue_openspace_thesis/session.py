@@ -0,0 +1,417 @@
+import logging
+import socket
+from threading import Condition, Lock, RLock, Thread
+import time
+from typing import TYPE_CHECKING, Union
+
+from .simp import simp
+from .recorder import SimpRecorder
+from .utils import WAIT_TIME
+from .tracing import span
+from .column_source import payload_nbytes
+from .log import logger
+from .capabilities import CLIENT_CAPABILITIES, LEGACY_CAPABILITIES, Capabilities, encode_handshake, parse_handshake
+
+if TYPE_CHECKING:
+    from .viewer import OpenSpaceDataViewer
+
+__all__ = ['HANDSHAKE_TIMEOUT', 'RECONNECT_RETRIES', 'SimpSession', 'SimpSessionManager', 'get_session_manager']
+
+HANDSHAKE_TIMEOUT = 10.0 # Seconds to wait for OpenSpace to answer the "Connection" message
+RECONNECT_RETRIES = 3 # Attempts to open the connection again after it was lost
+
+class SimpSession:
+    """
+    One connection to an OpenSpace instance, shared by all viewers that
+    connect to the same endpoint. The session does the handshake, listens
+    for incoming messages and sends the outgoing messages of all viewers.
+    Viewers take turns, one layer message at a time, so a large upload in
+    one viewer doesn't hold back the others. If the connection is lost,
+    the session reconnects once on behalf of all its viewers.
+
+    The handshake lists the capabilities of the plugin and OpenSpace
+    answers with the ones it accepts, which are agreed for the connection.
+    """
+    host: "str"
+    port: "int"
+    capabilities: "Capabilities"
+
+    _socket: "Union[socket.socket, None]"
+    _send_lock: "Lock"
+    _lost_connection: "bool"
+    _recorder: "Union[SimpRecorder, None]"
+
+    _viewers: "list[OpenSpaceDataViewer]"
+    _lock: "RLock"
+    _condition: "Condition"
+
+    _running: "bool"
+    _is_connected: "bool"
+    _next_viewer: "int"
+    _listener_thread: "Union[Thread, None]"
+    _sender_thread: "Union[Thread, None]"
+
+    def __init__(self, host: "str", port: "int"):
+        self.host = host
+        self.port = port
+        self.capabilities = LEGACY_CAPABILITIES
+
+        self._socket = None
+        self._send_lock = Lock()
+        self._lost_connection = False
+        self._recorder = None
+
+        self._viewers = []
+        self._lock = RLock()
+        # Shared by the producers of all viewers, so that the sender wakes up for any of them
+        self._condition = Condition()
+
+        self._running = False
+        self._is_connected = False
+        self._next_viewer = 0
+        self._listener_thread = None
+        self._sender_thread = None
+
+    @property
+    def viewers(self) -> "list[OpenSpaceDataViewer]":
+        with self._lock:
+            return list(self._viewers)
+
+    def log(self, msg: "str", level: "int" = logging.INFO):
+        logger.log(level, 'OpenSpace Session (%s:%s): %s', self.host, self.port, msg)
+
+    def add_viewer(self, viewer: "OpenSpaceDataViewer"):
+        with self._lock:
+            self._viewers.append(viewer)
+            viewer._outgoing_data_message_condition = self._condition
+            viewer._send_lock = self._send_lock
+            viewer._socket = self._socket
+
+            if not self._running:
+                self.start()
+            elif self._is_connected:
+                viewer.on_session_connected()
+
+    def remove_viewer(self, viewer: "OpenSpaceDataViewer") -> "bool":
+        '''
+            Removes the viewer from the session.
+            Returns True if no viewers are left.
+        '''
+        with self._lock:
+            if viewer in self._viewers:
+                self._viewers.remove(viewer)
+            return len(self._viewers) == 0
+
+    def start(self):
+        self._open_socket()
+        self._running = True
+
+        self._listener_thread = Thread(target=self._listen_loop, name='openspace-listener', daemon=True)
+        self._listener_thread.start()
+        self._sender_thread = Thread(target=self._send_loop, name='openspace-sender', daemon=True)
+        self._sender_thread.start()
+
+        self.send_handshake()
+
+    def close(self):
+        self._running = False
+        self._is_connected = False
+        self._close_socket()
+        self.stop_recording()
+
+        with self._condition:
+            self._condition.notify_all()
+
+    def start_recording(self, path: "str"):
+        '''
+            Writes all messages of the session from now on to
+            a log at `path`, which can be replayed later.
+        '''
+        recorder = SimpRecorder(path)
+        # Waits for a message that is being sent to finish
+        with self._send_lock:
+            old_recorder, self._recorder = self._recorder, recorder
+
+        if old_recorder is not None:
+            old_recorder.close()
+        self.log(f'Recording messages to \'{path}\'')
+
+    def stop_recording(self):
+        with self._send_lock:
+            recorder, self._recorder = self._recorder, None
+
+        if recorder is not None:
+            recorder.close()
+            self.log(f'Stopped recording messages to \'{recorder.path}\'')
+
+    def send_handshake(self):
+        subject = encode_handshake('Glue', CLIENT_CAPABILITIES)
+        simp.send_simp_message(self, simp.MessageType.Connection, subject)
+
+    def _open_socket(self):
+        # The handshake must arrive in time, after that the listener blocks until a message arrives
+        self._socket = socket.create_connection((self.host, self.port), timeout=HANDSHAKE_TIMEOUT)
+        # Messages are sent in several parts, which mustn't wait for the ACK of the previous part
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._lost_connection = False
+        for viewer in self.viewers:
+            viewer._socket = self._socket
+
+    def _close_socket(self, expected: "Union[socket.socket, None]" = None):
+        '''
+            Closes the socket of the session. With `expected`, only if it's
+            still that socket, so that a reconnect in the meantime isn't undone.
+        '''
+        sock = self._socket
+        if sock is None or (expected is not None and sock is not expected):
+            return
+        self._socket = None
+
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            self.log('Couldn\'t shutdown socket to OpenSpace.', logging.WARNING)
+        finally:
+            sock.close()
+
+    def _read_socket(self) -> "bytes":
+        try:
+            message_received = self._socket.recv(4096)
+        except (OSError, AttributeError) as err:
+            # The socket is closed on purpose when the session stops
+            if self._running:
+                self.log(f'Socket error: {err}', logging.WARNING)
+            raise simp.DisconnectionException
+
+        if len(message_received) < 1:
+            self.log('Received message had no content.')
+            raise simp.DisconnectionException
+
+        return message_received
+
+    def _listen_loop(self):
+        self.log('Socket listener running...')
+        try:
+            while self._running:
+                try:
+                    message = self._read_socket()
+                    recorder = self._recorder
+                    if recorder is not None:
+                        recorder.record_incoming(message)
+                    message_type, subject = simp.parse_message(self, message)
+                except simp.DisconnectionException:
+                    # Only an established connection is reconnected, a handshake
+                    # that fails or times out (also after a reconnect) gives up
+                    if not self._running or not self._is_connected or not self._reconnect():
+                        break
+                    continue
+
+                if message_type == simp.MessageType.Connection:
+                    self._on_connected(subject)
+                    continue
+
+                with span('Handle message', 'receive', type=message_type, n_bytes=len(subject)):
+                    for viewer in self.viewers:
+                        viewer.receive_subject(message_type, subject)
+
+        except Exception as exc:
+            self.log(f'Exception in listener: {exc}', logging.WARNING)
+
+        finally:
+            self.log('Socket listener shutdown...')
+            if self._running:
+                # Lost for good, the viewers detach themselves when they disconnect
+                self.close()
+                for viewer in self.viewers:
+                    viewer.on_session_closed()
+
+    def _on_connected(self, subject: "bytearray"):
+        # Builds that don't know capabilities answer with their name only
+        _, peer_capabilities = parse_handshake(subject)
+        if peer_capabilities is None:
+            self.capabilities = LEGACY_CAPABILITIES
+        else:
+            self.capabilities = CLIENT_CAPABILITIES.agree(peer_capabilities)
+
+        self._socket.settimeout(None)
+        self._is_connected = True
+        self.log('Connected to OpenSpace')
+
+        for viewer in self.viewers:
+            viewer.on_session_connected()
+
+        with self._condition:
+            self._condition.notify_all()
+
+    def _reconnect(self) -> "bool":
+        self._is_connected = False
+        self.log('Lost connection to OpenSpace, reconnecting...', logging.WARNING)
+        for viewer in self.viewers:
+            viewer.on_session_lost()
+
+        self._close_socket()
+        for _ in range(RECONNECT_RETRIES):
+            if not self._running:
+                return False
+
+            try:
+                self._open_socket()
+                self.send_handshake()
+                return True
+            except OSError as err:
+                self.log(f'Couldn\'t reconnect: {err}', logging.WARNING)
+                time.sleep(WAIT_TIME)
+
+        return False
+
+    def _next_ready_viewer(self) -> "Union[OpenSpaceDataViewer, None]":
+        '''
+            Returns the next viewer with a message to send, in round robin order.
+            DANGER! You need to hold the condition before calling this function
+        '''
+        viewers = self.viewers
+        for i in range(len(viewers)):
+            index = (self._next_viewer + i) % len(viewers)
+            if viewers[index].has_outgoing_data_message():
+                self._next_viewer = index + 1
+                return viewers[index]
+
+    def _send_loop(self):
+        ready_viewer = []
+
+        def is_ready():
+            if not self._running:
+                return True
+            if not self._is_connected:
+                return False
+
+            ready_viewer[:] = [self._next_ready_viewer()]
+            return ready_viewer[0] is not None
+
+        while self._running:
+            with self._condition:
+                self._condition.wait_for(is_ready)
+                if not self._running:
+                    break
+                viewer = ready_viewer[0]
+
+            sending_socket = self._socket
+            try:
+                profiler = getattr(viewer, 'profiler', None)
+                if profiler is None:
+                    self._send_layer_message(viewer)
+                    continue
+
+                # A cycle is profiled from taking the message until it's sent
+                with profiler.profile('send') as profile_info:
+                    self._send_layer_message(viewer, profile_info)
+
+            except Exception as exc:
+                # The sender is shared by all viewers, so it mustn't die. The
+                # stream may be out of sync, the connection starts over instead
+                self.log(f'Exception in sender: {exc}', logging.WARNING)
+                self._lost_connection = True
+                self._close_socket(sending_socket)
+
+    def _send_layer_message(self, viewer: "OpenSpaceDataViewer", profile_info: "Union[dict, None]" = None):
+        '''
+            Sends the next outgoing layer message of the viewer, if it has one.
+            The size of the message is added to `profile_info` when profiling.
+        '''
+        layer_message = viewer.pop_outgoing_layer_message()
+        if layer_message is None:
+            return
+
+        layer, subject_parts, n_attr_to_be_sent = layer_message
+        if profile_info is not None:
+            profile_info.update(
+                identifier=layer.get_identifier_str(), n_attributes=n_attr_to_be_sent,
+                n_bytes=sum(payload_nbytes(part) for part in subject_parts)
+            )
+
+        old_connection_state = viewer.set_connection_state(viewer.ConnectionState.SendingData)
+
+        metrics = getattr(viewer, 'metrics', None)
+        if metrics is not None:
+            identifier = layer.get_identifier_str()
+            metrics.on_send_started(identifier)
+
+        sending_socket = self._socket
+        try:
+            with span('Send message', 'send', n_attributes=n_attr_to_be_sent):
+                simp.send_simp_message_parts(self, simp.MessageType.Data, subject_parts)
+            # The listener may have reconnected already, which sends everything again
+            lost_connection = self._lost_connection or self._socket is not sending_socket
+            if not lost_connection:
+                viewer.debug('Sent SIMP %s message with %d attributes to OpenSpace', 2, simp.MessageType.Data, n_attr_to_be_sent)
+                layer.state.has_sent_initial_data = True
+
+            if metrics is not None:
+                if lost_connection:
+                    metrics.discard(identifier)
+                else:
+                    metrics.on_send_completed(identifier)
+
+        finally:
+            viewer.set_connection_state(old_connection_state)
+
+        if lost_connection:
+            # Wakes up the listener, which reconnects
+            self._close_socket(sending_socket)
+
+class SimpSessionManager:
+    """
+    Owns one session per OpenSpace endpoint in the process.
+    """
+    _sessions: "dict[tuple[str, int], SimpSession]"
+    _lock: "Lock"
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = Lock()
+
+    def get_session(self, host: "str", port: "int") -> "Union[SimpSession, None]":
+        with self._lock:
+            return self._sessions.get((host, port))
+
+    def attach(self, viewer: "OpenSpaceDataViewer", host: "str", port: "int") -> "SimpSession":
+        '''
+            Adds the viewer to the session of the endpoint,
+            connecting to it if it's the first viewer.
+        '''
+        with self._lock:
+            session = self._sessions.get((host, port))
+            if session is None:
+                session = SimpSession(host, port)
+                self._sessions[(host, port)] = session
+
+            try:
+                session.add_viewer(viewer)
+            except OSError:
+                if session.remove_viewer(viewer):
+                    del self._sessions[(host, port)]
+                raise
+
+            return session
+
+    def detach(self, viewer: "OpenSpaceDataViewer", session: "SimpSession"):
+        '''
+            Removes the viewer from the session, and
+            closes the session if it was the last viewer.
+        '''
+        with self._lock:
+            if not session.remove_viewer(viewer):
+                return
+
+            if self._sessions.get((session.host, session.port)) is session:
+                del self._sessions[(session.host, session.port)]
+
+        session.close()
+
+_session_manager: "Union[SimpSessionManager, None]" = None
+
+def get_session_manager() -> "SimpSessionManager":
+    global _session_manager
+    if _session_manager is None:
+        _session_manager = SimpSessionManager()
+    return _session_manager
@@ -1,9 +1,13 @@
 from enum import Enum
+import logging
 import time
 from typing import TYPE_CHECKING, Any, Type, Union
 
-from astropy import units as ap_u
+import numpy as np
+
 from .utils import POLL_RETRIES, WAIT_TIME, bytes_to_bool, bytes_to_float32, Version, bytes_to_int32
+from .column_source import iter_payload_chunks, payload_nbytes
+from .tracing import span
 
 if TYPE_CHECKING:
     from .viewer import OpenSpaceDataViewer
@@ -68,6 +72,25 @@ class Simp:
         LinearSizeAttributeData = 'lsize.attr'
         # Visibility
         Visibility = 'vis.val'
+        # Subset membership
+        SubsetParent = 'subset.parent'
+        SubsetRanges = 'subset.ranges'
+        SubsetBitset = 'subset.bitset'
+        # Progressive upload
+        BatchTotal = 'batch.total'
+        BatchOffset = 'batch.offset'
+        # Octree
+        OctreeLevel = 'octree.level'
+        OctreeBounds = 'octree.bounds'
+        OctreeNodes = 'octree.nodes'
+        OctreeOffsets = 'octree.offsets'
+        # Frames
+        FrameTotal = 'frame.total'
+        FrameIndex = 'frame.index'
+        FrameTime = 'frame.time'
+        FrameDeltaX = 'frame.dx'
+        FrameDeltaY = 'frame.dy'
+        FrameDeltaZ = 'frame.dz'
 
     class DistanceUnit(str, Enum):
         Meter = 'meters'
@@ -85,6 +108,25 @@ class Simp:
         Day = 'day'
         Year = 'year'
 
+    # Strings of astropy units (`str(unit)`) -> units of SIMP. They're
+    # written out, so astropy isn't imported to send a message
+    astropy_distance_units = {
+        'm': DistanceUnit.Meter,
+        'km': DistanceUnit.Kilometer,
+        'AU': DistanceUnit.AU,
+        'lyr': DistanceUnit.LightYears,
+        'pc': DistanceUnit.Parsec,
+        'kpc': DistanceUnit.Kiloparsec,
+        'Mpc': DistanceUnit.Megaparsec,
+    }
+    astropy_time_units = {
+        's': TimeUnit.Second,
+        'min': TimeUnit.Minute,
+        'h': TimeUnit.Hour,
+        'd': TimeUnit.Day,
+        'yr': TimeUnit.Year,
+    }
+
     class DisconnectionException(Exception):
         pass
 
@@ -99,18 +141,76 @@ class Simp:
 
         # simp.print_simp_message(viewer, message_type, subject, length_of_subject)
         
+        # Viewers share the connection, so whole messages are sent one at a time
+        with viewer._send_lock:
+            recorder = getattr(viewer, '_recorder', None)
+            if not simp.sendall_with_retries(viewer, message):
+                viewer._lost_connection = True
+                return
+
+            if recorder is not None:
+                recorder.begin_outgoing(len(message))
+                recorder.write_outgoing(message)
+                recorder.end_outgoing()
+
+    @staticmethod
+    def send_simp_message_parts(viewer: "OpenSpaceDataViewer", message_type: "MessageType", subject_parts: "list"):
+        '''
+            Sends a message with a subject made of several parts. Column payloads
+            among the parts are encoded block by block while they are sent, so
+            the whole subject is never held in memory.
+        '''
+        n_subject_bytes = sum(payload_nbytes(part) for part in subject_parts)
+        length_of_subject = str(format(n_subject_bytes, '015d'))
+        header = bytes(str(simp.protocol_version) + message_type + length_of_subject, 'utf-8')
+
+        with viewer._send_lock:
+            recorder = getattr(viewer, '_recorder', None)
+            if recorder is not None:
+                recorder.begin_outgoing(len(header) + n_subject_bytes)
+
+            try:
+                simp._send_parts(viewer, header, subject_parts, recorder)
+            finally:
+                if recorder is not None:
+                    recorder.end_outgoing()
+
+    @staticmethod
+    def _send_parts(viewer: "OpenSpaceDataViewer", header: "bytes", subject_parts: "list", recorder):
+        if not simp.sendall_with_retries(viewer, header):
+            viewer._lost_connection = True
+            return
+        if recorder is not None:
+            recorder.write_outgoing(header)
+
+        for part in subject_parts:
+            try:
+                for chunk in iter_payload_chunks(part):
+                    if not simp.sendall_with_retries(viewer, chunk):
+                        viewer._lost_connection = True
+                        return
+                    if recorder is not None:
+                        recorder.write_outgoing(chunk)
+            except Exception as exc:
+                # The length of the subject is already sent, so OpenSpace
+                # can't tell where the next message starts
+                viewer.log(f'Couldn\'t read a column while sending it: {exc}', logging.WARNING)
+                viewer._lost_connection = True
+                return
+
+    @staticmethod
+    def sendall_with_retries(viewer: "OpenSpaceDataViewer", buffer) -> "bool":
         send_retries = 0
-        message_sent = False
-        while not message_sent and send_retries < POLL_RETRIES:
+        while send_retries < POLL_RETRIES:
             try:
-                viewer._socket.sendall(message)
-                message_sent = True
+                with span('sendall', 'socket', n_bytes=len(buffer)):
+                    viewer._socket.sendall(buffer)
+                return True
             except:
                 send_retries += 1
                 time.sleep(WAIT_TIME)
 
-        if not message_sent:
-            viewer._lost_connection = True
+        return False
         
     @staticmethod
     def parse_message(viewer: "OpenSpaceDataViewer", message: "bytearray"):
@@ -118,7 +218,7 @@ class Simp:
 
         protocol_version_in = header_str[0:5]
         if protocol_version_in != str(simp.protocol_version):
-            viewer.log('Mismatch in protocol versions')
+            viewer.log('Mismatch in protocol versions', logging.WARNING)
             raise simp.DisconnectionException
 
         message_type = header_str[5:9]
@@ -170,6 +270,21 @@ class Simp:
         offset += len(byte_buffer)
         return value, offset
 
+    @staticmethod
+    def read_int32_array(message: "bytearray", offset: "int") -> "tuple[np.ndarray, int]":
+        '''
+            Reads the amount of values followed by the values,
+            like keys with more than one value are sent.
+        '''
+        n_values, offset = simp.read_int32(message, offset)
+        if n_values < 0:
+            raise simp.SimpError(f'Error when trying to parse an int array at offset={offset}')
+        simp.check_offset(message, [offset, (offset + 4 * n_values)])
+
+        values = np.frombuffer(message, dtype='>i4', count=n_values, offset=offset).astype(np.int64)
+        offset += 4 * n_values
+        return values, offset
+
     @staticmethod
     def read_bool(message: "bytearray", offset: "int") -> "tuple[bool, int]":
         simp.check_offset(message, [offset, (offset + 1)])
@@ -219,20 +334,8 @@ class Simp:
                 + f'It must be of type {type(str())}'
             )
 
-        if (astropy_unit is ap_u.m.to_string()):
-            return simp.DistanceUnit.Meter
-        elif (astropy_unit is ap_u.km.to_string()):
-            return simp.DistanceUnit.Kilometer
-        elif (astropy_unit is ap_u.AU.to_string()):
-            return simp.DistanceUnit.AU
-        elif (astropy_unit is ap_u.lyr.to_string()):
-            return simp.DistanceUnit.LightYears
-        elif (astropy_unit is ap_u.pc.to_string()):
-            return simp.DistanceUnit.Parsec
-        elif (astropy_unit is ap_u.kpc.to_string()):
-            return simp.DistanceUnit.Kiloparsec
-        elif (astropy_unit is ap_u.Mpc.to_string()):
-            return simp.DistanceUnit.Megaparsec
+        if astropy_unit in simp.astropy_distance_units:
+            return simp.astropy_distance_units[astropy_unit]
         else:
             raise simp.SimpError(
                 f'SIMP doesn\'t support the distance unit \'{astropy_unit}\''
@@ -247,14 +350,8 @@ class Simp:
                 + f'It must be of type {type(str())}'
             )
         
-        if (astropy_unit is ap_u.s.to_string()):
-            return simp.TimeUnit.Second
-        elif (astropy_unit is ap_u.min.to_string()):
-            return simp.TimeUnit.Minute
-        elif (astropy_unit is ap_u.h.to_string()):
-            return simp.TimeUnit.Hour
-        elif (astropy_unit is ap_u.yr.to_string()):
-            return simp.TimeUnit.Year
+        if astropy_unit in simp.astropy_time_units:
+            return simp.astropy_time_units[astropy_unit]
         else:
             raise simp.SimpError(
                 f'SIMP doesn\'t support the time unit \'{astropy_unit}\''
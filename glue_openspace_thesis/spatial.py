@@ -0,0 +1,120 @@
+import numpy as np
+
+__all__ = ['MORTON_BITS', 'OCTREE_LEVEL', 'morton_codes', 'SpatialIndex']
+
+MORTON_BITS = 10 # Bits per axis, i.e. a grid of 1024^3 cells
+OCTREE_LEVEL = 4 # Depth of the octree nodes sent as metadata, i.e. at most 8^4 nodes
+NAN_CODE = np.uint32(0xFFFFFFFF) # Larger than any code, so invalid points end up last
+
+def _spread_bits(v: "np.ndarray") -> "np.ndarray":
+    """
+    Spreads the lowest 10 bits of every value so that there
+    are two zero bits between each of them.
+    """
+    v = v & np.uint32(0x000003FF)
+    v = (v | (v << np.uint32(16))) & np.uint32(0x030000FF)
+    v = (v | (v << np.uint32(8))) & np.uint32(0x0300F00F)
+    v = (v | (v << np.uint32(4))) & np.uint32(0x030C30C3)
+    v = (v | (v << np.uint32(2))) & np.uint32(0x09249249)
+    return v
+
+def _compact_bits(v: "np.ndarray") -> "np.ndarray":
+    """
+    Inverse of `_spread_bits`.
+    """
+    v = v & np.uint32(0x09249249)
+    v = (v | (v >> np.uint32(2))) & np.uint32(0x030C30C3)
+    v = (v | (v >> np.uint32(4))) & np.uint32(0x0300F00F)
+    v = (v | (v >> np.uint32(8))) & np.uint32(0x030000FF)
+    v = (v | (v >> np.uint32(16))) & np.uint32(0x000003FF)
+    return v
+
+def morton_codes(x: "np.ndarray", y: "np.ndarray", z: "np.ndarray",
+                 lower: "np.ndarray", upper: "np.ndarray") -> "np.ndarray":
+    """
+    Returns the 30 bit Morton (Z-order) code of every point, quantized
+    to a grid of `2^MORTON_BITS` cells per axis between `lower` and
+    `upper`. Points with a non-finite coordinate get `NAN_CODE`.
+    """
+    n_cells = 1 << MORTON_BITS
+    extent = np.where(upper > lower, upper - lower, 1.0)
+
+    codes = np.zeros(len(x), dtype=np.uint32)
+    finite = np.ones(len(x), dtype=bool)
+    for axis, values in enumerate((x, y, z)):
+        values = np.asarray(values, dtype=np.float64)
+        finite &= np.isfinite(values)
+        cells = np.clip((values - lower[axis]) * (n_cells / extent[axis]), 0, n_cells - 1)
+        cells = np.nan_to_num(cells, nan=0.0, posinf=0.0, neginf=0.0).astype(np.uint32)
+        codes |= _spread_bits(cells) << np.uint32(2 - axis)
+
+    codes[~finite] = NAN_CODE
+    return codes
+
+class SpatialIndex:
+    """
+    An octree over a set of points, stored as the Morton order of the
+    points together with the start offset of every non-empty node at
+    depth `level` in that order.
+    """
+    order: "np.ndarray"
+    node_keys: "np.ndarray"
+    node_offsets: "np.ndarray"
+    lower: "np.ndarray"
+    upper: "np.ndarray"
+    level: "int"
+    n_finite: "int"
+
+    def __init__(self, x: "np.ndarray", y: "np.ndarray", z: "np.ndarray", level: "int" = OCTREE_LEVEL):
+        self.level = level
+
+        finite = np.isfinite(x) & np.isfinite(y) & np.isfinite(z)
+        self.n_finite = int(np.count_nonzero(finite))
+        if self.n_finite > 0:
+            self.lower = np.array([np.min(v[finite]) for v in (x, y, z)], dtype=np.float64)
+            self.upper = np.array([np.max(v[finite]) for v in (x, y, z)], dtype=np.float64)
+        else:
+            self.lower = np.zeros(3)
+            self.upper = np.zeros(3)
+
+        codes = morton_codes(x, y, z, self.lower, self.upper)
+        self.order = np.argsort(codes, kind='stable')
+
+        # Only the finite points belong to a node, the others are last in the order
+        sorted_codes = codes[self.order[:self.n_finite]]
+        keys = sorted_codes >> np.uint32(3 * (MORTON_BITS - level))
+        is_start = np.ones(len(keys), dtype=bool)
+        is_start[1:] = keys[1:] != keys[:-1]
+
+        self.node_offsets = np.flatnonzero(is_start)
+        self.node_keys = keys[self.node_offsets]
+
+    def node_bounds(self) -> "tuple[np.ndarray, np.ndarray]":
+        """
+        Returns the lower and upper corners of every node, as arrays of shape (n_nodes, 3).
+        """
+        node_size = (self.upper - self.lower) / (1 << self.level)
+        cells = np.column_stack([
+            _compact_bits(self.node_keys >> np.uint32(2 - axis)) for axis in range(3)
+        ]).astype(np.float64)
+        node_lower = self.lower + cells * node_size
+        return node_lower, node_lower + node_size
+
+    def rows_in_box(self, lower: "np.ndarray", upper: "np.ndarray") -> "np.ndarray":
+        """
+        Returns the rows of all points in the nodes that overlap the box
+        between `lower` and `upper`. The result is at node precision, so
+        it can contain points slightly outside of the box.
+        """
+        node_lower, node_upper = self.node_bounds()
+        overlaps = np.all((node_lower <= np.asarray(upper)) & (node_upper >= np.asarray(lower)), axis=1)
+
+        node_ends = np.append(self.node_offsets[1:], self.n_finite)
+        ranges = [
+            np.arange(start, end)
+            for start, end in zip(self.node_offsets[overlaps], node_ends[overlaps])
+        ]
+        if len(ranges) == 0:
+            return np.zeros(0, dtype=self.order.dtype)
+
+        return self.order[np.concatenate(ranges)]
@@ -0,0 +1,248 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, Union
+
+import numpy as np
+from glue.core.component_id import PixelComponentID
+from glue.core.state_objects import StateAttributeLimitsHelper
+
+from .cache import get_data_revision
+
+__all__ = [
+    'STATISTICS_SAMPLE_SIZE', 'PERCENTILES', 'ColumnStatistics', 'compute_column_statistics',
+    'StatisticsService', 'get_statistics_service', 'set_main_thread_dispatcher', 'StatisticsLimitsHelper'
+]
+
+STATISTICS_SAMPLE_SIZE = 10000 # Amount of values in the first, estimated statistics
+# Lower and upper percentiles of the percentile presets of the limits helpers (99.5%, 99%, 95%, 90%)
+PERCENTILES = (0.25, 0.5, 2.5, 5.0, 95.0, 97.5, 99.5, 99.75)
+
+class ColumnStatistics:
+    """
+    Statistics of the finite values of a component. If `exact` is
+    False, they are estimated from a random sample of the values.
+    """
+    minimum: "float"
+    maximum: "float"
+    percentiles: "dict[float, float]"
+    n_values: "int"
+    n_nan: "int"
+    exact: "bool"
+
+    def __init__(self, minimum: "float", maximum: "float", percentiles: "dict[float, float]",
+                 n_values: "int", n_nan: "int", exact: "bool"):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.percentiles = percentiles
+        self.n_values = n_values
+        self.n_nan = n_nan
+        self.exact = exact
+
+    def limits(self, percentile: "float" = 100) -> "Union[tuple[float, float], None]":
+        """
+        Returns the limits that contain `percentile` percent of the values,
+        or None if they aren't among the computed `PERCENTILES`.
+        """
+        if percentile == 100:
+            return self.minimum, self.maximum
+
+        exclude = (100 - percentile) / 2.
+        if exclude not in self.percentiles or 100 - exclude not in self.percentiles:
+            return None
+
+        return self.percentiles[exclude], self.percentiles[100 - exclude]
+
+def compute_column_statistics(values: "np.ndarray", exact: "bool" = True) -> "ColumnStatistics":
+    values = np.asarray(values, dtype=np.float64).ravel()
+    finite = values[np.isfinite(values)]
+    n_nan = int(np.count_nonzero(np.isnan(values)))
+
+    if len(finite) == 0:
+        return ColumnStatistics(np.nan, np.nan, {}, len(values), n_nan, exact)
+
+    percentiles = dict(zip(PERCENTILES, np.percentile(finite, PERCENTILES).tolist()))
+    return ColumnStatistics(
+        float(finite.min()), float(finite.max()), percentiles, len(values), n_nan, exact
+    )
+
+class StatisticsService:
+    """
+    Computes statistics of components in a background thread and caches
+    them by dataset, component and data revision. Until the exact
+    statistics are done, an estimate from a random sample is returned.
+    """
+    _sample_size: "int"
+    _executor: "ThreadPoolExecutor"
+    _lock: "Lock"
+    # (data uuid, component uuid) -> (revision, statistics)
+    _cache: "dict[tuple[str, str], tuple[int, ColumnStatistics]]"
+    # (data uuid, component uuid, revision) -> callbacks waiting for the exact statistics
+    _pending: "dict[tuple[str, str, int], list[Callable]]"
+
+    def __init__(self, sample_size: "int" = STATISTICS_SAMPLE_SIZE):
+        self._sample_size = sample_size
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='openspace-statistics')
+        self._lock = Lock()
+        self._cache = {}
+        self._pending = {}
+
+    def get(self, data, component_id,
+            on_ready: "Union[Callable[[object, object, ColumnStatistics], None], None]" = None) -> "ColumnStatistics":
+        """
+        Returns the statistics of the component. If they are only estimated,
+        the exact statistics are computed in the background and passed to
+        `on_ready(data, component_id, statistics)` from that thread.
+        """
+        revision = get_data_revision(data)
+        key = (data.uuid, component_id.uuid)
+
+        with self._lock:
+            cached_revision, statistics = self._cache.get(key, (None, None))
+            if cached_revision != revision:
+                statistics = None
+
+            if statistics is not None and statistics.exact:
+                return statistics
+
+        if statistics is None:
+            statistics = self._compute_sample(data, component_id)
+            with self._lock:
+                if self._cache.get(key, (None, None))[0] != revision:
+                    self._cache[key] = (revision, statistics)
+
+            # Small components are sampled in full
+            if statistics.exact:
+                return statistics
+
+        with self._lock:
+            pending_key = key + (revision,)
+            if pending_key not in self._pending:
+                self._pending[pending_key] = []
+                self._executor.submit(self._compute_exact, data, component_id, revision)
+            if on_ready is not None:
+                self._pending[pending_key].append(on_ready)
+
+        return statistics
+
+    def _compute_sample(self, data, component_id) -> "ColumnStatistics":
+        if data.size <= self._sample_size:
+            return compute_column_statistics(data.get_data(component_id))
+
+        rows = np.sort(np.random.default_rng(0).integers(0, data.size, self._sample_size))
+        if data.ndim == 1:
+            values = data.get_data(component_id, view=rows)
+        else:
+            values = data.get_data(component_id).ravel()[rows]
+
+        return compute_column_statistics(values, exact=False)
+
+    def _compute_exact(self, data, component_id, revision: "int"):
+        key = (data.uuid, component_id.uuid)
+        try:
+            statistics = compute_column_statistics(data.get_data(component_id))
+        except Exception:
+            statistics = None
+
+        with self._lock:
+            callbacks = self._pending.pop(key + (revision,), [])
+            if statistics is None or get_data_revision(data) != revision:
+                return
+            self._cache[key] = (revision, statistics)
+
+        for callback in callbacks:
+            callback(data, component_id, statistics)
+
+_statistics_service: "Union[StatisticsService, None]" = None
+
+def get_statistics_service() -> "StatisticsService":
+    global _statistics_service
+    if _statistics_service is None:
+        _statistics_service = StatisticsService()
+    return _statistics_service
+
+# Runs the callbacks of the statistics executor on the thread that owns the
+# limits, the Qt viewer replaces it. Headless viewers have no GUI thread
+_main_thread_dispatcher: "Callable[[Callable[[], None]], None]" = lambda callback: callback()
+
+def set_main_thread_dispatcher(dispatcher: "Callable[[Callable[[], None]], None]"):
+    '''
+        Sets the function that calls the callback it's given on the main
+        thread, which exact limits are handed to before they're applied.
+    '''
+    global _main_thread_dispatcher
+    _main_thread_dispatcher = dispatcher
+
+class StatisticsLimitsHelper(StateAttributeLimitsHelper):
+    """
+    A limits helper that reads the limits of numerical components from
+    the statistics service instead of computing them on the GUI thread.
+    The estimated limits are set right away and replaced by the exact
+    ones once they are done, on the main thread, unless the component
+    or the limits were changed meanwhile.
+    """
+
+    def update_values(self, force=False, use_default_modifiers=False, **properties):
+        if not force and not any(prop in properties for prop in ('attribute', ) + self.modifiers_names):
+            return super(StatisticsLimitsHelper, self).update_values(
+                force=force, use_default_modifiers=use_default_modifiers, **properties
+            )
+
+        percentile = 100 if use_default_modifiers else (getattr(self, 'percentile', None) or 100)
+        if not self._uses_statistics(percentile, use_default_modifiers):
+            return super(StatisticsLimitsHelper, self).update_values(
+                force=force, use_default_modifiers=use_default_modifiers, **properties
+            )
+
+        statistics = get_statistics_service().get(self.data, self.component_id, self._on_statistics_ready)
+        if not self._set_limits(statistics, percentile):
+            return super(StatisticsLimitsHelper, self).update_values(
+                force=force, use_default_modifiers=use_default_modifiers, **properties
+            )
+
+    def _uses_statistics(self, percentile, use_default_modifiers) -> "bool":
+        if self.data is None or percentile == 'Custom' or self._subset_state is not None:
+            return False
+
+        if not use_default_modifiers and (getattr(self, 'log', None) or getattr(self, 'display_units', None)):
+            return False
+
+        return (
+            not isinstance(self.component_id, PixelComponentID)
+            and self.data.get_kind(self.component_id) == 'numerical'
+        )
+
+    def _set_limits(self, statistics: "ColumnStatistics", percentile) -> "bool":
+        limits = statistics.limits(percentile)
+        if limits is None:
+            return False
+
+        lower, upper = limits
+        if np.isnan(lower):
+            lower, upper = 0, 1
+        else:
+            value_range = upper - lower
+            lower -= value_range * self.margin
+            upper += value_range * self.margin
+
+        self.set(lower=lower, upper=upper, percentile=percentile, log=False)
+        self._estimated_limits = None if statistics.exact else (self.component_id, lower, upper, percentile)
+        return True
+
+    def _on_statistics_ready(self, data, component_id, statistics: "ColumnStatistics"):
+        # Called on the statistics thread, the limits are only read and set on the main thread
+        _main_thread_dispatcher(lambda: self._apply_exact_limits(data, component_id, statistics))
+
+    def _apply_exact_limits(self, data, component_id, statistics: "ColumnStatistics"):
+        if self.data is not data or self.component_id is not component_id:
+            return
+
+        estimated_limits = getattr(self, '_estimated_limits', None)
+        if estimated_limits is None:
+            return
+
+        # The percentile of the helper may read 'Custom' once the limits were set
+        estimated_component_id, lower, upper, percentile = estimated_limits
+        if estimated_component_id is not component_id or (lower, upper) != (self.lower, self.upper):
+            return
+
+        self._set_limits(statistics, percentile)
@@ -0,0 +1,76 @@
+import numpy as np
+from glue.core import Data
+
+from .. import layer_artist as layer_artist_module
+from ..cache import LRUCache, bump_data_revision, get_data_revision, get_position_cache
+from ..headless import HeadlessOpenSpaceViewer
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_bytes=3 * 800)
+    for key in 'abc':
+        cache.put(key, np.zeros(100))
+
+    # Touching 'a' makes 'b' the least recently used
+    assert cache.get('a') is not None
+    cache.put('d', np.zeros(100))
+
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in 'acd')
+    assert cache.nbytes == 3 * 800
+
+def test_lru_cache_replace_and_oversized():
+    cache = LRUCache(max_bytes=1000)
+    cache.put('a', np.zeros(10))
+    cache.put('a', np.ones(20))
+    assert len(cache) == 1
+    assert cache.nbytes == 160
+
+    # Larger than the whole budget, so it's never cached
+    cache.put('b', np.zeros(1000))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+
+def test_data_revision():
+    data = Data(x=[1, 2, 3], label='data')
+    revision = get_data_revision(data)
+    assert bump_data_revision(data) == revision + 1
+    assert get_data_revision(data) == revision + 1
+    assert get_data_revision(Data(x=[1], label='other')) == 0
+
+def make_icrs_viewer(n_points):
+    rng = np.random.default_rng(0)
+    data = Data(
+        ra=rng.uniform(0, 360, n_points), dec=rng.uniform(-90, 90, n_points),
+        dist=rng.uniform(1, 10, n_points), label='icrs'
+    )
+    viewer = HeadlessOpenSpaceViewer()
+    layer = viewer.add_data(data)
+    viewer.state.coordinate_system = 'ICRS'
+    viewer.state.ra_att = data.id['ra']
+    viewer.state.dec_att = data.id['dec']
+    viewer.state.icrs_dist_att = data.id['dist']
+    return viewer, layer, data
+
+def test_positions_are_shared_by_subsets(mocker):
+    get_position_cache().clear()
+    viewer, layer, data = make_icrs_viewer(100)
+    data.new_subset(data.id['dist'] > 5, label='far')
+    subset_layer = viewer.add_data(data.subsets[0])
+
+    x, _, _ = subset_layer.get_positions()
+    convert = mocker.spy(layer_artist_module, 'icrs_to_galactic_cartesian')
+    assert np.array_equal(layer.get_positions()[0][data.subsets[0].to_mask()], x)
+    assert convert.call_count == 0
+
+def test_rows_of_large_tables_are_converted(mocker):
+    viewer, layer, data = make_icrs_viewer(100)
+    all_x = layer.convert_icrs_positions()[0]
+
+    # The whole table wouldn't fit in the cache
+    mocker.patch.object(layer_artist_module, 'get_position_cache', return_value=LRUCache(1000))
+    convert = mocker.spy(layer_artist_module, 'icrs_to_galactic_cartesian')
+    rows = np.array([5, 50, 7])
+    x, _, _ = layer.get_positions(rows)
+
+    assert np.array_equal(x, all_x[rows])
+    assert len(convert.call_args.args[0]) == len(rows)
@@ -0,0 +1,127 @@
+import numpy as np
+
+from ..benchmarks import add_benchmark_layer, make_benchmark_data, wait_for_upload, wait_until_quiet
+from ..capabilities import (CLIENT_CAPABILITIES, LEGACY_CAPABILITIES, Capabilities,
+                            encode_handshake, parse_handshake)
+from ..headless import HeadlessOpenSpaceViewer
+from ..mock_openspace import MockOpenSpace
+from ..simp import simp
+
+def test_handshake_subject():
+    subject = encode_handshake('Glue', CLIENT_CAPABILITIES)
+    assert subject.startswith(bytearray('Glue;max_message_size=', 'utf-8'))
+    assert parse_handshake(subject) == ('Glue', CLIENT_CAPABILITIES)
+
+    # Old builds only send their name
+    assert parse_handshake(bytearray('OpenSpace;', 'utf-8')) == ('OpenSpace', None)
+
+def test_agree():
+    peer = Capabilities({
+        'max_message_size': 1024,
+        'codecs': ('deltas', 'ranges', 'zstd'),
+        'layouts': 'columns',
+        'unknown': 1,
+    })
+    agreed = peer.agree(CLIENT_CAPABILITIES)
+
+    # The smaller limit, the common values in the order of the offer, no mismatched kinds
+    assert agreed == Capabilities({'max_message_size': 1024, 'codecs': ('ranges', 'deltas')})
+    assert agreed.supports('max_message_size')
+    assert agreed.supports('codecs', 'deltas')
+    assert not agreed.supports('codecs', 'bitset')
+    assert not agreed.supports('chunking')
+
+    # Declining every value of a list is still an answer
+    declined = Capabilities({'codecs': ('zstd',)}).agree(CLIENT_CAPABILITIES)
+    assert parse_handshake(encode_handshake('OpenSpace', declined))[1] == Capabilities({'codecs': ()})
+
+def connect_with(capabilities):
+    server = MockOpenSpace(capabilities=capabilities)
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+    layer = add_benchmark_layer(viewer, make_benchmark_data(1000))
+    viewer.state.point_order = 'Octree'
+    viewer.connect(*server.address)
+    return server, viewer, layer
+
+def test_negotiated_capabilities():
+    server, viewer, layer = connect_with(Capabilities({'max_message_size': 2**20, 'codecs': ('ranges',)}))
+
+    try:
+        messages = wait_for_upload(server, layer.get_identifier_str(), 1000, 0, 10)
+        assert server.offered_capabilities == CLIENT_CAPABILITIES
+        assert viewer.capabilities == Capabilities({'max_message_size': 2**20, 'codecs': ('ranges',)})
+
+        # Rows aren't sent in octree order to a peer that doesn't accept it
+        assert not layer.uses_spatial_order()
+        assert all(simp.DataKey.OctreeLevel not in message.values for message in messages)
+
+    finally:
+        viewer.disconnect()
+        server.close()
+
+def test_legacy_peer():
+    server, viewer, layer = connect_with(None)
+
+    try:
+        messages = wait_for_upload(server, layer.get_identifier_str(), 1000, 0, 10)
+        assert viewer.capabilities is LEGACY_CAPABILITIES
+
+        # Features of later builds are turned off
+        for name, value in [('chunking', None), ('codecs', 'ranges'), ('codecs', 'bitset'), ('codecs', 'deltas'),
+                            ('layouts', 'octree'), ('layouts', 'frames')]:
+            assert not viewer.capabilities.supports(name, value)
+        assert not layer.uses_spatial_order()
+        assert all(simp.DataKey.OctreeLevel not in message.values for message in messages)
+
+    finally:
+        viewer.disconnect()
+        server.close()
+
+def test_legacy_peer_gets_points_and_static_positions():
+    server = MockOpenSpace(capabilities=None)
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+
+    try:
+        data = make_benchmark_data(1000)
+        data.add_component(np.repeat(np.arange(10.0), 100), 'time')
+        layer = add_benchmark_layer(viewer, data)
+        viewer.state.velocity_mode = 'Frames'
+        viewer.state.time_att = data.id['time']
+        viewer.state.subset_mode = 'Mask'
+        subset = data.new_subset(data.id['x'] > 0, label='Subset 1')
+        subset_layer = viewer.add_data(subset)
+        viewer.connect(*server.address)
+
+        # The subset sends its own points, the layer all of its points once
+        wait_for_upload(server, layer.get_identifier_str(), 1000, 0, 10)
+        wait_for_upload(server, subset_layer.get_identifier_str(), int(subset.to_mask().sum()), 0, 10)
+        wait_until_quiet(viewer, server, 10)
+
+        assert not layer.uses_frames() and not subset_layer.is_subset_mask()
+        unknown_keys = {
+            simp.DataKey.SubsetParent, simp.DataKey.SubsetRanges, simp.DataKey.SubsetBitset,
+            simp.DataKey.FrameTotal, simp.DataKey.FrameIndex, simp.DataKey.FrameTime
+        }
+        assert all(unknown_keys.isdisjoint(message.values) for message in server.messages)
+        assert all(unknown_keys.isdisjoint(message) for message in viewer._outgoing_data_message.values())
+
+    finally:
+        viewer.disconnect()
+        server.close()
+
+def test_max_message_size():
+    server, viewer, layer = connect_with(Capabilities({'max_message_size': 6000}))
+
+    try:
+        messages = wait_for_upload(server, layer.get_identifier_str(), 1000, 0, 10)
+
+        # The 4000 bytes of each axis don't fit in one message together
+        assert all(message.n_bytes - 24 <= 6000 for message in messages)
+        for data_key in [simp.DataKey.X, simp.DataKey.Y, simp.DataKey.Z]:
+            assert any(len(message.values.get(data_key, [])) == 1000 for message in messages)
+
+    finally:
+        viewer.disconnect()
+        server.close()
@@ -0,0 +1,188 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+from matplotlib import colormaps
+
+from ..benchmarks import make_benchmark_data
+from ..coordinates import icrs_to_galactic_cartesian
+from ..column_source import iter_payload_chunks
+from ..headless import HeadlessOpenSpaceViewer
+from ..simp import simp
+from ..statistics import get_statistics_service
+from ..utils import (bool_to_bytes, float32_array_to_bytes, float32_to_bytes, int32_array_to_bytes,
+                     int32_to_bytes, mask_to_bitset, mask_to_ranges, string_to_bytes)
+from .test_simp import MockViewer
+
+SIZES = (1000, 100000, 1000000)
+MEMORY_SIZE = 1000000 # Amount of values the peak memory is measured with
+MEMORY_TOLERANCE = 1.25 # Allowed growth of the peak memory over the baselines
+
+# Peak memory traced while encoding, in bytes per value. An encoder that
+# goes through Python objects (e.g. `tolist()`) needs tens of bytes per value.
+PEAK_BYTES_PER_VALUE = {
+    'float32_array_to_bytes': 8.0, # The big-endian copy and the bytes
+    'int32_array_to_bytes': 8.0,
+    'mask_to_bitset': 0.25,
+    'mask_to_ranges': 2.0, # The padded mask and the edges, with runs of 100 values
+    'get_float_attribute': 8.0,
+    'get_attrib_data_streamed': 0.19, # One 64th of the column at a time
+    'icrs_to_galactic_cartesian': 2.6, # Float64 temporaries of a block, the result is preallocated
+}
+
+def measure_peak(function, *args) -> "int":
+    '''
+        Returns the peak of the memory traced while calling the function.
+    '''
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+def assert_peak_within_baseline(name: "str", function, *args, n_values: "int" = MEMORY_SIZE):
+    peak_per_value = measure_peak(function, *args) / n_values
+    baseline = PEAK_BYTES_PER_VALUE[name]
+    assert peak_per_value <= baseline * MEMORY_TOLERANCE, \
+        f'{name} peaked at {peak_per_value:.2f} bytes per value, the baseline is {baseline}'
+
+def _layer_artist(n_points):
+    viewer = HeadlessOpenSpaceViewer()
+    data = make_benchmark_data(n_points)
+    layer_artist = viewer.add_data(data)
+    # The statistics of the attribute limits are computed in the background,
+    # and mustn't allocate while the memory is measured
+    get_statistics_service()._executor.submit(lambda: None).result()
+    return layer_artist, data
+
+def _encoded_message(n_values):
+    subject = bytearray(b'id;gui;pos.x;') + int32_to_bytes(n_values) \
+        + float32_array_to_bytes(np.arange(n_values))
+    header = bytes(str(simp.protocol_version) + simp.MessageType.Data + format(len(subject), '015d'), 'utf-8')
+    return bytearray(header) + subject
+
+def _consume_payload(payload):
+    return sum(len(chunk) for chunk in iter_payload_chunks(payload))
+
+# Peak memory
+
+def test_array_encoding_memory():
+    values = np.random.default_rng(0).normal(size=MEMORY_SIZE)
+    assert_peak_within_baseline('float32_array_to_bytes', float32_array_to_bytes, values)
+    assert_peak_within_baseline('int32_array_to_bytes', int32_array_to_bytes, values.astype(np.int64))
+
+def test_mask_encoding_memory():
+    mask = (np.arange(MEMORY_SIZE) // 100) % 2 == 0
+    assert_peak_within_baseline('mask_to_bitset', mask_to_bitset, mask)
+    assert_peak_within_baseline('mask_to_ranges', mask_to_ranges, mask)
+
+def test_get_float_attribute_memory():
+    layer_artist, data = _layer_artist(MEMORY_SIZE)
+    values = data['x']
+    assert_peak_within_baseline('get_float_attribute', layer_artist.get_float_attribute, values)
+
+def test_get_attrib_data_streamed_memory(mocker):
+    mocker.patch('glue_openspace_thesis.layer_artist.STREAM_MIN_POINTS', 1)
+    layer_artist, data = _layer_artist(MEMORY_SIZE)
+
+    def encode():
+        payload, n_values = layer_artist.get_attrib_data(data.id['x'])
+        # Smaller blocks than the default, to stream this column in several blocks
+        payload._block_size = MEMORY_SIZE // 64
+        assert _consume_payload(payload) == 4 * n_values
+
+    assert_peak_within_baseline('get_attrib_data_streamed', encode)
+
+def test_icrs_conversion_memory():
+    rng = np.random.default_rng(0)
+    ra, dec = rng.uniform(0, 360, MEMORY_SIZE), rng.uniform(-90, 90, MEMORY_SIZE)
+    distance = rng.uniform(1, 100, MEMORY_SIZE)
+    out = np.empty((3, MEMORY_SIZE), dtype='>f4')
+    # The rotation matrix is computed by astropy once, which isn't measured
+    icrs_to_galactic_cartesian(ra[:1], dec[:1], distance[:1])
+
+    assert_peak_within_baseline(
+        'icrs_to_galactic_cartesian', icrs_to_galactic_cartesian,
+        ra, dec, distance, np.float32, out, 1 << 16
+    )
+
+# Speed, only with pytest-benchmark installed
+
+def _benchmark(request):
+    pytest.importorskip('pytest_benchmark')
+    return request.getfixturevalue('benchmark')
+
+@pytest.mark.parametrize('n_values', SIZES)
+def test_benchmark_float32_array_to_bytes(request, n_values):
+    benchmark = _benchmark(request)
+    values = np.random.default_rng(0).normal(size=n_values)
+    assert len(benchmark(float32_array_to_bytes, values)) == 4 * n_values
+
+@pytest.mark.parametrize('n_values', SIZES)
+def test_benchmark_mask_encoding(request, n_values):
+    benchmark = _benchmark(request)
+    mask = (np.arange(n_values) // 100) % 2 == 0
+    benchmark(lambda: (mask_to_bitset(mask), mask_to_ranges(mask)))
+
+def test_benchmark_scalar_encoding(request):
+    benchmark = _benchmark(request)
+    benchmark(lambda: (int32_to_bytes(3), float32_to_bytes(0.5), bool_to_bytes(True), string_to_bytes('pc')))
+
+def test_benchmark_read_values(request):
+    benchmark = _benchmark(request)
+    message = float32_to_bytes(0.5) + int32_to_bytes(3) + bool_to_bytes(True) + string_to_bytes('pc;')
+
+    def read():
+        value, offset = simp.read_float32(message, 0)
+        value, offset = simp.read_int32(message, offset)
+        value, offset = simp.read_bool(message, offset)
+        return simp.read_string(message, offset)
+
+    assert benchmark(read) == ('pc', len(message))
+
+@pytest.mark.parametrize('n_values', SIZES)
+def test_benchmark_parse_message(request, n_values):
+    benchmark = _benchmark(request)
+    viewer = MockViewer()
+    message = _encoded_message(n_values)
+    message_type, subject = benchmark(simp.parse_message, viewer, message)
+    assert message_type == simp.MessageType.Data
+
+@pytest.mark.parametrize('n_values', SIZES)
+def test_benchmark_get_float_attribute(request, n_values):
+    benchmark = _benchmark(request)
+    layer_artist, data = _layer_artist(n_values)
+    _, n_encoded = benchmark(layer_artist.get_float_attribute, data['x'])
+    assert n_encoded == n_values
+
+@pytest.mark.parametrize('n_values', SIZES)
+def test_benchmark_get_attrib_data(request, n_values):
+    benchmark = _benchmark(request)
+    layer_artist, data = _layer_artist(n_values)
+
+    def encode():
+        payload, _ = layer_artist.get_attrib_data(data.id['x'])
+        return _consume_payload(payload)
+
+    assert benchmark(encode) == 4 * n_values
+
+@pytest.mark.parametrize('cmap', ['gray', 'viridis'])
+def test_benchmark_get_colormap(request, cmap):
+    benchmark = _benchmark(request)
+    layer_artist, _ = _layer_artist(10)
+    layer_artist.state.cmap = colormaps[cmap]
+    *_, n_colors = benchmark(layer_artist.get_colormap)
+    assert n_colors == 256
+
+@pytest.mark.parametrize('n_values', SIZES)
+def test_benchmark_icrs_conversion(request, n_values):
+    benchmark = _benchmark(request)
+    rng = np.random.default_rng(0)
+    ra, dec = rng.uniform(0, 360, n_values), rng.uniform(-90, 90, n_values)
+    distance = rng.uniform(1, 100, n_values)
+    out = np.empty((3, n_values), dtype='>f4')
+    benchmark(icrs_to_galactic_cartesian, ra, dec, distance, np.float32, out)
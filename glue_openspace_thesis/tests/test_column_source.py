@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from glue.core import Data
+
+from ..column_source import ColumnSource, Float32ColumnPayload, iter_payload_chunks, payload_nbytes
+from ..utils import float32_array_to_bytes
+
+def test_column_source_blocks(tmpdir):
+    filename = str(tmpdir.join('column.dat'))
+    values = np.memmap(filename, dtype=np.float64, mode='w+', shape=(1000,))
+    values[:] = np.arange(1000)
+    data = Data(x=values, label='memmap')
+
+    source = ColumnSource(data, data.id['x'])
+    assert len(source) == 1000
+
+    blocks = list(source.iter_blocks(block_size=300))
+    assert [len(block) for block in blocks] == [300, 300, 300, 100]
+    assert np.array_equal(np.concatenate(blocks), values)
+
+def test_column_source_rows():
+    data = Data(x=np.arange(10.0), label='data')
+    rows = np.array([9, 0, 4, 4])
+    source = ColumnSource(data, data.id['x'], rows)
+
+    assert len(source) == 4
+    assert np.array_equal(source.read(1, 3), [0.0, 4.0])
+
+def test_float32_column_payload():
+    data = Data(x=np.linspace(0, 1, 1001), label='data')
+    source = ColumnSource(data, data.id['x'])
+    payload = Float32ColumnPayload.from_source(source, block_size=100)
+
+    chunks = list(payload.iter_chunks())
+    assert len(chunks) == 11
+    assert payload.nbytes == 4 * 1001
+    assert payload_nbytes(payload) == payload.nbytes
+    assert b''.join(chunks) == float32_array_to_bytes(data['x'])
+
+    assert list(iter_payload_chunks(b'abc')) == [b'abc']
+    assert payload_nbytes(bytearray(b'abc')) == 3
+
+def test_float32_column_payload_checks_blocks():
+    payload = Float32ColumnPayload(lambda start, stop: np.zeros(stop - start - 1), 10, block_size=4)
+    with pytest.raises(ValueError):
+        list(payload.iter_chunks())
@@ -0,0 +1,57 @@
+from glue.core import ComponentID, Data, DataCollection
+from glue.core.data_combo_helper import ComponentIDComboHelper
+import numpy as np
+
+from ..components import ComponentCatalog, get_component_catalog
+from ..headless import HeadlessOpenSpaceViewer
+from ..viewer_state import OpenSpaceViewerState
+
+def make_data(label, n_columns):
+    return Data(label=label, **{f'c{i}': np.arange(3.0) for i in range(n_columns)})
+
+def describe(choices):
+    return [choice.label if isinstance(choice, ComponentID) else repr(choice) for choice in choices]
+
+def test_same_choices_as_glue():
+    first = make_data('first', 3)
+    first.add_component(np.array(['a', 'b', 'c']), 'name')
+    second = make_data('', 2)
+    datasets = [first, second]
+
+    state = OpenSpaceViewerState()
+    glue_helper = ComponentIDComboHelper(state, 'x_att', numeric=True, categorical=False,
+                                         world_coord=True, pixel_coord=False)
+    glue_helper.set_multiple_data(datasets)
+    expected = describe(OpenSpaceViewerState.x_att.get_choices(state))
+    assert 'name' not in expected and "ChoiceSeparator('Untitled Data')" in expected
+
+    state.x_att_helper.set_multiple_data(datasets)
+    assert describe(OpenSpaceViewerState.x_att.get_choices(state)) == expected
+
+def test_components_are_scanned_once(mocker):
+    scan = mocker.spy(ComponentCatalog, '_scan')
+    data = make_data('wide', 200)
+    collection = DataCollection([data])
+
+    viewer = HeadlessOpenSpaceViewer()
+    viewer.add_data(data)
+    # Eleven combos of the viewer and the layer share one scan
+    assert scan.call_count == 1
+    assert viewer.state.ra_att_helper.choices[0] is viewer.layers[0].state.cmap_att_helper.choices[0]
+
+    new = data.add_component(np.arange(3.0), 'new')
+    assert new in viewer.state.x_att_helper.choices
+    assert new in viewer.layers[0].state.size_att_helper.choices
+    assert scan.call_count == 2
+
+    collection.remove(data)
+
+def test_invalidate():
+    catalog = get_component_catalog()
+    data = make_data('data', 1)
+    filters = (True, True, True, False, True, True)
+
+    choices = catalog.get_choices(data, filters)
+    assert catalog.get_choices(data, filters) is choices
+    catalog.invalidate(data)
+    assert catalog.get_choices(data, filters) is not choices
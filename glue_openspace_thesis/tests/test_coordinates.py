@@ -0,0 +1,60 @@
+import numpy as np
+from astropy.coordinates import SkyCoord
+from astropy import units as ap_u
+
+from ..coordinates import icrs_to_galactic_cartesian, icrs_to_galactic_cartesian_processes
+from ..workers import SharedArray
+
+def _random_icrs(n_points):
+    rng = np.random.default_rng(4)
+    ra = rng.uniform(0.0, 360.0, n_points)
+    dec = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, n_points)))
+    distance = rng.uniform(1.0, 1000.0, n_points)
+    return ra, dec, distance
+
+def _astropy_xyz(ra, dec, distance):
+    coordinates = SkyCoord(ra * ap_u.deg, dec * ap_u.deg, distance=distance * ap_u.pc, frame='icrs')
+    return coordinates.galactic.cartesian.xyz.value
+
+def test_icrs_to_galactic_cartesian_matches_astropy():
+    ra, dec, distance = _random_icrs(10000)
+    expected = _astropy_xyz(ra, dec, distance)
+
+    # Blocks smaller than the input, to cover the last partial block
+    xyz = icrs_to_galactic_cartesian(ra, dec, distance, block_size=3000)
+    assert np.all(np.abs(xyz - expected) <= 1e-12 * distance)
+
+    xyz = icrs_to_galactic_cartesian(ra, dec, distance, dtype=np.float32, block_size=3000)
+    assert xyz.dtype == np.float32
+    assert np.all(np.abs(xyz - expected) <= 1e-6 * distance)
+
+def test_icrs_to_galactic_cartesian_into_buffer():
+    ra, dec, distance = _random_icrs(100)
+    out = np.empty((3, 100), dtype='>f4')
+
+    xyz = icrs_to_galactic_cartesian(ra, dec, distance, out=out)
+    assert xyz is out
+    # Each axis is contiguous, so it can be sent as is
+    assert out[0].flags['C_CONTIGUOUS']
+    assert np.allclose(out, _astropy_xyz(ra, dec, distance), rtol=1e-6, atol=1e-6)
+
+def test_icrs_to_galactic_cartesian_nan():
+    xyz = icrs_to_galactic_cartesian(np.array([np.nan, 10.0]), np.array([0.0, 20.0]), np.array([1.0, 1.0]))
+    assert np.all(np.isnan(xyz[:, 0]))
+    assert np.all(np.isfinite(xyz[:, 1]))
+
+def test_icrs_to_galactic_cartesian_processes(mocker):
+    ra, dec, distance = _random_icrs(5000)
+    expected = icrs_to_galactic_cartesian(ra, dec, distance)
+
+    # Small tables are converted in this process
+    xyz = icrs_to_galactic_cartesian_processes(ra, dec, distance, block_size=2000)
+    assert not isinstance(xyz, SharedArray)
+    assert np.allclose(xyz, expected, rtol=1e-6, atol=1e-6)
+
+    mocker.patch('glue_openspace_thesis.coordinates.PROCESS_MIN_POINTS', 1000)
+    mocker.patch('glue_openspace_thesis.coordinates.COLUMN_WORKERS', 2)
+    xyz = icrs_to_galactic_cartesian_processes(ra, dec, distance, block_size=2000)
+    assert isinstance(xyz, SharedArray)
+    assert xyz.dtype == np.dtype('>f4')
+    assert np.allclose(xyz, expected, rtol=1e-6, atol=1e-6)
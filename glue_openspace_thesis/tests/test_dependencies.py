@@ -0,0 +1,85 @@
+from echo import CallbackProperty
+import pytest
+
+from ..benchmarks import add_benchmark_layer, make_benchmark_data, wait_for_upload, wait_until_quiet
+from ..dependencies import (COLOR_KEYS, LAYER_PROPERTIES, POSITION_KEYS, PROPERTY_DATA_KEYS, SIZE_KEYS,
+                            SUBSET_KEYS, VELOCITY_KEYS, get_changed_data_keys)
+from ..headless import HeadlessOpenSpaceViewer
+from ..layer_state import OpenSpaceLayerState
+from ..mock_openspace import MockOpenSpace
+from ..simp import simp
+from ..viewer_state import OpenSpaceViewerState
+
+ENCODERS = [
+    'add_color_to_outgoing_data_message', 'add_size_to_outgoing_data_message',
+    'add_points_to_outgoing_data_message', 'add_subset_to_outgoing_data_message',
+    'add_velocity_to_outgoing_data_message',
+]
+
+def test_graph_matches_states():
+    properties = {
+        name for state_cls in (OpenSpaceViewerState, OpenSpaceLayerState)
+        for name in dir(state_cls) if isinstance(getattr(state_cls, name), CallbackProperty)
+    }
+    # The viewer reports changes of the subset selection itself
+    assert LAYER_PROPERTIES - properties == {'subset_state'}
+
+    grouped = COLOR_KEYS | SIZE_KEYS | POSITION_KEYS | SUBSET_KEYS | VELOCITY_KEYS
+    for keys in PROPERTY_DATA_KEYS.values():
+        assert keys <= grouped | {simp.DataKey.Alpha, simp.DataKey.Visibility}
+
+    assert get_changed_data_keys({'x_att', 'show_stats'}) == {simp.DataKey.X}
+
+@pytest.fixture
+def uploaded():
+    server = MockOpenSpace(echo=True)
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+    layer = add_benchmark_layer(viewer, make_benchmark_data(100))
+    viewer.connect(*server.address)
+    wait_for_upload(server, layer.get_identifier_str(), 100, 0, 10)
+    wait_until_quiet(viewer, server, 10)
+
+    yield viewer, server, layer
+
+    viewer.disconnect()
+    server.close()
+
+def test_changes_run_only_their_encoders(mocker, uploaded):
+    viewer, server, layer = uploaded
+    update = mocker.spy(layer, 'update')
+    encoders = {name: mocker.spy(layer, name) for name in ENCODERS}
+
+    # Properties without dependent keys don't touch the layer
+    viewer.state.show_stats = True
+    assert update.call_count == 0
+
+    viewer.state.vel_day_rec = 3
+    assert update.call_count == 1
+    assert [name for name, encoder in encoders.items() if encoder.call_count > 0] == ['add_velocity_to_outgoing_data_message']
+
+    layer.state.size = 5.0
+    assert encoders['add_size_to_outgoing_data_message'].call_count == 1
+    assert encoders['add_color_to_outgoing_data_message'].call_count == 0
+    assert encoders['add_points_to_outgoing_data_message'].call_count == 0
+
+    n_messages = len(server.messages)
+    viewer.state.x_att = viewer.state.y_att
+    assert encoders['add_points_to_outgoing_data_message'].call_count == 1
+    wait_until_quiet(viewer, server, 10)
+    assert len(server.messages) > n_messages
+
+def test_icrs_precision_resends_positions(uploaded):
+    viewer, server, layer = uploaded
+    data = layer.state.layer
+    viewer.state.coordinate_system = 'ICRS'
+    viewer.state.ra_att = data.id['x']
+    viewer.state.dec_att = data.id['y']
+    viewer.state.icrs_dist_att = data.id['value']
+    wait_until_quiet(viewer, server, 10)
+
+    n_messages = len(server.messages)
+    viewer.state.icrs_float32 = not viewer.state.icrs_float32
+    assert server.wait_for(
+        lambda: any(simp.DataKey.X in message.values for message in server.messages[n_messages:]), 10
+    )
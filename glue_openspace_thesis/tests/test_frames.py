@@ -0,0 +1,131 @@
+from threading import Condition, Lock
+import time
+
+import numpy as np
+
+from ..benchmarks import add_benchmark_layer, make_benchmark_data, wait_for_upload, wait_until_quiet
+from ..frames import FramePlayback, Frames, group_rows_by_step
+from ..headless import HeadlessOpenSpaceViewer
+from ..mock_openspace import MockOpenSpace
+from ..simp import simp
+
+class MockViewer:
+    def __init__(self):
+        self._outgoing_data_message = {}
+        self._outgoing_data_message_mutex = Lock()
+        self._outgoing_data_message_condition = Condition()
+
+    def log(self, msg):
+        pass
+
+    def debug(self, msg, log_level=1, *args):
+        pass
+
+class MockLayer:
+    """
+    A layer whose points move by one along x in every time step.
+    """
+    def __init__(self, steps):
+        self._viewer = MockViewer()
+        self._steps = np.asarray(steps, dtype=np.float64)
+
+    def get_identifier_str(self):
+        return 'layer'
+
+    def get_positions(self, rows):
+        x = self._steps[rows] + np.arange(len(rows))
+        return x, np.zeros(len(rows)), np.zeros(len(rows))
+
+    def add_to_outgoing_data_message(self, data_key, entry):
+        self._viewer._outgoing_data_message.setdefault('layer', {})[data_key] = entry
+
+    def remove_from_outgoing_data_message(self, data_key):
+        self._viewer._outgoing_data_message.get('layer', {}).pop(data_key, None)
+
+def test_group_rows_by_step():
+    times, rows, offsets = group_rows_by_step([2.0, 1.0, 2.0, np.nan, 1.0, 3.0])
+
+    assert np.array_equal(times, [1.0, 2.0, 3.0])
+    # Rows of a time step keep their table order, NaN steps are left out
+    assert np.array_equal(rows, [1, 4, 0, 2, 5])
+    assert np.array_equal(offsets, [0, 2, 4, 5])
+
+    frames = Frames([2.0, 1.0, 2.0, np.nan, 1.0, 3.0])
+    assert len(frames) == 3
+    assert np.array_equal(frames.rows(1), [0, 2])
+    assert not frames.has_equal_steps()
+    assert Frames([2.0, 1.0, 2.0, np.nan, 1.0]).has_equal_steps()
+
+def test_unequal_time_steps_are_sent_without_frames():
+    data = make_benchmark_data(10)
+    data.add_component(np.array([0.0] * 6 + [1.0] * 4), 'time')
+
+    server = MockOpenSpace()
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+
+    try:
+        layer = add_benchmark_layer(viewer, data)
+        viewer.state.velocity_mode = 'Frames'
+        viewer.state.time_att = data.id['time']
+        viewer.connect(*server.address)
+
+        # The colors and sizes of the first frame wouldn't fit the 4 points of the second
+        wait_for_upload(server, layer.get_identifier_str(), 10, 0, 10)
+        wait_until_quiet(viewer, server, 10)
+        assert all(simp.DataKey.FrameTotal not in message.values for message in server.messages)
+        assert any('different amounts of rows' in message for message in viewer.logs)
+
+    finally:
+        viewer.disconnect()
+        server.close()
+
+def test_encode_frame_deltas():
+    steps = np.repeat([0.0, 1.0, 2.0], 4)
+    layer = MockLayer(steps)
+    playback = FramePlayback(layer, Frames(steps), 10.0, use_deltas=True)
+
+    first, positions = playback.encode_frame(1, None)
+    assert first.deltas is None
+    assert np.array_equal(np.frombuffer(first.positions[simp.DataKey.X][0], dtype='>f4'), [1, 2, 3, 4])
+
+    second, _ = playback.encode_frame(2, (1, positions))
+    assert second.deltas is not None
+    assert np.array_equal(np.frombuffer(second.deltas[simp.DataKey.FrameDeltaX][0], dtype='>f4'), [1, 1, 1, 1])
+
+    # Deltas only refer to the frame right before, playback loops back to the first frame
+    skipped, _ = playback.encode_frame(3, (1, positions))
+    assert skipped.deltas is None
+    assert np.array_equal(np.frombuffer(skipped.positions[simp.DataKey.FrameIndex][0], dtype='>i4'), [0])
+
+def test_encode_keyframes():
+    steps = np.repeat(np.arange(10.0), 4)
+    layer = MockLayer(steps)
+    playback = FramePlayback(layer, Frames(steps), 10.0, use_deltas=True, keyframe_interval=4)
+
+    # Every 4th frame and the first frame of every loop are sent in full
+    previous = None
+    full_ticks = []
+    for tick in range(1, 25):
+        frame, positions = playback.encode_frame(tick, previous)
+        previous = (tick, positions)
+        if frame.deltas is None:
+            full_ticks.append(tick)
+
+    assert full_ticks == [1, 4, 8, 10, 12, 16, 20, 24]
+
+def test_playback_drops_frames_under_backpressure():
+    steps = np.repeat(np.arange(10.0), 100)
+    layer = MockLayer(steps)
+    playback = FramePlayback(layer, Frames(steps), 200.0, use_deltas=True)
+
+    # Nothing is ever sent, so every frame replaces the previous one
+    playback.start()
+    time.sleep(0.2)
+    playback.cancel()
+
+    assert playback.n_sent > 1
+    assert playback.n_dropped >= playback.n_sent - 1
+    message = layer._viewer._outgoing_data_message['layer']
+    assert simp.DataKey.X in message
+    assert simp.DataKey.FrameDeltaX not in message
@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+IMPORT_TIME_BUDGET = 0.025 # Seconds that registering the plugin may take, it took 0.075 with pkg_resources
+
+def run_python(code, **env):
+    '''
+        Runs `code` in a new interpreter, so the modules imported by
+        earlier tests don't hide what an import loads.
+    '''
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, check=True, env={**os.environ, **env}
+    )
+    return result.stdout, result.stderr
+
+def get_loaded(code):
+    stdout, _ = run_python(code + '; import json, sys; print(json.dumps(sorted(sys.modules)))')
+    return set(json.loads(stdout.splitlines()[-1]))
+
+def test_package_import_is_cheap():
+    loaded = get_loaded('import glue_openspace_thesis')
+    assert 'pkg_resources' not in loaded
+    assert not any(module.startswith('glue_openspace_thesis.') for module in loaded)
+
+    _, importtime = run_python('import glue_openspace_thesis')
+    # The last line is the package, "import time: self [us] | cumulative | name"
+    cumulative = int(importtime.strip().splitlines()[-1].split('|')[1])
+    assert cumulative / 1e6 < IMPORT_TIME_BUDGET
+
+def test_protocol_doesnt_import_astropy():
+    loaded = get_loaded('import glue_openspace_thesis.simp, glue_openspace_thesis.session')
+    assert not any(module.split('.')[0] in ('astropy', 'glue', 'matplotlib') for module in loaded)
+
+def test_viewer_import_has_no_side_effects(tmp_path):
+    pytest.importorskip('qtpy')
+    run_python('import glue_openspace_thesis.viewer', TMPDIR=str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
@@ -1,6 +1,127 @@
+from glue.core import Data
+from glue.core.exceptions import IncompatibleAttribute
+import numpy as np
 import pytest
 
+from ..benchmarks import add_benchmark_layer, make_benchmark_data, wait_for_upload, wait_until_quiet
+from ..headless import HeadlessOpenSpaceViewer
+from .. import layer_artist as layer_artist_module
 from ..layer_artist import OpenSpaceLayerArtist
+from ..mock_openspace import MockOpenSpace
+from ..simp import simp
 
 # def test_add_points_to_outgoing_data_message():
-#     OpenSpaceLayerArtist.add_points_to_outgoing_data_message()
\ No newline at end of file
+#     OpenSpaceLayerArtist.add_points_to_outgoing_data_message()
+
+def test_index_map():
+    # Every third row is NaN in every position and isn't sent
+    positions = np.where(np.arange(30) % 3 == 0, np.nan, np.arange(30.0))
+    data = Data(x=positions, y=positions, z=positions, label='nan')
+    valid_rows = np.flatnonzero(np.arange(30) % 3 != 0)
+
+    server = MockOpenSpace()
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+    viewer.state.compact_nan = True
+
+    try:
+        layer = add_benchmark_layer(viewer, data)
+        viewer.connect(*server.address)
+        wait_for_upload(server, layer.get_identifier_str(), len(valid_rows), 0, 10)
+        wait_until_quiet(viewer, server, 10)
+
+        assert np.array_equal(layer.get_sent_indices([0, 1, 2, 4]), [-1, 0, 1, 2])
+
+        # A selection of the sent points 1-3 and 6 in OpenSpace selects their rows
+        n_received = viewer.n_received
+        server.send_selection(layer.get_identifier_str(), [1, 3, 6, 1])
+        assert viewer.wait_for_received(n_received + 1, 10)
+        assert np.array_equal(viewer.selections[-1].to_mask(data), np.isin(np.arange(30), valid_rows[[1, 2, 3, 6]]))
+
+    finally:
+        viewer.disconnect()
+        server.close()
+
+@pytest.mark.parametrize('exception', [ValueError('bad column'), IncompatibleAttribute('x')])
+def test_failing_position_job_drops_message(mocker, exception):
+    viewer = HeadlessOpenSpaceViewer()
+    layer = add_benchmark_layer(viewer, make_benchmark_data(100))
+    mocker.patch.object(layer, 'get_float_attribute', side_effect=exception)
+
+    # Colors or sizes without their points aren't sent
+    layer.add_initial_data_to_message()
+    assert layer.get_identifier_str() not in viewer._outgoing_data_message
+    assert not viewer._outgoing_data_message_mutex.locked()
+
+    # Columns that no longer fit the layer disable it
+    assert layer.enabled == (not isinstance(exception, IncompatibleAttribute))
+
+def test_incompatible_layer_is_disabled():
+    server = MockOpenSpace()
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+
+    try:
+        layer_a = add_benchmark_layer(viewer, make_benchmark_data(100))
+        layer_b = viewer.add_data(Data(p=np.zeros(10), q=np.zeros(10), r=np.zeros(10), label='b'))
+        viewer.connect(*server.address)
+        wait_for_upload(server, layer_a.get_identifier_str(), 100, 0, 10)
+        wait_until_quiet(viewer, server, 10)
+
+        # The positions of the viewer are components of the other dataset
+        assert not layer_b.enabled
+        messages_b = server.get_layer_messages(layer_b.get_identifier_str())
+        assert all(message.message_type != simp.MessageType.Data for message in messages_b)
+
+        n_messages = len(server.messages)
+        layer_b.state.alpha = 0.3
+        layer_a.state.alpha = 0.3
+        # The other layers keep sending
+        assert not viewer._outgoing_data_message_mutex.locked()
+        assert server.wait_for(
+            lambda: any(message.identifier == layer_a.get_identifier_str() for message in server.messages[n_messages:]), 10
+        )
+
+    finally:
+        viewer.disconnect()
+        server.close()
+
+def test_points_subset_sends_new_members():
+    server = MockOpenSpace()
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+
+    try:
+        data = make_benchmark_data(100)
+        add_benchmark_layer(viewer, data)
+        viewer.state.subset_mode = 'Points'
+        subset = data.new_subset(data.id['x'] > 1, label='Subset 1')
+        layer = viewer.add_data(subset)
+        viewer.connect(*server.address)
+        wait_until_quiet(viewer, server, 10)
+
+        subset.subset_state = data.id['x'] > -1
+        layer.update(subset_changed=True)
+        n_members = int(subset.to_mask().sum())
+        wait_for_upload(server, layer.get_identifier_str(), n_members, 0, 10)
+
+    finally:
+        viewer.disconnect()
+        server.close()
+
+def test_nan_compaction_reads_statistics(mocker):
+    viewer = HeadlessOpenSpaceViewer()
+    viewer.state.compact_nan = True
+    layer = add_benchmark_layer(viewer, make_benchmark_data(100))
+    all_nan_mask = mocker.spy(layer_artist_module, 'all_nan_mask')
+
+    # The statistics count no NaN in the positions, so the columns aren't scanned
+    assert layer.get_valid_rows() is None
+    assert all_nan_mask.call_count == 0
+
+    # Rows that are NaN in every position are left out
+    positions = np.where(np.arange(100) % 10 == 0, np.nan, np.arange(100.0))
+    viewer = HeadlessOpenSpaceViewer()
+    viewer.state.compact_nan = True
+    layer = add_benchmark_layer(viewer, Data(x=positions, y=positions, z=positions, label='nan'))
+    assert np.array_equal(layer.get_valid_rows(), np.flatnonzero(np.arange(100) % 10 != 0))
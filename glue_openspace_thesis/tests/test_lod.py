@@ -0,0 +1,44 @@
+import numpy as np
+
+from ..lod import progressive_order
+
+def test_progressive_order_is_permutation():
+    order, n_sample = progressive_order(1003, 0.01)
+
+    assert len(order) == 1003
+    assert np.array_equal(np.sort(order), np.arange(1003))
+    # One row from every stratum of 100 rows, the last one is 3 rows long
+    assert n_sample == 11
+    assert np.array_equal(np.sort(order[:n_sample] // 100), np.arange(11))
+    assert order.dtype == np.int32
+
+def test_progressive_order_sample_is_stratified():
+    order, n_sample = progressive_order(10000, 0.01)
+    sample = order[:n_sample]
+
+    assert n_sample == 100
+    assert np.array_equal(np.sort(sample // 100), np.arange(100))
+
+    # Any longer prefix keeps visiting the strata evenly
+    prefix = order[:(3 * n_sample)]
+    assert np.all(np.bincount(prefix // 100, minlength=100) == 3)
+
+def test_progressive_order_in_blocks(mocker):
+    mocker.patch('glue_openspace_thesis.lod.PROGRESSIVE_ORDER_BLOCK', 250)
+    order, n_sample = progressive_order(10050, 0.01)
+
+    assert np.array_equal(np.sort(order), np.arange(10050))
+    assert n_sample == 101
+    for i in range(3):
+        visited = order[(i * n_sample):((i + 1) * n_sample)]
+        assert np.array_equal(np.sort(visited // 100), np.arange(101))
+
+def test_progressive_order_is_deterministic():
+    order_a, _ = progressive_order(5000, 0.05)
+    order_b, _ = progressive_order(5000, 0.05)
+    assert np.array_equal(order_a, order_b)
+
+def test_progressive_order_full_fraction():
+    order, n_sample = progressive_order(50, 1.0)
+    assert n_sample == 50
+    assert np.array_equal(np.sort(order), np.arange(50))
@@ -0,0 +1,83 @@
+import logging
+import time
+
+import pytest
+
+from ..benchmarks import add_benchmark_layer, make_benchmark_data, wait_until_quiet
+from ..headless import HeadlessOpenSpaceViewer
+from ..log import is_debug_enabled, logger, set_debug_verbosity
+from ..mock_openspace import MockOpenSpace
+from ..utils import int32_to_bytes
+
+class CountingArgument:
+    def __init__(self):
+        self.n_formatted = 0
+
+    def __str__(self):
+        self.n_formatted += 1
+        return 'argument'
+
+@pytest.fixture
+def viewer():
+    level = logger.level
+    yield HeadlessOpenSpaceViewer()
+    logger.setLevel(level)
+
+def test_debug_is_lazy(viewer, caplog, capsys):
+    argument = CountingArgument()
+
+    set_debug_verbosity(0)
+    viewer.debug('Disabled %s', 1, argument)
+    assert not is_debug_enabled(1)
+    assert argument.n_formatted == 0
+    assert caplog.records == []
+
+    set_debug_verbosity(2)
+    viewer.debug('Shown %s', 2, argument)
+    # Formatted by every handler that shows it
+    n_formatted = argument.n_formatted
+    viewer.debug('Hidden %s', 4, argument)
+    assert is_debug_enabled(2) and not is_debug_enabled(3)
+    assert argument.n_formatted == n_formatted
+    assert [record.getMessage() for record in caplog.records] == ['Shown argument']
+    assert caplog.records[0].levelno == logging.DEBUG - 1
+
+    set_debug_verbosity(4)
+    # Messages without arguments aren't formatted
+    viewer.debug('Every call, 100%', 4)
+    assert logger.isEnabledFor(logging.DEBUG)
+    assert caplog.records[-1].getMessage() == 'Every call, 100%'
+
+    # Debug messages go to the logger only
+    assert viewer.logs == []
+    assert capsys.readouterr().out == ''
+
+def test_encoding_doesnt_print(capsys):
+    int32_to_bytes(3)
+    assert capsys.readouterr().out == ''
+
+def test_log_levels(viewer, caplog, capsys):
+    viewer.log('Connected to OpenSpace')
+    viewer.log('Lost connection to OpenSpace', logging.WARNING)
+
+    assert [(record.levelno, record.getMessage()) for record in caplog.records] == [
+        (logging.INFO, 'OpenSpace Viewer: Connected to OpenSpace'),
+        (logging.WARNING, 'OpenSpace Viewer: Lost connection to OpenSpace'),
+    ]
+    assert capsys.readouterr().out == ''
+
+def test_disconnect_logs_no_socket_error(viewer, caplog, capsys):
+    server = MockOpenSpace()
+    server.start()
+
+    try:
+        add_benchmark_layer(viewer, make_benchmark_data(100))
+        viewer.connect(*server.address)
+        wait_until_quiet(viewer, server, 10)
+    finally:
+        viewer.disconnect()
+        server.close()
+
+    time.sleep(0.2)
+    assert [record.getMessage() for record in caplog.records if record.levelno >= logging.WARNING] == []
+    assert capsys.readouterr().out == ''
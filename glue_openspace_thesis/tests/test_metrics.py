@@ -0,0 +1,80 @@
+import time
+
+import numpy as np
+
+from ..benchmarks import add_benchmark_layer, make_benchmark_data, wait_for_upload
+from ..headless import HeadlessOpenSpaceViewer
+from ..metrics import LATENCY_BIN_EDGES, STAGES, PipelineMetrics, RollingHistogram
+from ..mock_openspace import MockOpenSpace
+from ..simp import simp
+
+def test_message_stages():
+    metrics = PipelineMetrics()
+
+    metrics.on_enqueued('a', encoded=False)
+    metrics.on_enqueued('a')
+    metrics.on_encoded('a')
+    assert metrics.queue_depth == 1
+
+    metrics.on_taken('a', {'pos.x': 10, 'col.a': 10}, 30)
+    assert metrics.queue_depth == 0
+    metrics.on_send_started('a')
+    metrics.on_send_completed('a')
+
+    [message] = metrics.messages
+    assert message.enqueued_at <= message.encoded_at <= message.send_started_at <= message.send_completed_at
+    assert message.total_seconds == message.encode_seconds + message.queue_seconds + message.send_seconds
+    assert metrics.last_latency == message.total_seconds
+    assert metrics.bytes_per_key == {'pos.x': 10, 'col.a': 10}
+    assert all(len(metrics.histogram(stage)) == 1 for stage in STAGES)
+
+    # Discarded messages aren't counted
+    metrics.on_enqueued('b')
+    metrics.on_taken('b', {'pos.x': 10}, 20)
+    metrics.discard('b')
+    metrics.on_send_started('b')
+    metrics.on_send_completed('b')
+    assert metrics.n_messages == 1
+    assert metrics.summary()['bytes_per_key']['pos.x'] == 10
+
+def test_rolling_histogram():
+    histogram = RollingHistogram(window=3)
+    assert histogram.percentile(50) is None
+
+    for value in [1e-6, 1e-3, 1e-2, 1e3]:
+        histogram.add(value)
+
+    # The oldest value left the window, values outside the bins are in the last bin
+    assert len(histogram) == 3
+    counts = histogram.counts()
+    assert counts.sum() == 3
+    assert counts[-1] == 1
+    assert counts[np.searchsorted(LATENCY_BIN_EDGES, 1e-3, side='right') - 1] == 1
+    assert histogram.percentile(50) == 1e-2
+
+def test_headless_viewer_metrics():
+    server = MockOpenSpace()
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+
+    try:
+        data = make_benchmark_data(1000)
+        layer = add_benchmark_layer(viewer, data)
+        viewer.connect(*server.address)
+        identifier = layer.get_identifier_str()
+        messages = wait_for_upload(server, identifier, 1000, 0, 10)
+
+        # The server doesn't wake up when the viewer records a sent message, so it's polled
+        deadline = time.monotonic() + 10
+        while viewer.metrics.n_messages < len(messages) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert viewer.metrics.n_messages >= len(messages)
+        # The key, the amount and the float32 values of every position
+        assert viewer.metrics.bytes_per_key[simp.DataKey.X] == len(simp.DataKey.X) + 1 + 4 + 4 * 1000
+        sent = sum(message.n_bytes for message in viewer.metrics.messages)
+        assert sent == sum(message.n_bytes - 24 for message in messages)
+        assert viewer.metrics.throughput() > 0
+
+    finally:
+        viewer.disconnect()
+        server.close()
@@ -0,0 +1,63 @@
+import numpy as np
+
+from ..benchmarks import add_benchmark_layer, make_benchmark_data, run_throughput_benchmark, wait_for_upload, wait_until_quiet
+from ..headless import HeadlessOpenSpaceViewer
+from ..mock_openspace import MockOpenSpace, parse_data_subject
+from ..simp import simp
+from ..utils import bool_to_bytes, float32_array_to_bytes, float32_to_bytes, int32_to_bytes
+
+def test_parse_data_subject():
+    subject = bytearray(b'id;name\\;with delimiter;')
+    subject += b'pos.x;' + int32_to_bytes(3) + float32_array_to_bytes([1.0, 2.0, 3.0])
+    subject += b'pos.unit;pc;'
+    subject += b'col.a;' + float32_to_bytes(0.5)
+    subject += b'vis.val;' + bool_to_bytes(True)
+
+    identifier, gui_name, values = parse_data_subject(subject)
+
+    assert identifier == 'id'
+    assert gui_name == 'name\\;with delimiter'
+    assert np.array_equal(values[simp.DataKey.X], [1.0, 2.0, 3.0])
+    assert values[simp.DataKey.PointUnit] == 'pc'
+    assert values[simp.DataKey.Alpha][0] == 0.5
+    assert values[simp.DataKey.Visibility][0]
+
+def test_headless_viewer_end_to_end():
+    server = MockOpenSpace(echo=True)
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+
+    try:
+        data = make_benchmark_data(1000)
+        layer = add_benchmark_layer(viewer, data)
+        viewer.connect(*server.address)
+        identifier = layer.get_identifier_str()
+
+        wait_for_upload(server, identifier, 1000, 0, 10)
+        values = server.layers[identifier]
+        assert np.allclose(values[simp.DataKey.Y], data['y'])
+        assert np.allclose(values[simp.DataKey.X], data['x'])
+        assert np.allclose(values[simp.DataKey.Z], data['z'])
+
+        # The echo of the property change doesn't undo it
+        wait_until_quiet(viewer, server, 10)
+        layer.state.alpha = 0.25
+        assert server.wait_for(lambda: server.layers[identifier].get(simp.DataKey.Alpha, [0])[0] == 0.25, 10)
+        wait_until_quiet(viewer, server, 10)
+        assert layer.state.alpha == 0.25
+
+        viewer.remove_data(data)
+        assert server.wait_for(lambda: identifier not in server.layers, 10)
+
+    finally:
+        viewer.disconnect()
+        server.close()
+
+def test_throughput_benchmark():
+    result = run_throughput_benchmark(1000, round_trips=2, timeout=30)
+
+    assert result.n_points == 1000
+    # At least the three position columns were sent
+    assert result.bytes_on_wire > 3 * 4 * 1000
+    assert result.points_per_second > 0
+    assert result.round_trip_seconds > 0
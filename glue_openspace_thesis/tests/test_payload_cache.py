@@ -0,0 +1,112 @@
+import json
+
+from glue.core import Data
+import numpy as np
+
+from .. import layer_artist as layer_artist_module
+from ..cache import LRUCache, get_position_cache
+from ..benchmarks import wait_for_upload, wait_until_quiet
+from ..headless import HeadlessOpenSpaceViewer
+from ..mock_openspace import MockOpenSpace
+from ..payload_cache import PAYLOAD_CACHE_INDEX, PayloadCache, hash_columns
+
+def test_write_and_find(tmp_path, mocker):
+    path = str(tmp_path / 'sidecar')
+    array = np.arange(6, dtype='>f4').reshape(2, 3)
+    columns_hash = hash_columns(np.arange(3.0))
+    params = {'key': 'test', 'unit': 'pc'}
+
+    cache = PayloadCache(path)
+    cache.write([(params, columns_hash, array), (params, columns_hash, array)])
+    assert len(cache) == 1
+
+    loaded = PayloadCache.load(path)
+    found = loaded.find(params, lambda: columns_hash)
+    assert isinstance(found, np.memmap) and found.dtype == np.dtype('>f4')
+    assert np.array_equal(found, array)
+
+    get_hash = mocker.Mock(return_value=columns_hash)
+    assert loaded.find({'key': 'test', 'unit': 'kpc'}, get_hash) is None
+    # Columns are only hashed for buffers with the same parameters
+    assert get_hash.call_count == 0
+    assert loaded.find(params, lambda: hash_columns(np.arange(3.0) + 1)) is None
+
+    # Buffers that didn't change aren't written again, others are removed
+    files = {path.name for path in (tmp_path / 'sidecar').glob('*.npy')}
+    loaded.write([(params, columns_hash, array), ({'key': 'other'}, columns_hash, array)])
+    new_files = {path.name for path in (tmp_path / 'sidecar').glob('*.npy')}
+    assert files < new_files and len(new_files) == 2
+    loaded.write([({'key': 'other'}, columns_hash, array)])
+    assert len(list((tmp_path / 'sidecar').glob('*.npy'))) == 1
+
+def test_other_version_is_ignored(tmp_path):
+    with open(tmp_path / PAYLOAD_CACHE_INDEX, 'w') as file:
+        json.dump({'version': 0, 'entries': [{'params': {}, 'hash': '', 'file': 'a.npy'}]}, file)
+    assert len(PayloadCache.load(str(tmp_path))) == 0
+    assert len(PayloadCache.load(str(tmp_path / 'missing'))) == 0
+
+def make_icrs_data(n_points, dist_offset=0.0):
+    rng = np.random.default_rng(0)
+    return Data(
+        ra=rng.uniform(0, 360, n_points), dec=rng.uniform(-90, 90, n_points),
+        dist=rng.uniform(1, 10, n_points) + dist_offset, label='icrs'
+    )
+
+def upload_icrs(data, payload_cache=None):
+    server = MockOpenSpace(echo=True)
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+    if payload_cache is not None:
+        viewer.load_payload_cache(payload_cache)
+
+    layer = viewer.add_data(data)
+    viewer.state.coordinate_system = 'ICRS'
+    viewer.state.ra_att = data.id['ra']
+    viewer.state.dec_att = data.id['dec']
+    viewer.state.icrs_dist_att = data.id['dist']
+    try:
+        viewer.connect(*server.address)
+        messages = wait_for_upload(server, layer.get_identifier_str(), data.size, 0, 10)
+        wait_until_quiet(viewer, server, 10)
+    finally:
+        viewer.disconnect()
+        server.close()
+
+    return viewer, np.array(messages[-1].values['pos.x'])
+
+def test_restored_session_isnt_converted_again(tmp_path, mocker):
+    data = make_icrs_data(1000)
+    viewer, x = upload_icrs(data)
+    assert viewer.save_payload_cache(str(tmp_path)) == 1
+
+    # Like in a new process, which hasn't converted them yet
+    get_position_cache().clear()
+    convert = mocker.spy(layer_artist_module, 'icrs_to_galactic_cartesian')
+    _, restored_x = upload_icrs(data, str(tmp_path))
+    assert convert.call_count == 0
+    assert np.array_equal(restored_x, x)
+
+    # Buffers of other values are converted again
+    upload_icrs(make_icrs_data(1000, dist_offset=1.0), str(tmp_path))
+    assert convert.call_count == 1
+
+def test_positions_too_large_for_the_cache(tmp_path, mocker):
+    mocker.patch.object(layer_artist_module, 'get_position_cache', return_value=LRUCache(1000))
+    data = make_icrs_data(1000)
+    viewer, x = upload_icrs(data)
+    assert viewer.save_payload_cache(str(tmp_path)) == 1
+
+    # The validated buffer is remembered, so the columns are hashed once
+    convert = mocker.spy(layer_artist_module, 'icrs_to_galactic_cartesian')
+    hash_icrs = mocker.spy(layer_artist_module.OpenSpaceLayerArtist, '_hash_icrs_columns')
+    restored_viewer = HeadlessOpenSpaceViewer()
+    restored_viewer.load_payload_cache(str(tmp_path))
+    layer = restored_viewer.add_data(data)
+    restored_viewer.state.coordinate_system = 'ICRS'
+    restored_viewer.state.ra_att = data.id['ra']
+    restored_viewer.state.dec_att = data.id['dec']
+    restored_viewer.state.icrs_dist_att = data.id['dist']
+    for rows in [np.arange(10), np.arange(10, 20)]:
+        assert np.array_equal(layer.get_positions(rows)[0], x[rows])
+    assert convert.call_count == 0
+    assert hash_icrs.call_count == 1
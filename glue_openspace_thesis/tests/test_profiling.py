@@ -0,0 +1,62 @@
+import json
+import pstats
+import time
+
+from ..benchmarks import add_benchmark_layer, make_benchmark_data, wait_for_upload, wait_until_quiet
+from ..headless import HeadlessOpenSpaceViewer
+from ..mock_openspace import MockOpenSpace
+from ..profiling import PROFILE_INDEX, CycleProfiler
+
+def test_keeps_slowest(tmp_path):
+    profiler = CycleProfiler(str(tmp_path), n_slowest=2)
+    for i, seconds in enumerate([0.0, 0.03, 0.01, 0.02]):
+        with profiler.profile('test', cycle=i) as info:
+            time.sleep(seconds)
+            info['n_bytes'] = 10 * i
+
+    assert profiler.n_profiled == 4
+    assert [entry.info['cycle'] for entry in profiler.entries] == [1, 3]
+    assert sorted(path.name for path in tmp_path.glob('*.prof')) == sorted(
+        entry.path.split('/')[-1] for entry in profiler.entries
+    )
+
+    with open(tmp_path / PROFILE_INDEX) as file:
+        index = json.load(file)
+    assert [(entry['cycle'], entry['n_bytes']) for entry in index] == [(1, 10), (3, 30)]
+    stats = pstats.Stats(str(tmp_path / index[0]['file']))
+    assert any('sleep' in function[2] for function in stats.stats)
+
+def test_nested_cycles(tmp_path):
+    profiler = CycleProfiler(str(tmp_path))
+    with profiler.profile('outer'):
+        with profiler.profile('inner'):
+            pass
+
+    assert [entry.kind for entry in profiler.entries] == ['outer']
+
+def test_profile_upload(tmp_path):
+    server = MockOpenSpace(echo=True)
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+    viewer.start_profiling(str(tmp_path))
+
+    try:
+        data = make_benchmark_data(1000)
+        layer = add_benchmark_layer(viewer, data)
+        viewer.connect(*server.address)
+        wait_for_upload(server, layer.get_identifier_str(), 1000, 0, 10)
+        wait_until_quiet(viewer, server, 10)
+    finally:
+        viewer.disconnect()
+        server.close()
+
+    entries = viewer.profiler.entries
+    kinds = {entry.kind for entry in entries}
+    assert 'send' in kinds
+    largest = max(entries, key=lambda entry: entry.info.get('n_bytes', 0))
+    # Positions of 1000 points as float32
+    assert largest.info['n_bytes'] > 3 * 4 * 1000
+    assert largest.info['identifier'] == layer.get_identifier_str()
+
+    viewer.stop_profiling()
+    assert viewer.profiler is None
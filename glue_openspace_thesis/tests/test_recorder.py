@@ -0,0 +1,87 @@
+import socket
+from threading import Lock, Thread
+
+import numpy as np
+
+from ..column_source import Float32ColumnPayload
+from ..recorder import INCOMING, OUTGOING, SimpLogReader, SimpRecorder, replay
+from ..simp import simp
+
+class RecordingSession:
+    def __init__(self, recorder):
+        self._lost_connection = False
+        self._socket, self.peer = socket.socketpair()
+        self._send_lock = Lock()
+        self._recorder = recorder
+
+    def receive_all(self):
+        self._socket.close()
+        received = bytearray()
+        while True:
+            chunk = self.peer.recv(1 << 16)
+            if len(chunk) == 0:
+                break
+            received += chunk
+        self.peer.close()
+        return bytes(received)
+
+def _record(path):
+    recorder = SimpRecorder(str(path))
+    session = RecordingSession(recorder)
+
+    values = np.arange(10, dtype=np.float64)
+    payload = Float32ColumnPayload(lambda start, stop: values[start:stop], len(values), block_size=3)
+
+    simp.send_simp_message(session, simp.MessageType.Connection, bytearray(b'Glue;'))
+    recorder.record_incoming(b'1.9.1CONN000000000000005Glue;')
+    simp.send_simp_message_parts(session, simp.MessageType.Data, [bytearray(b'id;gui;pos.x;'), payload])
+
+    return recorder, session.receive_all()
+
+def test_recorded_messages_match_socket(tmp_path):
+    recorder, sent = _record(tmp_path / 'session.simplog')
+    recorder.close()
+
+    with SimpLogReader(recorder.path) as reader:
+        assert [record.direction for record in reader] == [OUTGOING, INCOMING, OUTGOING]
+        outgoing = [reader.read_message(record) for record in reader if record.direction == OUTGOING]
+        timestamps = [record.timestamp for record in reader]
+
+    assert b''.join(outgoing) == sent
+    assert timestamps == sorted(timestamps)
+
+def test_reader_without_index(tmp_path):
+    recorder, _ = _record(tmp_path / 'session.simplog')
+    # An unclosed recording has no index
+    recorder._file.flush()
+
+    with SimpLogReader(recorder.path) as reader:
+        assert len(reader) == 3
+        assert reader.read_message(reader.records[1]) == b'1.9.1CONN000000000000005Glue;'
+
+    recorder.close()
+
+def test_replay(tmp_path):
+    recorder, sent = _record(tmp_path / 'session.simplog')
+    recorder.close()
+
+    sender, receiver = socket.socketpair()
+    received = bytearray()
+
+    def receive():
+        while True:
+            chunk = receiver.recv(1 << 16)
+            if len(chunk) == 0:
+                break
+            received.extend(chunk)
+
+    thread = Thread(target=receive)
+    thread.start()
+    stats = replay(recorder.path, sender, realtime=True, speed=100.0)
+    sender.close()
+    thread.join(5)
+    receiver.close()
+
+    assert stats.n_messages == 2
+    assert stats.n_bytes == len(sent)
+    assert bytes(received) == sent
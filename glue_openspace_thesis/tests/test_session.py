@@ -0,0 +1,149 @@
+import socket
+from enum import Enum
+from threading import Event, Thread
+
+import numpy as np
+
+from .. import mock_openspace
+from ..benchmarks import add_benchmark_layer, make_benchmark_data, wait_for_upload, wait_until_quiet
+from ..column_source import Float32ColumnPayload
+from ..headless import HeadlessOpenSpaceViewer
+from ..session import SimpSessionManager
+from ..simp import simp
+
+def _read_exactly(connection, n_bytes):
+    buffer = bytearray()
+    while len(buffer) < n_bytes:
+        chunk = connection.recv(n_bytes - len(buffer))
+        if len(chunk) == 0:
+            raise EOFError
+        buffer += chunk
+    return bytes(buffer)
+
+class MockOpenSpace:
+    """
+    Accepts one connection, answers the handshake and records
+    the subjects of all "Data" messages it receives.
+    """
+    def __init__(self, n_data_messages):
+        self.server = socket.create_server(('127.0.0.1', 0))
+        self.port = self.server.getsockname()[1]
+        self.subjects = []
+        self.n_connections = 0
+        self.done = Event()
+        self._n_data_messages = n_data_messages
+        Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        connection, _ = self.server.accept()
+        self.n_connections += 1
+        with connection:
+            while len(self.subjects) < self._n_data_messages:
+                header = _read_exactly(connection, 24).decode('utf-8')
+                subject = _read_exactly(connection, int(header[9:]))
+                if header[5:9] == simp.MessageType.Connection:
+                    answer = b'Glue;'
+                    connection.sendall(bytes(f'{str(simp.protocol_version)}CONN{len(answer):015d}', 'utf-8') + answer)
+                else:
+                    self.subjects.append(subject)
+        self.done.set()
+
+class MockLayerState:
+    has_sent_initial_data = False
+
+class MockLayer:
+    def __init__(self):
+        self.state = MockLayerState()
+
+class MockViewer:
+    class ConnectionState(Enum):
+        SendingData = 3
+
+    def __init__(self, name, n_messages):
+        self.name = name
+        self.layer = MockLayer()
+        self.pending = [f'{name}{i};'.encode('utf-8') for i in range(n_messages)]
+        self.connected = Event()
+        self._socket = None
+
+    def log(self, msg):
+        pass
+
+    def debug(self, msg, log_level=1, *args):
+        pass
+
+    def set_connection_state(self, new_state):
+        return new_state
+
+    def on_session_connected(self):
+        self.connected.set()
+
+    def on_session_lost(self):
+        self.connected.clear()
+
+    def on_session_closed(self):
+        pass
+
+    def has_outgoing_data_message(self):
+        return len(self.pending) > 0
+
+    def pop_outgoing_layer_message(self):
+        return self.layer, [bytearray(self.pending.pop(0))], 1
+
+def test_session_shares_connection_round_robin():
+    openspace = MockOpenSpace(n_data_messages=4)
+    manager = SimpSessionManager()
+
+    first = MockViewer('a', 3)
+    second = MockViewer('b', 1)
+    # The messages are only sent once the second viewer is in the session too
+    first.pending, pending = [], first.pending
+
+    session = manager.attach(first, '127.0.0.1', openspace.port)
+    assert first.connected.wait(5)
+    assert manager.attach(second, '127.0.0.1', openspace.port) is session
+    assert second.connected.wait(5)
+
+    with session._condition:
+        first.pending = pending
+        session._condition.notify_all()
+
+    assert openspace.done.wait(5)
+    # Viewers take turns, one layer message at a time
+    assert openspace.subjects == [b'a0;', b'b0;', b'a1;', b'a2;']
+    assert openspace.n_connections == 1
+    assert first.layer.state.has_sent_initial_data
+
+    manager.detach(first, session)
+    assert manager.get_session('127.0.0.1', openspace.port) is session
+    manager.detach(second, session)
+    assert manager.get_session('127.0.0.1', openspace.port) is None
+    openspace.server.close()
+
+def test_column_read_error_reconnects():
+    server = mock_openspace.MockOpenSpace()
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+
+    try:
+        layer = add_benchmark_layer(viewer, make_benchmark_data(100))
+        viewer.connect(*server.address)
+        identifier = layer.get_identifier_str()
+        wait_for_upload(server, identifier, 100, 0, 10)
+        wait_until_quiet(viewer, server, 10)
+
+        # A column that lost rows after the length of the subject was sent
+        n_messages = len(server.messages)
+        payload = Float32ColumnPayload(lambda start, stop: np.zeros(1), 10)
+        with viewer._outgoing_data_message_condition:
+            viewer._outgoing_data_message[identifier] = {simp.DataKey.X: (payload, 10)}
+            viewer._outgoing_data_message_condition.notify_all()
+
+        # The sender survives, and everything is sent again over a new connection
+        wait_for_upload(server, identifier, 100, n_messages, 10)
+        connections = [message for message in server.messages if message.message_type == simp.MessageType.Connection]
+        assert len(connections) == 2
+
+    finally:
+        viewer.disconnect()
+        server.close()
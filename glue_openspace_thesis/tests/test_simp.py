@@ -1,9 +1,12 @@
 import pytest
 import struct
+from threading import Lock
 
+import numpy as np
 import astropy.units as units
 
-from glue_openspace_thesis.utils import bool_to_bytes, float32_to_bytes, int32_to_bytes
+from glue_openspace_thesis.utils import bool_to_bytes, float32_array_to_bytes, float32_to_bytes, int32_to_bytes
+from glue_openspace_thesis.column_source import Float32ColumnPayload
 
 from ..simp import simp
 
@@ -15,6 +18,7 @@ class MockViewer:
     def __init__(self):
         self._lost_connection = False
         self._socket = MockSocket()
+        self._send_lock = Lock()
     
     def log(self):
         pass
@@ -146,6 +150,9 @@ def test_time_unit_astropy_to_simp():
     assert simp.time_unit_astropy_to_simp(units.min.to_string()) == simp.TimeUnit.Minute
     assert simp.time_unit_astropy_to_simp(units.h.to_string()) == simp.TimeUnit.Hour
     assert simp.time_unit_astropy_to_simp(units.yr.to_string()) == simp.TimeUnit.Year
+    assert simp.time_unit_astropy_to_simp(str(units.day)) == simp.TimeUnit.Day
+    # Strings that are built at runtime aren't interned
+    assert simp.time_unit_astropy_to_simp(''.join(['mi', 'n'])) == simp.TimeUnit.Minute
     
     # Check if string
     with pytest.raises(simp.SimpError):
@@ -154,3 +161,19 @@ def test_time_unit_astropy_to_simp():
     # Check error
     with pytest.raises(simp.SimpError):
         simp.time_unit_astropy_to_simp(units.m.to_string())
+
+def test_send_simp_message_parts(mocker):
+    mock_sendall = mocker.patch.object(MockSocket, 'sendall')
+    viewer = MockViewer()
+
+    payload = Float32ColumnPayload(lambda start, stop: np.arange(start, stop), 10, block_size=4)
+    simp.send_simp_message_parts(viewer, simp.MessageType.Data, [bytearray(b'id;'), payload, bytearray(b';')])
+
+    sent = b''.join(bytes(call.args[0]) for call in mock_sendall.call_args_list)
+    subject = b'id;' + float32_array_to_bytes(np.arange(10)) + b';'
+    header = bytes(f'{str(simp.protocol_version)}DATA{len(subject):015d}', 'utf-8')
+
+    # Header, one part, three blocks of the payload and the last part
+    assert mock_sendall.call_count == 6
+    assert sent == header + subject
+    assert viewer._lost_connection == False
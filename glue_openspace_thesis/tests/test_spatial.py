@@ -0,0 +1,69 @@
+import numpy as np
+
+from ..spatial import NAN_CODE, SpatialIndex, morton_codes
+
+def test_morton_codes():
+    lower = np.zeros(3)
+    upper = np.ones(3)
+
+    # Corners of the unit cube
+    x = np.array([0.0, 1.0, 0.0, 0.0, 1.0])
+    y = np.array([0.0, 0.0, 1.0, 0.0, 1.0])
+    z = np.array([0.0, 0.0, 0.0, 1.0, 1.0])
+    codes = morton_codes(x, y, z, lower, upper)
+
+    assert codes[0] == 0
+    assert codes[1] == 0b100100100100100100100100100100
+    assert codes[2] == 0b010010010010010010010010010010
+    assert codes[3] == 0b001001001001001001001001001001
+    assert codes[4] == (1 << 30) - 1
+
+    codes = morton_codes(np.array([np.nan]), np.array([0.0]), np.array([0.0]), lower, upper)
+    assert codes[0] == NAN_CODE
+
+def test_spatial_index_order_and_nodes():
+    rng = np.random.default_rng(1)
+    x, y, z = rng.random((3, 5000))
+    x[:10] = np.nan
+
+    index = SpatialIndex(x, y, z, level=2)
+
+    assert np.array_equal(np.sort(index.order), np.arange(5000))
+    assert index.n_finite == 4990
+    # Points with a NaN coordinate are sent last
+    assert set(index.order[index.n_finite:]) == set(range(10))
+
+    # Nodes are in order and at most 8^level
+    assert index.node_offsets[0] == 0
+    assert np.all(np.diff(index.node_offsets) > 0)
+    assert np.all(np.diff(index.node_keys.astype(np.int64)) > 0)
+    assert len(index.node_keys) <= 64
+
+def test_spatial_index_nodes_contain_their_points():
+    rng = np.random.default_rng(2)
+    x, y, z = rng.random((3, 2000))
+    index = SpatialIndex(x, y, z, level=2)
+    node_lower, node_upper = index.node_bounds()
+
+    node_ends = np.append(index.node_offsets[1:], index.n_finite)
+    for node, (start, end) in enumerate(zip(index.node_offsets, node_ends)):
+        rows = index.order[start:end]
+        points = np.column_stack((x[rows], y[rows], z[rows]))
+        assert np.all(points >= node_lower[node] - 1e-9)
+        assert np.all(points <= node_upper[node] + 1e-9)
+
+def test_spatial_index_rows_in_box():
+    rng = np.random.default_rng(3)
+    x, y, z = rng.random((3, 5000))
+    index = SpatialIndex(x, y, z, level=3)
+
+    lower = np.array([0.2, 0.2, 0.2])
+    upper = np.array([0.4, 0.5, 0.6])
+    rows = index.rows_in_box(lower, upper)
+
+    inside = np.flatnonzero(
+        (x >= 0.2) & (x <= 0.4) & (y >= 0.2) & (y <= 0.5) & (z >= 0.2) & (z <= 0.6)
+    )
+    # Node precision: all points inside the box, and only points of overlapping nodes
+    assert set(inside) <= set(rows)
+    assert len(rows) < 5000
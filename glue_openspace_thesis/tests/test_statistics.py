@@ -0,0 +1,82 @@
+from queue import Queue
+from threading import Event
+
+import numpy as np
+from glue.core import Data
+
+from ..statistics import StatisticsService, compute_column_statistics
+from ..layer_state import OpenSpaceLayerState
+
+def test_compute_column_statistics():
+    values = np.append(np.arange(1001, dtype=float), [np.nan, np.inf])
+    statistics = compute_column_statistics(values)
+
+    assert statistics.limits() == (0.0, 1000.0)
+    assert statistics.limits(95) == (25.0, 975.0)
+    assert statistics.limits(42) is None
+    assert statistics.n_values == 1003
+    assert statistics.n_nan == 1
+
+    statistics = compute_column_statistics(np.array([np.nan, np.nan]))
+    assert np.isnan(statistics.minimum)
+    assert statistics.n_nan == 2
+
+def test_statistics_service_estimate_then_exact():
+    values = np.random.default_rng(5).normal(size=20000)
+    data = Data(x=values, label='data')
+    service = StatisticsService(sample_size=1000)
+
+    ready = Event()
+    results = []
+    def on_ready(data, component_id, statistics):
+        results.append(statistics)
+        ready.set()
+
+    estimate = service.get(data, data.id['x'], on_ready)
+    assert ready.wait(5)
+
+    exact = results[0]
+    assert exact.exact
+    assert exact.minimum == values.min()
+    assert exact.maximum == values.max()
+    if not estimate.exact:
+        assert values.min() <= estimate.minimum <= estimate.maximum <= values.max()
+
+    # Cached from now on
+    assert service.get(data, data.id['x']) is exact
+
+def test_layer_state_limits_from_statistics():
+    data = Data(x=np.arange(10.0), y=np.arange(10.0) * 2, label='data')
+    state = OpenSpaceLayerState(layer=data)
+
+    state.cmap_att = data.id['y']
+    assert (state.cmap_vmin, state.cmap_vmax) == (0.0, 18.0)
+
+def test_exact_limits_are_applied_on_the_main_thread(mocker):
+    rng = np.random.default_rng(6)
+    data = Data(x=rng.normal(size=20000), y=rng.normal(size=20000), z=rng.normal(size=20000), label='data')
+
+    callbacks = Queue()
+    mocker.patch('glue_openspace_thesis.statistics._main_thread_dispatcher', callbacks.put)
+
+    # Nothing is set on the statistics thread, the estimated
+    # limits of the size and the color are replaced later
+    state = OpenSpaceLayerState(layer=data)
+    assert state.cmap_vmin != data['x'].min()
+    for _ in range(2):
+        callbacks.get(timeout=5)()
+    assert (state.cmap_vmin, state.cmap_vmax) == (data['x'].min(), data['x'].max())
+    assert (state.size_vmin, state.size_vmax) == (data['x'].min(), data['x'].max())
+
+    # Unless they were changed meanwhile
+    state.cmap_att = data.id['y']
+    state.cmap_vmin = -10.0
+    callbacks.get(timeout=5)()
+    assert state.cmap_vmin == -10.0
+
+    # Or another component was chosen
+    state.cmap_att = data.id['z']
+    state.cmap_att = data.id['x']
+    callbacks.get(timeout=5)()
+    assert (state.cmap_vmin, state.cmap_vmax) == (data['x'].min(), data['x'].max())
+    assert callbacks.empty()
@@ -0,0 +1,80 @@
+import json
+from threading import Thread
+
+from ..benchmarks import add_benchmark_layer, make_benchmark_data, wait_for_upload, wait_until_quiet
+from ..headless import HeadlessOpenSpaceViewer
+from ..mock_openspace import MockOpenSpace
+from ..tracing import Tracer, is_tracing, span, start_tracing, stop_tracing, traced
+
+@traced(category='test')
+def add(a, b):
+    return a + b
+
+def test_spans_by_thread(tmp_path):
+    assert not is_tracing()
+    # Without tracing, nothing is recorded
+    with span('Ignored'):
+        assert add(1, 2) == 3
+
+    start_tracing()
+    try:
+        with span('Outer', 'test', n=1):
+            add(1, 2)
+
+        thread = Thread(target=add, args=(1, 2), name='worker')
+        thread.start()
+        thread.join()
+    finally:
+        tracer = stop_tracing(str(tmp_path / 'trace.json'))
+
+    assert len(tracer) == 3
+    with open(tmp_path / 'trace.json') as file:
+        trace = json.load(file)
+
+    spans = [event for event in trace['traceEvents'] if event['ph'] == 'X']
+    names = {event['args']['name'] for event in trace['traceEvents'] if event['ph'] == 'M'}
+    assert names == {'MainThread', 'worker'}
+
+    outer = next(event for event in spans if event['name'] == 'Outer')
+    inner, threaded = [event for event in spans if event['name'] == 'add']
+    assert outer['args'] == {'n': 1}
+    assert outer['ts'] <= inner['ts'] and inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur']
+    assert inner['tid'] == outer['tid'] != threaded['tid']
+
+def test_max_events():
+    tracer = Tracer(max_events=2)
+    for _ in range(3):
+        with tracer.span('span'):
+            pass
+
+    assert len(tracer) == 2
+    assert tracer.to_json()['otherData']['n_dropped'] == 1
+
+def test_trace_upload():
+    server = MockOpenSpace(echo=True)
+    server.start()
+    viewer = HeadlessOpenSpaceViewer()
+
+    start_tracing()
+    try:
+        data = make_benchmark_data(1000)
+        layer = add_benchmark_layer(viewer, data)
+        viewer.connect(*server.address)
+        wait_for_upload(server, layer.get_identifier_str(), 1000, 0, 10)
+        wait_until_quiet(viewer, server, 10)
+
+    finally:
+        tracer = stop_tracing()
+        viewer.disconnect()
+        server.close()
+
+    trace = tracer.to_json()
+    threads = {event['tid']: event['args']['name'] for event in trace['traceEvents'] if event['ph'] == 'M'}
+    spans_by_thread = {}
+    for event in trace['traceEvents']:
+        if event['ph'] == 'X':
+            spans_by_thread.setdefault(threads[event['tid']], set()).add(event['name'])
+
+    assert {'sendall', 'Send message', 'Wait for outgoing message'} <= spans_by_thread['openspace-sender']
+    assert 'Handle message' in spans_by_thread['openspace-listener']
+    assert 'OpenSpaceLayerArtist.add_initial_data_to_message' in spans_by_thread['openspace-listener']
@@ -0,0 +1,39 @@
+import numpy as np
+
+from ..utils import all_nan_mask, int32_array_to_bytes, mask_to_bitset, mask_to_ranges, ranges_to_indices
+
+def test_mask_to_ranges():
+    mask = np.array([True, True, False, False, True, False, True, True, True])
+    ranges = mask_to_ranges(mask)
+
+    assert ranges.dtype == np.int32
+    assert ranges.tolist() == [0, 2, 4, 1, 6, 3]
+
+    # Empty and full masks
+    assert len(mask_to_ranges(np.zeros(10, dtype=bool))) == 0
+    assert mask_to_ranges(np.ones(10, dtype=bool)).tolist() == [0, 10]
+
+def test_mask_to_bitset():
+    mask = np.zeros(10, dtype=bool)
+    mask[[0, 7, 9]] = True
+    bitset = mask_to_bitset(mask)
+
+    assert len(bitset) == 2
+    assert bitset == bytes([0b10000001, 0b01000000])
+
+def test_int32_array_to_bytes():
+    values = np.array([1, -2, 3])
+    assert int32_array_to_bytes(values) == b'\x00\x00\x00\x01\xff\xff\xff\xfe\x00\x00\x00\x03'
+
+def test_all_nan_mask():
+    x = np.array([np.nan, 1.0, np.nan, np.nan])
+    y = np.array([np.nan, np.nan, 2.0, np.nan])
+    z = np.array([np.nan, np.nan, np.nan, np.nan])
+    assert np.array_equal(all_nan_mask(x, y, z), [True, False, False, True])
+    # The columns aren't modified
+    assert np.isnan(x[0]) and x[1] == 1.0
+
+def test_ranges_to_indices():
+    mask = np.array([0, 1, 1, 0, 0, 1, 0, 1, 1, 1], dtype=bool)
+    assert np.array_equal(ranges_to_indices(mask_to_ranges(mask)), np.flatnonzero(mask))
+    assert len(ranges_to_indices(np.zeros(2, dtype=np.int32))) == 0
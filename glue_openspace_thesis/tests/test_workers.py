@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+
+from ..workers import call_with_shared_arrays, create_shared_array, get_column_executor, resolve_column_jobs
+
+def _slow_entry(value, delay):
+    time.sleep(delay)
+    return (value, 1)
+
+def _failing_entry():
+    raise ValueError('bad column')
+
+def test_resolve_column_jobs_keeps_key_order():
+    executor = get_column_executor()
+    assert get_column_executor() is executor
+
+    entries = {}
+    # The first job finishes last, but its key stays first
+    entries['x'] = executor.submit(_slow_entry, b'x', 0.05)
+    entries['unit'] = (b'pc;', 1)
+    entries['y'] = executor.submit(_slow_entry, b'y', 0.0)
+    entries['cmap'] = executor.submit(_failing_entry)
+
+    errors = []
+    resolve_column_jobs(entries, lambda key, exc: errors.append((key, str(exc))))
+
+    assert list(entries.keys()) == ['x', 'unit', 'y']
+    assert entries['x'] == (b'x', 1)
+    assert entries['y'] == (b'y', 1)
+    assert errors == [('cmap', 'bad column')]
+
+def _sum_into(values, out, scale):
+    out[0] = values.sum() * scale
+
+def test_shared_arrays():
+    values = create_shared_array((100,), np.float64)
+    values[:] = np.arange(100)
+    out = create_shared_array((1,), np.float64)
+
+    specs = [(array.shared_name, array.shape, array.dtype.str) for array in (values, out)]
+    call_with_shared_arrays(specs, _sum_into, 2.0)
+    assert out[0] == 2.0 * 4950
+
+    # Unlinked arrays stay usable in the process that created them
+    values.unlink()
+    out.unlink()
+    assert values[-1] == 99.0
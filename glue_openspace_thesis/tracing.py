@@ -0,0 +1,164 @@
+import atexit
+from contextlib import nullcontext
+import functools
+import json
+import os
+import threading
+import time
+from typing import Union
+
+__all__ = [
+    'TRACE_ENV_VARIABLE', 'TRACE_MAX_EVENTS', 'Tracer', 'start_tracing',
+    'stop_tracing', 'get_tracer', 'is_tracing', 'span', 'traced'
+]
+
+TRACE_ENV_VARIABLE = 'GLUE_OPENSPACE_TRACE' # Path of a trace that's recorded until Python exits
+TRACE_MAX_EVENTS = 1000000 # Later spans are dropped, a long trace would use too much memory
+
+class _Span:
+    __slots__ = ('_tracer', '_name', '_category', '_args', '_start')
+
+    def __init__(self, tracer: "Tracer", name: "str", category: "str", args: "dict"):
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._args = args
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._tracer.add_span(self._name, self._category, self._start, time.perf_counter(), self._args)
+        return False
+
+class Tracer:
+    """
+    Records spans of time on every thread, which are written as a trace
+    in the Chrome trace event format. Traces can be opened in Perfetto
+    (ui.perfetto.dev) or chrome://tracing, with a track per thread.
+    """
+    max_events: "int"
+    n_dropped: "int"
+
+    _events: "list[dict]"
+    _thread_names: "dict[int, str]"
+    _start: "float"
+    _pid: "int"
+
+    def __init__(self, max_events: "int" = TRACE_MAX_EVENTS):
+        self.max_events = max_events
+        self.n_dropped = 0
+        self._events = []
+        self._thread_names = {}
+        self._start = time.perf_counter()
+        self._pid = os.getpid()
+
+    def __len__(self) -> "int":
+        return len(self._events)
+
+    def span(self, name: "str", category: "str" = '', **args) -> "_Span":
+        return _Span(self, name, category, args)
+
+    def add_span(self, name: "str", category: "str", start: "float", stop: "float", args: "Union[dict, None]" = None):
+        '''
+            Adds a span on the current thread, `start` and `stop`
+            are from `time.perf_counter()`.
+        '''
+        if len(self._events) >= self.max_events:
+            self.n_dropped += 1
+            return
+
+        thread = threading.current_thread()
+        if thread.ident not in self._thread_names:
+            self._thread_names[thread.ident] = thread.name
+
+        event = {
+            'name': name, 'cat': category, 'ph': 'X', 'pid': self._pid, 'tid': thread.ident,
+            'ts': 1e6 * (start - self._start), 'dur': 1e6 * (stop - start)
+        }
+        if args:
+            event['args'] = args
+        # Appending to a list is atomic, so no lock is needed
+        self._events.append(event)
+
+    def to_json(self) -> "dict":
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in list(self._thread_names.items())
+        ]
+        return {
+            'traceEvents': metadata + list(self._events),
+            'displayTimeUnit': 'ms',
+            'otherData': {'n_dropped': self.n_dropped},
+        }
+
+    def write(self, path: "str"):
+        with open(path, 'w') as file:
+            json.dump(self.to_json(), file)
+
+_tracer: "Union[Tracer, None]" = None
+_null_span = nullcontext()
+
+def start_tracing(max_events: "int" = TRACE_MAX_EVENTS) -> "Tracer":
+    '''
+        Starts recording spans in all threads, replacing an earlier trace.
+    '''
+    global _tracer
+    _tracer = Tracer(max_events)
+    return _tracer
+
+def stop_tracing(path: "Union[str, None]" = None) -> "Union[Tracer, None]":
+    '''
+        Stops recording spans, and writes the trace to `path` if it's given.
+    '''
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None and path is not None:
+        tracer.write(path)
+    return tracer
+
+def get_tracer() -> "Union[Tracer, None]":
+    return _tracer
+
+def is_tracing() -> "bool":
+    return _tracer is not None
+
+def span(name: "str", category: "str" = '', **args):
+    '''
+        Returns a context manager that records a span while tracing,
+        and that does nothing otherwise.
+    '''
+    tracer = _tracer
+    if tracer is None:
+        return _null_span
+    return _Span(tracer, name, category, args)
+
+def traced(name: "Union[str, None]" = None, category: "str" = ''):
+    '''
+        Decorates a function to record a span of every call while tracing.
+    '''
+    def decorator(function):
+        span_name = function.__qualname__ if name is None else name
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return function(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                tracer.add_span(span_name, category, start, time.perf_counter())
+
+        return wrapper
+    return decorator
+
+def _trace_until_exit(path: "str"):
+    start_tracing()
+    atexit.register(stop_tracing, path)
+
+if os.environ.get(TRACE_ENV_VARIABLE):
+    _trace_until_exit(os.environ[TRACE_ENV_VARIABLE])
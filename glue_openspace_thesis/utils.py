@@ -5,7 +5,8 @@ import typing
 __all__ = [
     'WAIT_TIME', 'POLL_RETRIES', 'get_normalized_list_of_equal_strides', 
     'float32_to_bytes', 'bytes_to_float32', 'int32_to_bytes', 'bytes_to_int32',
-    'bool_to_bytes', 'bytes_to_bool', 'Version'
+    'bool_to_bytes', 'bytes_to_bool', 'int32_array_to_bytes', 'float32_array_to_bytes',
+    'mask_to_ranges', 'ranges_to_indices', 'mask_to_bitset', 'all_nan_mask', 'Version'
 ]
 
 WAIT_TIME = 0.5 # Time to wait before next poll
@@ -32,9 +33,7 @@ def get_normalized_list_of_equal_strides(amount = 256):
 
 # Convert to network byte order (big-endian)
 def int32_to_bytes(i: "int") -> "bytearray":
-    byte_array_int = bytearray(struct.pack('!i', i))
-    print(f'\tByte length of converted int={len(byte_array_int)}')
-    return byte_array_int
+    return bytearray(struct.pack('!i', i))
 
 def bool_to_bytes(b: "bool") -> "bytearray":
     return bytearray(struct.pack('!?', b))
@@ -45,14 +44,58 @@ def float32_to_bytes(f: "float") -> "bytearray":
 def float32_list_to_bytes(fl: "list[float]") -> "bytearray":
     return struct.pack(f'!{len(fl)}f', *fl)
 
+def float32_array_to_bytes(arr: "np.ndarray") -> "bytes":
+    return np.asarray(arr, dtype='>f4').tobytes()
+
+def int32_array_to_bytes(arr: "np.ndarray") -> "bytes":
+    return np.asarray(arr, dtype='>i4').tobytes()
+
+def mask_to_ranges(mask: "np.ndarray") -> "np.ndarray":
+    """
+    Run-length encode a boolean mask as a flat int32 array of
+    (start, length) pairs, one pair per contiguous run of True values.
+    """
+    mask = np.asarray(mask, dtype=bool).ravel()
+    # Pad with False on both sides so every run has a rising and a falling edge
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], mask, [False])).view(np.int8)))
+    starts = edges[0::2]
+    lengths = edges[1::2] - starts
+    return np.column_stack((starts, lengths)).astype(np.int32).ravel()
+
+def ranges_to_indices(ranges: "np.ndarray") -> "np.ndarray":
+    """
+    Expands a flat array of (start, length) pairs, as written
+    by `mask_to_ranges`, into the indices the runs cover.
+    """
+    ranges = np.asarray(ranges, dtype=np.int64).ravel()
+    starts, lengths = ranges[0::2], np.maximum(ranges[1::2], 0)
+    # Each index is its position among all covered indices, shifted by the gap before its run
+    run_offsets = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) + np.repeat(starts - run_offsets, lengths)
+
+def mask_to_bitset(mask: "np.ndarray") -> "bytes":
+    """
+    Pack a boolean mask into a bitset, most significant bit first.
+    """
+    return np.packbits(np.asarray(mask, dtype=bool).ravel(), bitorder='big').tobytes()
+
+def all_nan_mask(*columns: "np.ndarray") -> "np.ndarray":
+    """
+    Returns a boolean mask of the rows that are NaN in every column.
+    """
+    mask = np.isnan(columns[0])
+    for column in columns[1:]:
+        mask &= np.isnan(column)
+    return mask
+
 def string_to_bytes(s: "str") -> "bytearray":
     return bytearray(s, 'utf-8')
 
 def bytes_to_int32(i: "bytearray") -> int:
-    return int(struct.unpack('@i', i)[0])
+    return int(struct.unpack('!i', i)[0])
 
 def bytes_to_bool(b: "bytearray") -> "bool":
-    return bool(struct.unpack('@?', b)[0])
+    return bool(struct.unpack('!?', b)[0])
 
 def bytes_to_float32(f: "bytearray") -> "float":
-    return float(struct.unpack('@f', f)[0])
+    return float(struct.unpack('!f', f)[0])
@@ -1,14 +1,12 @@
-from enum import Enum
+import logging
 import os
 import shutil
-import socket
 import tempfile
-from threading import Condition, Thread, Lock
-import time
+from threading import Condition, Lock
 from uuid import uuid4
 from typing import Union
 
-from qtpy.QtCore import Qt
+from qtpy.QtCore import Qt, QObject, QTimer, Signal
 from qtpy.QtGui import  QPixmap, QCursor
 
 from qtpy.QtWidgets import (
@@ -16,39 +14,70 @@ from qtpy.QtWidgets import (
     QPushButton, QHBoxLayout, qApp
 )
 
+from glue.core import Subset
+from glue.core.subset import SubsetState
 from glue.utils.qt import messagebox_on_error
 from glue.viewers.common.qt.data_viewer import DataViewer
 from glue.viewers.common.qt.toolbar import BasicToolbar
 
 from .simp import simp
-from .utils import WAIT_TIME, int32_to_bytes
+from .cache import bump_data_revision
+from .statistics import set_main_thread_dispatcher
+from .session import SimpSession, get_session_manager
+from .viewer_base import ConnectionState, OpenSpaceViewerBase
+from .metrics import PipelineMetrics
+from .payload_cache import PAYLOAD_CACHE_DIRECTORY
+from .log import logger
 
 from .viewer_state import OpenSpaceViewerState
 from .layer_artist import OpenSpaceLayerArtist
 from .viewer_state_widget import OpenSpaceViewerStateWidget
 from .layer_state_widget import OpenSpaceLayerStateWidget
 
-__all__ = ['OpenSpaceDataViewer']
-
-class DebugMode(int, Enum):
-    Off = 0,
-    On = 1,
-    Verbose = 2
-DEBUG = DebugMode.Off # TODO: Always set this to Off before committing!
-DEBUG_VERBOSICITY = 1
+__all__ = ['OpenSpaceDataViewer', 'get_texture']
 
 TEXTURE_ORIGIN = os.path.abspath(os.path.join(os.path.dirname(__file__), 'halo.png'))
-TEXTURE = tempfile.mktemp(suffix='.png')
-shutil.copy(TEXTURE_ORIGIN, TEXTURE)
 LOGO = os.path.abspath(os.path.join(os.path.dirname(__file__), 'logo.png'))
-
-class OpenSpaceDataViewer(DataViewer):
-    class ConnectionState(Enum):
-        Disconnected = 0,
-        Connected = 1,
-        Connecting = 2,
-        SendingData = 3,
-
+STATS_REFRESH_INTERVAL = 500 # Milliseconds between updates of the shown statistics
+
+_texture: "Union[str, None]" = None
+_texture_lock = Lock()
+
+def get_texture() -> "str":
+    '''
+        Returns the path of a copy of the halo texture in the temporary
+        directory. It's copied when it's first needed, not when Glue
+        imports the plugin.
+    '''
+    global _texture
+    with _texture_lock:
+        if _texture is None:
+            fd, path = tempfile.mkstemp(suffix='.png')
+            os.close(fd)
+            shutil.copy(TEXTURE_ORIGIN, path)
+            _texture = path
+        return _texture
+
+class MainThreadDispatcher(QObject):
+    """
+    Calls the callbacks it's given from other threads on the thread
+    it was created on, through a queued signal.
+    """
+    _called = Signal(object)
+
+    def __init__(self):
+        super(MainThreadDispatcher, self).__init__()
+        self._called.connect(self._call, Qt.QueuedConnection)
+
+    def __call__(self, callback):
+        self._called.emit(callback)
+
+    def _call(self, callback):
+        callback()
+
+_main_thread_dispatcher: "Union[MainThreadDispatcher, None]" = None
+
+class OpenSpaceDataViewer(OpenSpaceViewerBase, DataViewer):
     LABEL = 'OpenSpace Viewer'
     _state_cls = OpenSpaceViewerState
     _data_artist_cls = OpenSpaceLayerArtist
@@ -61,25 +90,12 @@ class OpenSpaceDataViewer(DataViewer):
     _toolbar_cls = BasicToolbar
     tools = []
 
-    _thread_running: "bool"
-    _threadCommsRx: "Union[Thread, None]"
-
-    _outgoing_data_message: "dict[str, dict[simp.DataKey, tuple[bytearray, int]]]"
-    _outgoing_data_message_mutex: "Lock"
-    _outgoing_data_message_thread_running: "bool"
-    _outgoing_data_message_thread: "Union[Thread, None]"
-    _outgoing_data_message_condition: "Condition"
+    _session: "Union[SimpSession, None]"
 
     _is_connected: "bool"
     _is_connecting: "bool"
-    _lost_connection: "bool"
-
-    _connection_state: "ConnectionState"
 
     _failed_socket_read_retries: "int"
-    
-    _socket: "Union[socket.socket, None]"
-    layers: "list[OpenSpaceLayerArtist]"
 
     ui: "QWidget"
     connection_button = "QPushButton"
@@ -90,12 +106,11 @@ class OpenSpaceDataViewer(DataViewer):
 
     _has_resized: "bool"
 
-    state: "OpenSpaceViewerState"
+    stats_label: "QLabel"
+    _stats_timer: "QTimer"
 
     layer_identifiers = []
 
-    _main_layer_uuid: "str"
-
     # @classmethod
     # @messagebox_on_error("Failed to open viewer. Another OpenSpace viewer already contains that layer.")
     # def check_and_add_instance(cls, data):
@@ -119,16 +134,24 @@ class OpenSpaceDataViewer(DataViewer):
     def __init__(self, *args, **kwargs):
         super(OpenSpaceDataViewer, self).__init__(*args, **kwargs)
 
-        self._socket = None
+        # Exact limits of the layers are computed on the statistics thread
+        global _main_thread_dispatcher
+        if _main_thread_dispatcher is None:
+            _main_thread_dispatcher = MainThreadDispatcher()
+            set_main_thread_dispatcher(_main_thread_dispatcher)
 
-        self._thread_running = False
-        self._threadCommsRx = None
+        self._socket = None
+        self._session = None
+        self._send_lock = Lock()
 
         self._outgoing_data_message = {}
         self._outgoing_data_message_mutex = Lock()
-        self._outgoing_data_message_thread_running = False
-        self._outgoing_data_message_thread = None
+        # Replaced by the condition of the session when connecting
         self._outgoing_data_message_condition = Condition()
+        self._next_layer = 0
+        self.metrics = PipelineMetrics()
+        self.profiler = None
+        self._payload_cache = None
 
         self._connection_state = self.ConnectionState.Disconnected
 
@@ -142,7 +165,6 @@ class OpenSpaceDataViewer(DataViewer):
         self._has_resized = False
 
         self._viewer_identifier = str(uuid4())
-        self._main_layer_uuid = ''
 
         # Set up Qt UI
         self.init_ui()
@@ -150,9 +172,32 @@ class OpenSpaceDataViewer(DataViewer):
         self.allow_duplicate_data = False
         self.allow_duplicate_subset = False
 
+        self.state.add_callback('subset_mode', self._on_subset_mode_change)
+        self.state.add_callback('show_stats', self._on_show_stats_change)
+        self.state.add_callback('profile_cycles', self._on_profile_cycles_change)
+
     def __del__(self):
         self.disconnect_from_openspace()
 
+    def __gluestate__(self, context):
+        state = super(OpenSpaceDataViewer, self).__gluestate__(context)
+        if self.state.save_payload_cache:
+            # A restored session writes to its own sidecar again
+            if self._payload_cache is not None:
+                path = self._payload_cache.path
+            else:
+                path = os.path.join(PAYLOAD_CACHE_DIRECTORY, self._viewer_identifier)
+            self.save_payload_cache(path)
+            state['payload_cache'] = path
+        return state
+
+    @classmethod
+    def __setgluestate__(cls, rec, context):
+        viewer = super(OpenSpaceDataViewer, cls).__setgluestate__(rec, context)
+        if rec.get('payload_cache') is not None:
+            viewer.load_payload_cache(rec['payload_cache'])
+        return viewer
+
     def init_ui(self):
         grid_layout = QGridLayout()
         
@@ -203,6 +248,15 @@ class OpenSpaceDataViewer(DataViewer):
         self.connection_button.setCursor(QCursor(Qt.PointingHandCursor))
         grid_layout.addWidget(self.connection_button, 2, 0, 1, 4, Qt.AlignCenter)
 
+        self.stats_label = QLabel()
+        self.stats_label.setAlignment(Qt.AlignLeft)
+        self.stats_label.hide()
+        grid_layout.addWidget(self.stats_label, 3, 0, 1, 4, Qt.AlignCenter)
+
+        self._stats_timer = QTimer()
+        self._stats_timer.setInterval(STATS_REFRESH_INTERVAL)
+        self._stats_timer.timeout.connect(self._update_stats)
+
         # self.show_log_button = QPushButton('Show log')
         # self.show_log_button.setCheckable(True)
         # self.show_log_button.clicked.connect(self.toggle_show_log)
@@ -252,7 +306,7 @@ class OpenSpaceDataViewer(DataViewer):
     #     self.resize_window()
 
     def set_connection_state(self, new_state: ConnectionState) -> ConnectionState:
-        self.debug(f'Executing set_connection_state()', 4)
+        self.debug('Executing set_connection_state()', 4)
         old_connection_state = self._connection_state
         self._connection_state = new_state
     
@@ -281,8 +335,14 @@ class OpenSpaceDataViewer(DataViewer):
         qApp.processEvents()
         return old_connection_state
 
-    def log(self, msg: "str"):
-        print(f'OpenSpace Viewer ({self._viewer_identifier}): {msg}')
+    def apply_selection(self, subset_state: "SubsetState"):
+        # Selections arrive on the listener thread, subsets are made on the GUI thread
+        _main_thread_dispatcher(
+            lambda: self._data.new_subset_group(label='OpenSpace selection', subset_state=subset_state)
+        )
+
+    def log(self, msg: "str", level: "int" = logging.INFO):
+        logger.log(level, 'OpenSpace Viewer (%s): %s', self._viewer_identifier, msg)
 
         if not isinstance(msg, str):
             return
@@ -293,16 +353,6 @@ class OpenSpaceDataViewer(DataViewer):
         # self.log_widget.addWidget(new_msg)
         return
 
-    def debug(self, msg: "str", log_level: "int" = 1):
-        """
-        Set DEBUG_VERBOSICITY at the top of the file
-        """
-        if DEBUG == DebugMode.Off:
-            return
-        
-        if log_level <= DEBUG_VERBOSICITY:
-            self.log('(DEBUG) ' + msg)
-
     def resize_window(self):
         qApp.processEvents()
         # button_size_hint = self.show_log_button.sizeHint()
@@ -316,225 +366,47 @@ class OpenSpaceDataViewer(DataViewer):
 
         qApp.processEvents()
 
-    def start_outgoing_data_message_thread(self):
-        self.debug(f'Executing start_outgoing_data_message_thread()', 4)
-        if (self._outgoing_data_message_thread == None) or (not self._outgoing_data_message_thread.is_alive()): 
-            self._outgoing_data_message_thread = Thread(target=self.outgoing_data_message_loop)
-            self._outgoing_data_message_thread_running = True
-            self._outgoing_data_message_thread.start()
-
-    def stop_outgoing_data_message_thread(self):
-        self._outgoing_data_message_thread_running = False
-        self._outgoing_data_message_thread = None
-
-    def outgoing_data_message_loop(self):
-        self._outgoing_data_message_condition.acquire()
-        self.debug(f'Executing outgoing_data_message_loop()', 4)
-        counter = 1
-
-        while self._outgoing_data_message_thread_running:
-            # Block excecution on this thread for as long as outgoing 
-            # message mutex is locked or outgoing message is empty
-            def outgoing_data_message_is_ready():
-                if len(self._outgoing_data_message.items()) == 0:
-                    return False
-
-                if self._outgoing_data_message_mutex.locked():
-                    return False
-                
-                return any([len(x.items()) > 0 for (_, x) in self._outgoing_data_message.items()])
-
-            self._outgoing_data_message_condition.wait_for(outgoing_data_message_is_ready)
-
-            self.debug(f'Handling outgoing_data_message {counter}', 1)
-            counter += 1
-
-            # Lock outgoing message mutex so that other threads cannot 
-            # mutate the list while gathering all data to be sent
-            self._outgoing_data_message_mutex.acquire()
-            old_connection_state = self.set_connection_state(self.ConnectionState.SendingData)
-
-            for layer in self.layers:
-                layer_identifier = layer.get_identifier_str()
-                if not layer_identifier or not layer_identifier in self._outgoing_data_message:
-                    continue
-
-                layer_outgoing_data_message = self._outgoing_data_message[layer_identifier]
-                n_attr_to_be_sent = len(layer_outgoing_data_message.items())
-                if n_attr_to_be_sent == 0:
-                    continue
-
-                subject_buffer = bytearray() + bytes(layer.get_subject_prefix(), 'utf-8')
-                for simp_key, (data_buffer, n_vals) in layer_outgoing_data_message.items():
-                    subject_buffer += bytearray(str(simp_key + simp.DELIM), 'utf-8')
-                    n_vals_str = f'{n_vals} ' if n_vals > 1 else ''
-                    self.log(f'Adding {n_vals_str}{simp_key} to outgoing message')
-                    if (n_vals > 1):
-                        subject_buffer += int32_to_bytes(n_vals) # Get 32 bits (4 bytes)
-                    subject_buffer += data_buffer
-                
-                self._outgoing_data_message[layer_identifier].clear()
-                # Release lock, so that other threads can mutate the outgoing message
-                self._outgoing_data_message_mutex.release()
-
-                if len(subject_buffer):
-                    simp.send_simp_message(self, simp.MessageType.Data, subject_buffer)
-                    self.log(f'Sent SIMP {simp.MessageType.Data} message with {n_attr_to_be_sent} attributes to OpenSpace')
-                    layer.state.has_sent_initial_data = True
-                
-            self.set_connection_state(old_connection_state)
-
-        self._outgoing_data_message_condition.release()
-        
-    def start_socket_thread(self):
-        if (self._threadCommsRx == None) or (not self._threadCommsRx.is_alive()):
-            self._lost_connection = False
-            self._threadCommsRx = Thread(target=self.request_listen)
-            self._thread_running = True
-            self._threadCommsRx.start()
-
-    def stop_socket_thread(self):
-        self._thread_running = False
-        self._threadCommsRx = None
-
-    def request_listen(self):
-        self.log('Socket listener running...')
-        try:
-            connection_check_retries = 0
-            while self._thread_running:
-
-                if self._lost_connection:
-                    raise Exception('Lost connection to OpenSpace...')
-
-                if self._is_connecting:
-                    self.log('Trying to receive handshake...')
-                    # If it takes more than 20 polls (approx 10 seconds when WAIT_TIME is 0.5s)
-                    # to connect to OpenSpace: cancel the connection attempt
-                    if connection_check_retries > 20:
-                        time.sleep(WAIT_TIME)
-                        raise Exception('Connection timeout reached. Could not establish connection to OpenSpace...')
-
-                    connection_check_retries += 1
-                    self.receive_handshake()
-                    continue
-                
-                if not self._is_connected:
-                    time.sleep(WAIT_TIME)
-                    continue
-
-                self.receive_message()
-
-        except simp.DisconnectionException:
-            self.debug(f'request_listen(): simp.DisconnectionException', 2)
-            pass
-
-        except Exception as exc:
-            self.log(f'Exception in request_listen: {str(exc)}')
-
-        finally:
-            self.log('Socket listener shutdown...')
-            self.disconnect_from_openspace()
-
-    def read_socket(self):
-        self.debug(f'Executing read_socket()', 4)
-        try:
-            message_received = self._socket.recv(4096)
-        except socket.error as err:
-            self.log('Could not receive message.')
-            self.log(f'Socket error: {err}')
-            self.log('Disconnecting from OpenSpace...')
-            raise simp.DisconnectionException
-
-        if len(message_received) < 1:
-            self.log(f'Received message had no content. Disconnecting from OpenSpace...')
-            raise simp.DisconnectionException
-
-        return message_received
-
-    # Connection handshake to ensure connection is established
-    def receive_handshake(self):
-        self.debug(f'Executing receive_handshake()', 4)
-        message_received = self.read_socket()
-        mr_str = message_received.decode('utf-8')
-        self.debug(f'message_received={mr_str}', 1)
-        
-        message_type, _ = simp.parse_message(self, message_received)
-
-        if message_type != simp.MessageType.Connection:
-            return
-
-        self.set_connection_state(self.ConnectionState.Connected)
-        self.log('Connected to OpenSpace')
-
-        # Update layers to trigger sending of data
-        for layer in self.layers:
-            layer.update(force=True)
-
-        self.start_outgoing_data_message_thread()
-
-    def receive_message(self):
-        self.debug(f'Executing receive_message()', 4)
-        message_received = self.read_socket()
-
-        message_type, subject = simp.parse_message(self, message_received)
-
-        self.log(f'Received new message: "{message_type}"')
-
-        if message_type == simp.MessageType.Connection:
-            # We only want to parse "DATA"-messages
-            self.log('Recieved non-interesting message')
-            return
+    def on_session_closed(self):
+        '''
+            Called by the session when the connection couldn't be kept
+        '''
+        self.disconnect_from_openspace()
 
-        try:
-            offset = 0
-            # Get identifier for the "DATA"-message
-            identifier, offset = simp.read_string(subject, offset)
-            # Get gui_name for the "DATA"-message
-            # Not used right now, although sent with every "DATA"-message
-            gui_name, offset = simp.read_string(subject, offset)
-
-            for layer in self.layers:
-                if layer.get_identifier_str() == identifier:
-                    layer.receive_message(message_type, subject, offset)
-
-        except simp.SimpError as err:
-            self.log(f'Couldn\'t read subject: {err.message}')
-            return
+    def start_recording(self, path: "str"):
+        '''
+            Records all messages of the connection to OpenSpace to a log at
+            `path`. The connection is shared with other viewers connected to
+            the same OpenSpace instance, so their messages are recorded too.
+        '''
+        if self._session is None:
+            raise simp.SimpError('Connect to OpenSpace before recording')
 
-    @messagebox_on_error('An error occurred when trying to reset socket:', sep=' ')
-    def reset_socket(self):
-        self.debug(f'Executing reset_socket()', 4)
-        try:
-            ip = self.ip_textfield.text().lower()
-            if len(ip) < 8:
-                raise simp.SimpError(f'The IP address {ip} is invalid')
-                
-            if ip.startswith('tcp://'):
-                ip = ip[6:]
+        self._session.start_recording(path)
 
-            [ip, port] = ip.split(':')
+    def stop_recording(self):
+        if self._session is not None:
+            self._session.stop_recording()
 
-            if ip == 'localhost':
-                ip = '127.0.0.1'
+    def get_endpoint(self) -> "tuple[str, int]":
+        ip = self.ip_textfield.text().lower()
+        if len(ip) < 8:
+            raise simp.SimpError(f'The IP address {ip} is invalid')
+            
+        if ip.startswith('tcp://'):
+            ip = ip[6:]
 
-            ip_split = ip.split('.')
-            if len(ip_split) != 4 and (
-                any((not float(n).is_integer()) for n in ip_split) or (not float(port).is_integer())
-            ):
-                raise simp.SimpError(f'The IP address {ip} is invalid')
+        [ip, port] = ip.split(':')
 
+        if ip == 'localhost':
+            ip = '127.0.0.1'
 
-            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
-            self._socket.settimeout(0.0)
-            self._socket = socket.create_connection((ip, port if port != "" else 4700))
-        
-        except simp.SimpError as ex:
-            self.set_connection_state(self.ConnectionState.Disconnected)
-            self.log(f'Error when resetting socket: {ex.message}')
-            raise Exception
+        ip_split = ip.split('.')
+        if len(ip_split) != 4 and (
+            any((not float(n).is_integer()) for n in ip_split) or (not float(port).is_integer())
+        ):
+            raise simp.SimpError(f'The IP address {ip} is invalid')
 
-        # self._socket = socket.create_connection(('localhost', 4700))
-        # self._socket = socket.connect(('localhost', 4700))
+        return ip, int(port) if port != "" else 4700
 
     @messagebox_on_error('An error occurred when trying to connect or disconnect from OpenSpace:', sep=' ')
     def connection_button_action(self, *args):
@@ -548,29 +420,37 @@ class OpenSpaceDataViewer(DataViewer):
         self.log('Connecting to OpenSpace...')
         self.set_connection_state(self.ConnectionState.Connecting)
 
-        self.reset_socket() # Must create connection before starting thread to recevie messages
-        self.start_socket_thread()
+        try:
+            ip, port = self.get_endpoint()
+        except simp.SimpError as ex:
+            self.set_connection_state(self.ConnectionState.Disconnected)
+            self.log(f'Error when resetting socket: {ex.message}', logging.WARNING)
+            raise Exception
 
-        # Send "Connection" message to OpenSpace
-        subject = bytearray('Glue' + simp.DELIM, 'utf-8')
-        simp.send_simp_message(self, simp.MessageType.Connection, subject)
+        # All viewers connected to the same OpenSpace share one session,
+        # which does the handshake and sends the messages of all of them
+        try:
+            self._session = get_session_manager().attach(self, ip, port)
+        except OSError:
+            self.set_connection_state(self.ConnectionState.Disconnected)
+            raise
 
     @messagebox_on_error('An error occurred when trying to disconnect from OpenSpace:', sep=' ')
     def disconnect_from_openspace(self):
-        if self._socket is None:
+        if self._session is None:
             return
 
-        self.debug(f'Executing disconnect_from_openspace()', 4)
-        self.stop_outgoing_data_message_thread()
-        self.stop_socket_thread()
+        self.debug('Executing disconnect_from_openspace()', 4)
+        [layer.cancel_progressive_upload() for layer in self.layers]
+        [layer.cancel_frame_playback() for layer in self.layers]
 
-        try:
-            self._socket.shutdown(socket.SHUT_RDWR)
-            self._socket.close()
-        except:
-            self.log('Couldn\'t shutdown socket to OpenSpace.')
-        finally:
-            self._socket = None
+        session = self._session
+        self._session = None
+        get_session_manager().detach(self, session)
+
+        self._socket = None
+        self._outgoing_data_message_condition = Condition()
+        self._send_lock = Lock()
 
         # Reset has_sent_initial_data so that layers send all data on next connection
         [setattr(self.layers[i].state, 'has_sent_initial_data', False) for i in range(len(self.layers))]
@@ -593,42 +473,81 @@ class OpenSpaceDataViewer(DataViewer):
 
     @messagebox_on_error("Failed to add data")
     def add_data(self, data) -> "bool":
-        # TODO: Here we can handle when new datasets are added, so we can send new data
-        # This should be false, i.e one should not be able to add multiple datasets in one OpenSpace Viewer
-        # This can be changed later on to add support for dataset "linking"
+        # Every dataset gets its own layer, identifier and outgoing message,
+        # while all of them share the connection and sender of the viewer
         # Return true if the dataset should be added, false if not
 
         # proceed = self.warn('Add large data set?', 'Data set {0:s} has {1:d} points, and '
         #                         'may render slowly.'.format(data.label, data.size),
         #                         default='Cancel', setting='show_large_data_warning')
-        if len(self.layers) >= 1:
-            raise Exception("Only one dataset per OpenSpace viewer")
-
-        print(f'len(self.state.layers): {len(self.state.layers)}, len(self.layers): {len(self.layers)}')
 
         return super(OpenSpaceDataViewer, self).add_data(data)# and OpenSpaceDataViewer.check_and_add_instance(data)
 
     @messagebox_on_error("Failed to add subset")
     def add_subset(self, subset) -> "bool":
         # TODO: Here we should handle to divide datasets into multiple SGNs in OpenSpace
-        if len(self.layers) > 0:
+        # Subsets are only cheap enough to send when they reference the
+        # points of their parent layer, i.e. in mask mode
+        if len(self.layers) > 0 and self.state.subset_mode != 'Mask':
             return False
         return super(OpenSpaceDataViewer, self).add_subset(subset) # Return true if the subset should be added, false if not
 
     def remove_data(self, data):
-        [layer.send_remove_sgn() for layer in self.layers if layer.state.layer == data.uuid]
+        [layer.send_remove_sgn() for layer in self.layers if layer.state.layer is data
+            or (isinstance(layer.state.layer, Subset) and layer.state.layer.data is data)]
         # OpenSpaceDataViewer.remove_layer(data)
         super(OpenSpaceDataViewer, self).remove_data(data)
 
     def remove_subset(self, subset):
-        [layer.send_remove_sgn() for layer in self.layers if layer.state.layer == subset.uuid]
+        [layer.send_remove_sgn() for layer in self.layers if layer.state.layer is subset]
         # OpenSpaceDataViewer.remove_layer(subset)
         super(OpenSpaceDataViewer, self).remove_subset(subset)
 
+    def _update_subset(self, message):
+        # Let the layer artists know that the selection itself
+        # changed, so that the membership can be sent again
+        if message.attribute == 'subset_state' and message.subset in self._layer_artist_container:
+            for layer_artist in self._layer_artist_container[message.subset]:
+                layer_artist.update(subset_changed=True)
+            return
+
+        super(OpenSpaceDataViewer, self)._update_subset(message)
+
+    def _update_data_numerical(self, message):
+        # Values cached for the previous values of the data are no longer valid
+        bump_data_revision(message.data)
+        super(OpenSpaceDataViewer, self)._update_data_numerical(message)
+
+    def _on_show_stats_change(self, show_stats):
+        if show_stats:
+            self._update_stats()
+            self._stats_timer.start()
+        else:
+            self._stats_timer.stop()
+
+        self.stats_label.setVisible(show_stats)
+        self.resize_window()
+
+    def _update_stats(self):
+        self.stats_label.setText(self.metrics.format_summary())
+
+    def _on_subset_mode_change(self, subset_mode):
+        data_layers = [layer.state.layer for layer in self.layers if not isinstance(layer.state.layer, Subset)]
+
+        if subset_mode == 'Mask':
+            for data in data_layers:
+                for subset in data.subsets:
+                    self.add_subset(subset)
+        else:
+            for layer in list(self.layers):
+                if isinstance(layer.state.layer, Subset):
+                    self.remove_subset(layer.state.layer)
+
     @property
     def window_title(self):
         if len(self.state.layers) > 0:
-            return ' OpenSpace Viewer: ' + self.state.layers[0].layer.label
+            labels = [layer.layer.label for layer in self.state.layers if not isinstance(layer.layer, Subset)]
+            return ' OpenSpace Viewer: ' + ', '.join(labels)
         else:
             return ' OpenSpace Viewer'
 
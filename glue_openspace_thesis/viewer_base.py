@@ -0,0 +1,245 @@
+from enum import Enum
+import logging
+from threading import Condition, Lock
+from typing import TYPE_CHECKING, Union
+import socket
+
+from .simp import simp
+from .utils import int32_to_bytes
+from .column_source import Float32ColumnPayload, payload_nbytes
+from .metrics import PipelineMetrics
+from .profiling import PROFILE_DIRECTORY, PROFILE_KEEP, CycleProfiler
+from .payload_cache import PayloadCache
+from .capabilities import LEGACY_CAPABILITIES, MAX_MESSAGE_SIZE, Capabilities
+from .tracing import span, traced
+from .log import get_logging_level, is_debug_enabled, logger
+
+if TYPE_CHECKING:
+    from .layer_artist import OpenSpaceLayerArtist
+    from .viewer_state import OpenSpaceViewerState
+    from .session import SimpSession
+
+__all__ = ['ConnectionState', 'OpenSpaceViewerBase']
+
+class ConnectionState(Enum):
+    Disconnected = 0,
+    Connected = 1,
+    Connecting = 2,
+    SendingData = 3,
+
+class OpenSpaceViewerBase:
+    """
+    The parts of an OpenSpace viewer that don't depend on the GUI: the
+    outgoing messages of its layers and the callbacks of the session.
+    Subclasses provide `layers`, `state`, `set_connection_state()`,
+    `log()` and `apply_selection()`.
+    """
+    ConnectionState = ConnectionState
+
+    _session: "Union[SimpSession, None]"
+    _send_lock: "Lock"
+    _socket: "Union[socket.socket, None]"
+    _lost_connection: "bool"
+
+    _outgoing_data_message: "dict[str, dict[simp.DataKey, tuple[Union[bytearray, Float32ColumnPayload], int]]]"
+    _outgoing_data_message_mutex: "Lock"
+    _outgoing_data_message_condition: "Condition"
+    _next_layer: "int"
+
+    _connection_state: "ConnectionState"
+
+    metrics: "PipelineMetrics"
+    profiler: "Union[CycleProfiler, None]"
+    _payload_cache: "Union[PayloadCache, None]"
+    layers: "list[OpenSpaceLayerArtist]"
+    state: "OpenSpaceViewerState"
+
+    def debug(self, msg: "str", log_level: "int" = 1, *args):
+        '''
+            Logs a debug message to the plugin's logger if its verbosity is
+            enabled, see `set_debug_verbosity()`. The message is only formatted
+            with `args` by a handler that shows it, so disabled messages cost
+            a level check.
+        '''
+        logger.log(get_logging_level(log_level), msg, *args)
+
+    def start_profiling(self, directory: "str" = PROFILE_DIRECTORY, n_slowest: "int" = PROFILE_KEEP):
+        '''
+            Profiles every sent message and every time the initial data of
+            a layer is added, keeping the `n_slowest` profiles in `directory`.
+        '''
+        self.profiler = CycleProfiler(directory, n_slowest)
+        self.log(f'Profiling the {n_slowest} slowest messages to \'{directory}\'')
+
+    def stop_profiling(self):
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            self.log(f'Stopped profiling, {len(profiler.entries)} profiles are in \'{profiler.directory}\'')
+
+    def _on_profile_cycles_change(self, profile_cycles: "bool"):
+        if profile_cycles:
+            self.start_profiling()
+        else:
+            self.stop_profiling()
+
+    def save_payload_cache(self, path: "str") -> "int":
+        '''
+            Writes the encoded buffers of the layers, e.g. the converted
+            positions, to the sidecar directory at `path`. Returns the
+            amount of buffers in it.
+        '''
+        buffers = [buffer for layer in self.layers for buffer in layer.get_payload_cache_buffers()]
+        payload_cache = PayloadCache.load(path)
+        payload_cache.write(buffers)
+        self.log(f'Saved {len(payload_cache)} encoded buffers to \'{path}\'')
+        return len(payload_cache)
+
+    def load_payload_cache(self, path: "str"):
+        '''
+            Uses the buffers of the sidecar at `path` when the layers are sent,
+            as long as the columns they were encoded from haven't changed.
+        '''
+        self._payload_cache = PayloadCache.load(path)
+        self.log(f'Loaded {len(self._payload_cache)} encoded buffers from \'{path}\'')
+
+    def has_outgoing_data_message(self) -> "bool":
+        '''
+            Returns True if a layer has data to send and no
+            other thread is mutating the outgoing message
+        '''
+        if self._outgoing_data_message_mutex.locked():
+            return False
+
+        return any([len(x.items()) > 0 for (_, x) in list(self._outgoing_data_message.items())])
+
+    @traced(category='encode')
+    def pop_outgoing_layer_message(self) -> "Union[tuple[OpenSpaceLayerArtist, list, int], None]":
+        '''
+            Takes the outgoing message of the next layer that has data to
+            send, in round robin order, as the parts of a "Data" message subject.
+            Keys that would make the subject larger than the agreed
+            `max_message_size` are left for the next message.
+        '''
+        max_message_size = self.capabilities.get('max_message_size', MAX_MESSAGE_SIZE)
+        # Lock outgoing message mutex so that other threads cannot 
+        # mutate the list while gathering the data to be sent
+        with span('Wait for outgoing message', 'lock'):
+            self._outgoing_data_message_mutex.acquire()
+        try:
+            # Messages of layers that have been removed are never sent
+            layer_identifiers = set(layer.get_identifier_str() for layer in self.layers)
+            for identifier in list(self._outgoing_data_message.keys()):
+                if identifier not in layer_identifiers:
+                    del self._outgoing_data_message[identifier]
+                    self.metrics.discard(identifier)
+
+            layers = list(self.layers)
+            for i in range(len(layers)):
+                layer = layers[(self._next_layer + i) % len(layers)]
+                layer_identifier = layer.get_identifier_str()
+                if not layer_identifier or not layer_identifier in self._outgoing_data_message:
+                    continue
+
+                layer_outgoing_data_message = self._outgoing_data_message[layer_identifier]
+                if len(layer_outgoing_data_message) == 0:
+                    continue
+
+                # Small values are gathered in one buffer, while column payloads
+                # and encoded arrays are kept as separate parts and streamed when sent
+                subject_parts = []
+                subject_buffer = bytearray() + bytes(layer.get_subject_prefix(), 'utf-8')
+                n_bytes = len(subject_buffer)
+                bytes_per_key = {}
+                log_keys = is_debug_enabled(3)
+                for simp_key, (data_buffer, n_vals) in list(layer_outgoing_data_message.items()):
+                    key_bytes = bytearray(str(simp_key + simp.DELIM), 'utf-8')
+                    if (n_vals > 1):
+                        key_bytes += int32_to_bytes(n_vals) # Get 32 bits (4 bytes)
+                    n_key_bytes = len(key_bytes) + payload_nbytes(data_buffer)
+
+                    if n_bytes + n_key_bytes > max_message_size:
+                        if len(bytes_per_key) > 0:
+                            break
+                        # OpenSpace can't receive it in any message
+                        del layer_outgoing_data_message[simp_key]
+                        self.log(
+                            f'{simp_key} of {n_key_bytes} bytes is larger than the largest message OpenSpace accepts',
+                            logging.WARNING
+                        )
+                        continue
+
+                    if log_keys:
+                        self.debug('Adding %s%s to outgoing message', 3, f'{n_vals} ' if n_vals > 1 else '', simp_key)
+                    del layer_outgoing_data_message[simp_key]
+                    subject_buffer += key_bytes
+                    bytes_per_key[simp_key] = n_key_bytes
+                    n_bytes += n_key_bytes
+                    if isinstance(data_buffer, (Float32ColumnPayload, memoryview)):
+                        subject_parts += [subject_buffer, data_buffer]
+                        subject_buffer = bytearray()
+                    else:
+                        subject_buffer += data_buffer
+                subject_parts.append(subject_buffer)
+
+                n_attr_to_be_sent = len(bytes_per_key)
+                if n_attr_to_be_sent == 0:
+                    self.metrics.discard(layer_identifier)
+                    continue
+
+                self._next_layer = (self._next_layer + i + 1) % len(layers)
+                self.metrics.on_taken(layer_identifier, bytes_per_key, n_bytes)
+                return layer, subject_parts, n_attr_to_be_sent
+
+        finally:
+            # Release lock, so that other threads can mutate the outgoing message
+            self._outgoing_data_message_mutex.release()
+
+    @property
+    def capabilities(self) -> "Capabilities":
+        '''
+            The capabilities agreed with OpenSpace in the handshake. Without
+            a session, the ones of OpenSpace builds that don't negotiate.
+        '''
+        session = self._session
+        return LEGACY_CAPABILITIES if session is None else session.capabilities
+
+    def on_session_connected(self):
+        '''
+            Called by the session when the handshake with OpenSpace is done
+        '''
+        self.set_connection_state(self.ConnectionState.Connected)
+        self.log('Connected to OpenSpace')
+
+        # Update layers to trigger sending of data
+        for layer in self.layers:
+            layer.update(force=True)
+
+    def on_session_lost(self):
+        '''
+            Called by the session when the connection was lost and is being
+            reconnected. All data is sent again once it's connected.
+        '''
+        [layer.cancel_progressive_upload() for layer in self.layers]
+        [layer.cancel_frame_playback() for layer in self.layers]
+        [setattr(layer.state, 'has_sent_initial_data', False) for layer in self.layers]
+        self.set_connection_state(self.ConnectionState.Connecting)
+
+    def receive_subject(self, message_type: "simp.MessageType", subject: "bytearray"):
+        self.debug('Executing receive_subject()', 4)
+        self.debug('Received new message: "%s"', 2, message_type)
+
+        try:
+            offset = 0
+            # Get identifier for the "DATA"-message
+            identifier, offset = simp.read_string(subject, offset)
+            # Get gui_name for the "DATA"-message
+            # Not used right now, although sent with every "DATA"-message
+            gui_name, offset = simp.read_string(subject, offset)
+
+            for layer in self.layers:
+                if layer.get_identifier_str() == identifier:
+                    layer.receive_message(message_type, subject, offset)
+
+        except simp.SimpError as err:
+            self.log(f'Couldn\'t read subject: {err.message}', logging.WARNING)
+            return
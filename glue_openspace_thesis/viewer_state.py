@@ -1,19 +1,24 @@
 from __future__ import absolute_import, division, print_function
 from typing import Literal, Union
 
-from astropy import units as u
-
-from glue.core.data_combo_helper import ComponentIDComboHelper
 from echo import (ListCallbackProperty, SelectionCallbackProperty)
 from glue.viewers.common.state import ViewerState
 from glue.viewers.matplotlib.state import (DeferredDrawCallbackProperty as DDCProperty,
                                            DeferredDrawSelectionCallbackProperty as DDSCProperty)
 
+from .components import CatalogComponentIDComboHelper
+
 COORDINATE_SYSTEMS = ['Cartesian', 'ICRS']
-DISTANCE_UNITS = [u.m, u.km, u.AU, u.lyr, u.pc, u.kpc, u.Mpc]
-TIME_UNITS = [u.s, u.min, u.h, u.day, u.yr]
-VELOCITY_MODES = ['Static', 'Motion']
+# Strings of astropy units, which are parsed by astropy when they're used
+DISTANCE_UNITS = ['m', 'km', 'AU', 'lyr', 'pc', 'kpc', 'Mpc']
+TIME_UNITS = ['s', 'min', 'h', 'd', 'yr']
+VELOCITY_MODES = ['Static', 'Motion', 'Frames']
 VELOCITY_NAN_MODES = ['Hide', 'Static']
+SUBSET_MODES = ['Points', 'Mask']
+UPLOAD_MODES = ['Full', 'Progressive']
+POINT_ORDERS = ['Table', 'Octree']
+CONVERSION_BACKENDS = ['Threads', 'Processes']
+FRAME_ENCODINGS = ['Positions', 'Deltas']
 
 __all__ = ['OpenSpaceViewerState']
 
@@ -33,6 +38,7 @@ class OpenSpaceViewerState(ViewerState):
     dec_att = SelectionCallbackProperty(docstring='The attribute to use for Dec')
     icrs_dist_att = SelectionCallbackProperty(docstring='The attribute to use for ICRS distance')
     icrs_dist_unit_att = SelectionCallbackProperty(default_index=4, docstring='The distance unit for ICRS coordinates')
+    icrs_float32 = DDCProperty(False, docstring='Whether ICRS coordinates are converted with float32 instead of float64 math')
 
     # Velocity
     velocity_mode = SelectionCallbackProperty(default_index=0, docstring='The mode for velocity')
@@ -50,76 +56,105 @@ class OpenSpaceViewerState(ViewerState):
     # speed_att = SelectionCallbackProperty(default_index=3, docstring='The attribute to use for speed')
     vel_nan_mode: "Union[Literal['Hide'], Literal['Static']]" = DDSCProperty(docstring="Which velocity NaN value mode to use", default_index=0)
 
+    # Frames
+    time_att = SelectionCallbackProperty(docstring='The attribute to group the rows into time steps by')
+    frame_rate = DDCProperty(10.0, docstring='The amount of time steps sent to OpenSpace per second')
+    frame_encoding: "Union[Literal['Positions'], Literal['Deltas']]" = SelectionCallbackProperty(default_index=0, docstring='Whether frames send the positions or the difference to the positions of the previous frame')
+
     # lum_att = SelectionCallbackProperty(docstring='The attribute to use for luminosity')
 
+    # Subsets
+    subset_mode: "Union[Literal['Points'], Literal['Mask']]" = SelectionCallbackProperty(default_index=0, docstring='Whether subsets send their own points or a membership mask of the parent layer')
+
+    # Upload
+    upload_mode: "Union[Literal['Full'], Literal['Progressive']]" = SelectionCallbackProperty(default_index=0, docstring='Whether large datasets are sent at once or as a sample that is refined in the background')
+    progressive_fraction = DDCProperty(0.01, docstring='The fraction of points in the first sample of a progressive upload')
+    point_order: "Union[Literal['Table'], Literal['Octree']]" = SelectionCallbackProperty(default_index=0, docstring='Whether points are sent in table order or sorted into an octree')
+    compact_nan = DDCProperty(False, docstring='Whether rows with NaN in every position column are left out of the sent points')
+    conversion_backend: "Union[Literal['Threads'], Literal['Processes']]" = SelectionCallbackProperty(default_index=0, docstring='Whether ICRS coordinates of large datasets are converted in this process or by worker processes')
+    show_stats = DDCProperty(False, docstring='Whether statistics of the messages sent to OpenSpace are shown in the viewer')
+    profile_cycles = DDCProperty(False, docstring='Whether sending messages is profiled, keeping the profiles of the slowest ones on disk')
+    save_payload_cache = DDCProperty(False, docstring='Whether saved sessions keep the converted positions in a sidecar, so restoring them doesn\'t convert them again')
+
     layers = ListCallbackProperty()
 
     def __init__(self, **kwargs):
         super(OpenSpaceViewerState, self).__init__()
 
         OpenSpaceViewerState.coordinate_system.set_choices(self, COORDINATE_SYSTEMS)
-        OpenSpaceViewerState.cartesian_unit_att.set_choices(self, [str(x) for x in DISTANCE_UNITS])
-        OpenSpaceViewerState.icrs_dist_unit_att.set_choices(self, [str(x) for x in DISTANCE_UNITS])
+        OpenSpaceViewerState.cartesian_unit_att.set_choices(self, DISTANCE_UNITS)
+        OpenSpaceViewerState.icrs_dist_unit_att.set_choices(self, DISTANCE_UNITS)
 
         OpenSpaceViewerState.velocity_mode.set_choices(self, VELOCITY_MODES)
-        OpenSpaceViewerState.vel_distance_unit_att.set_choices(self, [str(x) for x in DISTANCE_UNITS])
-        OpenSpaceViewerState.vel_time_unit_att.set_choices(self, [str(x) for x in TIME_UNITS])
+        OpenSpaceViewerState.vel_distance_unit_att.set_choices(self, DISTANCE_UNITS)
+        OpenSpaceViewerState.vel_time_unit_att.set_choices(self, TIME_UNITS)
         OpenSpaceViewerState.vel_nan_mode.set_choices(self, VELOCITY_NAN_MODES)
-
-        self.x_att_helper = ComponentIDComboHelper(self, 'x_att',
-                                                     numeric=True,
-                                                     categorical=False,
-                                                     world_coord=True,
-                                                     pixel_coord=False)
-        self.y_att_helper = ComponentIDComboHelper(self, 'y_att',
-                                                     numeric=True,
-                                                     categorical=False,
-                                                     world_coord=True,
-                                                     pixel_coord=False)
-        self.z_att_helper = ComponentIDComboHelper(self, 'z_att',
-                                                     numeric=True,
-                                                     categorical=False,
-                                                     world_coord=True,
-                                                     pixel_coord=False)
-
-        self.u_att_helper = ComponentIDComboHelper(self, 'u_att',
-                                                     numeric=True,
-                                                     categorical=False,
-                                                     world_coord=True,
-                                                     pixel_coord=False)
-        self.v_att_helper = ComponentIDComboHelper(self, 'v_att',
-                                                     numeric=True,
-                                                     categorical=False,
-                                                     world_coord=True,
-                                                     pixel_coord=False)
-        self.w_att_helper = ComponentIDComboHelper(self, 'w_att',
-                                                     numeric=True,
-                                                     categorical=False,
-                                                     world_coord=True,
-                                                     pixel_coord=False)
-        # self.speed_att_helper = ComponentIDComboHelper(self, 'speed_att',
+        OpenSpaceViewerState.frame_encoding.set_choices(self, FRAME_ENCODINGS)
+
+        OpenSpaceViewerState.subset_mode.set_choices(self, SUBSET_MODES)
+        OpenSpaceViewerState.upload_mode.set_choices(self, UPLOAD_MODES)
+        OpenSpaceViewerState.point_order.set_choices(self, POINT_ORDERS)
+        OpenSpaceViewerState.conversion_backend.set_choices(self, CONVERSION_BACKENDS)
+
+        self.x_att_helper = CatalogComponentIDComboHelper(self, 'x_att',
+                                                            numeric=True,
+                                                            categorical=False,
+                                                            world_coord=True,
+                                                            pixel_coord=False)
+        self.y_att_helper = CatalogComponentIDComboHelper(self, 'y_att',
+                                                            numeric=True,
+                                                            categorical=False,
+                                                            world_coord=True,
+                                                            pixel_coord=False)
+        self.z_att_helper = CatalogComponentIDComboHelper(self, 'z_att',
+                                                            numeric=True,
+                                                            categorical=False,
+                                                            world_coord=True,
+                                                            pixel_coord=False)
+
+        self.u_att_helper = CatalogComponentIDComboHelper(self, 'u_att',
+                                                            numeric=True,
+                                                            categorical=False,
+                                                            world_coord=True,
+                                                            pixel_coord=False)
+        self.v_att_helper = CatalogComponentIDComboHelper(self, 'v_att',
+                                                            numeric=True,
+                                                            categorical=False,
+                                                            world_coord=True,
+                                                            pixel_coord=False)
+        self.w_att_helper = CatalogComponentIDComboHelper(self, 'w_att',
+                                                            numeric=True,
+                                                            categorical=False,
+                                                            world_coord=True,
+                                                            pixel_coord=False)
+        self.time_att_helper = CatalogComponentIDComboHelper(self, 'time_att',
+                                                            numeric=True,
+                                                            categorical=False,
+                                                            world_coord=True,
+                                                            pixel_coord=False)
+        # self.speed_att_helper = CatalogComponentIDComboHelper(self, 'speed_att',
         #                                              numeric=True,
         #                                              categorical=False,
         #                                              world_coord=True,
         #                                              pixel_coord=False)
 
-        self.ra_att_helper = ComponentIDComboHelper(self, 'ra_att',
-                                                     numeric=True,
-                                                     categorical=False,
-                                                     world_coord=True,
-                                                     pixel_coord=False)
-        self.dec_att_helper = ComponentIDComboHelper(self, 'dec_att',
-                                                     numeric=True,
-                                                     categorical=False,
-                                                     world_coord=True,
-                                                     pixel_coord=False)
-        self.icrs_dist_att_helper = ComponentIDComboHelper(self, 'icrs_dist_att',
-                                                     numeric=True,
-                                                     categorical=False,
-                                                     world_coord=True,
-                                                     pixel_coord=False)
-
-        # self.lum_att_helper = ComponentIDComboHelper(self, 'lum_att',
+        self.ra_att_helper = CatalogComponentIDComboHelper(self, 'ra_att',
+                                                            numeric=True,
+                                                            categorical=False,
+                                                            world_coord=True,
+                                                            pixel_coord=False)
+        self.dec_att_helper = CatalogComponentIDComboHelper(self, 'dec_att',
+                                                            numeric=True,
+                                                            categorical=False,
+                                                            world_coord=True,
+                                                            pixel_coord=False)
+        self.icrs_dist_att_helper = CatalogComponentIDComboHelper(self, 'icrs_dist_att',
+                                                            numeric=True,
+                                                            categorical=False,
+                                                            world_coord=True,
+                                                            pixel_coord=False)
+
+        # self.lum_att_helper = CatalogComponentIDComboHelper(self, 'lum_att',
         #                                              numeric=True,
         #                                              categorical=False,
         #                                              world_coord=True,
@@ -143,6 +178,8 @@ class OpenSpaceViewerState(ViewerState):
         self.v_att_helper.set_multiple_data(self.layers_data)
         self.w_att_helper.set_multiple_data(self.layers_data)
 
+        self.time_att_helper.set_multiple_data(self.layers_data)
+
         # self.speed_att_helper.set_multiple_data(self.layers_data)
         # self.lum_att_helper.set_multiple_data(self.layers_data)
 
@@ -27,6 +27,7 @@ class OpenSpaceViewerStateWidget(QWidget):
 
         self._viewer_state.add_callback('coordinate_system', self._update_visible_options)
         self._viewer_state.add_callback('velocity_mode', self._update_visible_options)
+        self._viewer_state.add_callback('upload_mode', self._update_visible_options)
         self._update_visible_options()
         
         # # Taken from vispy Scatter
@@ -47,9 +48,15 @@ class OpenSpaceViewerStateWidget(QWidget):
 
         if self._viewer_state.velocity_mode == 'Motion':
             self.ui.velocity_stacked_widget.setCurrentIndex(1)
+        elif self._viewer_state.velocity_mode == 'Frames':
+            self.ui.velocity_stacked_widget.setCurrentIndex(2)
         else:
             self.ui.velocity_stacked_widget.setCurrentIndex(0)
 
+        progressive = self._viewer_state.upload_mode == 'Progressive'
+        self.ui.label_progressive_fraction.setVisible(progressive)
+        self.ui.valuetext_progressive_fraction.setVisible(progressive)
+
 
     # def _update_from_state(self, force=False, **props):
     #     if force or 'vel_norm' in props:
@@ -0,0 +1,117 @@
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+import os
+from threading import Lock
+from typing import Callable, Hashable, Union
+
+import numpy as np
+
+__all__ = [
+    'COLUMN_WORKERS', 'get_column_executor', 'get_process_executor', 'resolve_column_jobs',
+    'SharedArray', 'create_shared_array', 'call_with_shared_arrays'
+]
+
+COLUMN_WORKERS = os.cpu_count() or 1 # Columns extracted and encoded at the same time
+
+_column_executor: "Union[ThreadPoolExecutor, None]" = None
+_column_executor_lock = Lock()
+
+_process_executor: "Union[ProcessPoolExecutor, None]" = None
+_process_executor_lock = Lock()
+
+def get_column_executor() -> "ThreadPoolExecutor":
+    """
+    Returns the worker pool shared by all layers, which extracts and
+    encodes independent columns concurrently. NumPy releases the GIL
+    while it copies, converts and byte swaps, so threads scale with the
+    amount of cores without copying the columns to other processes.
+    """
+    global _column_executor
+    with _column_executor_lock:
+        if _column_executor is None:
+            _column_executor = ThreadPoolExecutor(
+                max_workers=COLUMN_WORKERS,
+                thread_name_prefix='openspace-column'
+            )
+        return _column_executor
+
+def get_process_executor() -> "ProcessPoolExecutor":
+    """
+    Returns the worker processes shared by all layers, for the work that
+    holds the GIL. The processes are spawned, since forking a process
+    that runs Qt and socket threads isn't safe.
+    """
+    global _process_executor
+    with _process_executor_lock:
+        if _process_executor is None:
+            _process_executor = ProcessPoolExecutor(
+                max_workers=COLUMN_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_executor
+
+class SharedArray(np.ndarray):
+    """
+    An array in shared memory, which worker processes can attach to by
+    `shared_name` until `unlink()` is called. The memory is freed once
+    the array and all views of it are gone.
+    """
+    _shm: "Union[SharedMemory, None]" = None
+
+    @property
+    def shared_name(self) -> "str":
+        return self._shm.name
+
+    def unlink(self):
+        self._shm.unlink()
+
+def create_shared_array(shape: "tuple", dtype) -> "SharedArray":
+    size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    shm = SharedMemory(create=True, size=size)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf).view(SharedArray)
+    array._shm = shm
+    return array
+
+def call_with_shared_arrays(specs: "list[tuple[str, tuple, str]]", func: "Callable", *args):
+    """
+    Attaches to arrays created by `create_shared_array` in another process,
+    given as `(shared_name, shape, dtype)`, and returns `func(*arrays, *args)`.
+    The arrays are detached afterwards, so `func` must not return views of them.
+    """
+    shms = [SharedMemory(name=name) for name, _, _ in specs]
+    try:
+        arrays = [
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            for shm, (_, shape, dtype) in zip(shms, specs)
+        ]
+        result = func(*arrays, *args)
+        del arrays
+        return result
+    finally:
+        for shm in shms:
+            try:
+                shm.close()
+            except BufferError:
+                # Still referenced by a traceback, it's closed when collected
+                pass
+
+def resolve_column_jobs(entries: "dict[Hashable, object]",
+                        on_error: "Callable[[Hashable, Exception], None]"):
+    """
+    Replaces every future in `entries` with its result, in key order.
+    Entries whose job failed are removed and passed to `on_error`.
+    """
+    failed = []
+    for key, entry in entries.items():
+        if not isinstance(entry, Future):
+            continue
+
+        try:
+            entries[key] = entry.result()
+        except Exception as exc:
+            failed.append(key)
+            on_error(key, exc)
+
+    for key in failed:
+        del entries[key]